@@ -7,16 +7,21 @@ ComfyUI Smart Caption - 智能图片分类和配文生成节点
 作者: JJfan0508
 版本: 1.0.0
 """
+import os
 from .nodes.image_classifier import ImageClassifier
 from .nodes.caption_generator import SmartCaptionGenerator
 from .nodes.batch_image_loader import BatchImageLoader
 from .nodes.multi_image_uploader import MultiImageUploader
+from .nodes.fused_classify_caption import FusedClassifyCaption
+from .nodes.pipeline_classify_caption import PipelineClassifyCaption
 
 NODE_CLASS_MAPPINGS = {
     "ImageClassifier": ImageClassifier,
     "SmartCaptionGenerator": SmartCaptionGenerator,
     "BatchImageLoader": BatchImageLoader,
     "MultiImageUploader": MultiImageUploader,
+    "FusedClassifyCaption": FusedClassifyCaption,
+    "PipelineClassifyCaption": PipelineClassifyCaption,
 }
 
 NODE_DISPLAY_NAME_MAPPINGS = {
@@ -24,15 +29,28 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "SmartCaptionGenerator": "智能配文生成器 ✍️",
     "BatchImageLoader": "批量图片加载器 📁",
     "MultiImageUploader": "多图上传器 🖼️",
+    "FusedClassifyCaption": "融合分类配文 ⚡",
+    "PipelineClassifyCaption": "流水线分类配文 🔀",
 }
 
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
 
+# 可选：节点加载时在后台预热 Doubao 连接（SMART_CAPTION_WARMUP=连接数）
+_warmup = os.environ.get("SMART_CAPTION_WARMUP", "")
+if _warmup.isdigit() and int(_warmup) > 0:
+    from .core.http_client import warm_up_in_background
+    warm_up_in_background(
+        os.environ.get("SMART_CAPTION_API_URL", "https://ark.cn-beijing.volces.com/api/v3/chat/completions"),
+        connections=int(_warmup)
+    )
+
 print("\n" + "=" * 60)
 print("✅ ComfyUI Smart Caption 节点加载成功")
 print("   - 图片分类器 📷")
 print("   - 智能配文生成器 ✍️")
 print("   - 批量图片加载器 📁")
 print("   - 多图上传器 🖼️")
+print("   - 融合分类配文 ⚡")
+print("   - 流水线分类配文 🔀")
 print("=" * 60 + "\n")
 
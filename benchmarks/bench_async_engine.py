@@ -0,0 +1,57 @@
+"""
+基准测试：线程池引擎 vs asyncio 引擎
+
+用本地模拟服务器（固定延迟）对比两种并发模型的吞吐量:
+    python benchmarks/bench_async_engine.py --images 500 --latency 0.3 --concurrency 200
+"""
+import argparse
+import os
+import time
+
+from mock_server import MockDoubaoServer
+from PIL import Image
+
+from plugin_loader import load_plugin
+
+load_plugin()
+from smart_caption.core import classifier  # noqa: E402
+
+# 关闭持久化响应缓存：重复请求会命中缓存，测到的就不是发送请求的耗时
+os.environ["SMART_CAPTION_CACHE"] = "0"
+
+
+def run(label, images, server, max_workers, engine):
+    start = time.perf_counter()
+    results = classifier.classify_images(
+        images,
+        "benchmark",
+        api_key="mock",
+        api_url=server.url,
+        model="mock",
+        max_workers=max_workers,
+        engine=engine
+    )
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for r in results if r.get('style_tag') == 'ERROR')
+    print(f"{label:<28} {elapsed:8.2f}s {len(images) / elapsed:10.1f} img/s   errors={errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.3, help="模拟单次请求延迟（秒）")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--size", type=int, default=256, help="测试图片边长")
+    args = parser.parse_args()
+
+    images = [Image.new("RGB", (args.size, args.size), (i % 256, 80, 160)) for i in range(args.images)]
+
+    print(f"images={args.images} latency={args.latency}s concurrency={args.concurrency}")
+    with MockDoubaoServer(latency=args.latency) as server:
+        run("thread (max_workers=5)", images, server, 5, "thread")
+        run(f"thread (max_workers={args.concurrency})", images, server, args.concurrency, "thread")
+        run(f"async (concurrency={args.concurrency})", images, server, args.concurrency, "async")
+
+
+if __name__ == "__main__":
+    main()
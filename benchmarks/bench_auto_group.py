@@ -0,0 +1,73 @@
+"""
+基准测试：平铺文件夹自动分组速度与准确度
+
+生成 --scenes 个场景、每个场景 --per-scene 张变体（平移、亮度变化、噪声），打乱顺序后
+计算特征（pHash + 颜色直方图）并聚类，统计耗时以及分组的纯度和完整度:
+    python benchmarks/bench_auto_group.py --scenes 150 --per-scene 20
+
+纯度：每个分组中占多数的场景所占比例；完整度：每个场景中占多数的分组所占比例
+"""
+import argparse
+import time
+from collections import Counter
+
+import numpy as np
+from PIL import Image
+
+from plugin_loader import load_plugin
+
+load_plugin()
+from smart_caption.core import image_similarity  # noqa: E402
+
+
+def make_images(scenes, per_scene, width, height, seed=0):
+    """每个场景一张低频随机底图，变体为其平移、整体亮度变化和加噪"""
+    rng = np.random.default_rng(seed)
+    images, truth = [], []
+    for scene in range(scenes):
+        base = np.asarray(Image.fromarray(
+            np.random.default_rng(scene).integers(0, 256, (6, 8, 3), dtype=np.uint8)
+        ).resize((width, height), Image.BICUBIC)).astype(np.int16)
+        for _ in range(per_scene):
+            shifted = np.roll(base, rng.integers(-width // 30, width // 30), axis=1)
+            noisy = shifted + rng.integers(-15, 15) + rng.normal(0, 6, base.shape)
+            images.append(Image.fromarray(np.clip(noisy, 0, 255).astype(np.uint8)))
+            truth.append(scene)
+    order = rng.permutation(len(images))
+    return [images[i] for i in order], np.array(truth)[order]
+
+
+def majority_ratio(keys, values):
+    """按 keys 分组后，每组中占多数的 values 的总占比"""
+    total = 0
+    for key in np.unique(keys):
+        total += Counter(values[keys == key].tolist()).most_common(1)[0][1]
+    return total / len(keys)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenes", type=int, default=150)
+    parser.add_argument("--per-scene", type=int, default=20)
+    parser.add_argument("--width", type=int, default=400)
+    parser.add_argument("--height", type=int, default=300)
+    args = parser.parse_args()
+
+    images, truth = make_images(args.scenes, args.per_scene, args.width, args.height)
+    print(f"images={len(images)} scenes={args.scenes} size={args.width}x{args.height}")
+
+    start = time.perf_counter()
+    hashes, hists = image_similarity.image_features(images)
+    features_time = time.perf_counter() - start
+    start = time.perf_counter()
+    labels = image_similarity.cluster_images(hashes, hists)
+    cluster_time = time.perf_counter() - start
+
+    print(f"features {features_time * 1000:8.0f} ms")
+    print(f"cluster  {cluster_time * 1000:8.0f} ms")
+    print(f"groups={labels.max() + 1} purity={majority_ratio(labels, truth):.3f} "
+          f"completeness={majority_ratio(truth, labels):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+基准测试：BatchImageLoader 解码速度
+
+对比串行全尺寸解码、并行全尺寸解码，以及得到同一目标长边的两种方式：全尺寸解码后缩放 vs JPEG draft 解码后缩放。
+为了让 1000 张大图的测试不受内存限制，解码后立即丢弃图片，只统计解码吞吐:
+    python benchmarks/bench_image_decode.py --count 1000 --width 4000 --height 3000 --workers 8 --long-edge 1024
+
+首次运行会在 --folder（默认临时目录）下生成测试JPEG，之后复用
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from plugin_loader import load_plugin
+
+load_plugin()
+from smart_caption.nodes.batch_image_loader import decode_image  # noqa: E402
+
+
+def make_jpegs(folder, count, width, height):
+    """生成测试图片：平滑渐变 + 轻微噪声（接近照片的压缩率）"""
+    os.makedirs(folder, exist_ok=True)
+    existing = [f for f in os.listdir(folder) if f.endswith('.jpg')]
+    if len(existing) >= count:
+        return
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width]
+    base = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=-1)
+    for i in range(len(existing), count):
+        noise = rng.integers(0, 24, size=(height, width, 3))
+        pixels = ((base + noise + i * 7) % 256).astype(np.uint8)
+        Image.fromarray(pixels).save(os.path.join(folder, f"{i:05d}.jpg"), quality=90)
+        if (i + 1) % 100 == 0:
+            print(f"   生成测试图片 {i + 1}/{count}")
+
+
+def run(label, paths, workers, long_edge, use_draft=True):
+    def _decode(path):
+        # 与 load_images_from_folder 相同的解码路径，只保留尺寸
+        return decode_image(path, long_edge, use_draft).size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        sizes = list(executor.map(_decode, paths))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed:8.2f}s {len(paths) / elapsed:8.1f} img/s   first={sizes[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder", default=os.path.join(tempfile.gettempdir(), "smart_caption_decode_bench"))
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--long-edge", type=int, default=1024, help="draft 模式的目标长边")
+    args = parser.parse_args()
+
+    make_jpegs(args.folder, args.count, args.width, args.height)
+    print(f"images={args.count} size={args.width}x{args.height} workers={args.workers} cpus={os.cpu_count()}")
+    paths = sorted(os.path.join(args.folder, f) for f in os.listdir(args.folder) if f.endswith('.jpg'))[:args.count]
+    run("serial, full resolution", paths, 1, 0)
+    run(f"parallel({args.workers}), full resolution", paths, args.workers, 0)
+    run(f"parallel({args.workers}), full + resize {args.long_edge}", paths, args.workers, args.long_edge, use_draft=False)
+    run(f"parallel({args.workers}), draft + resize {args.long_edge}", paths, args.workers, args.long_edge)
+
+
+if __name__ == "__main__":
+    main()
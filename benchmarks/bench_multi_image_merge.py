@@ -0,0 +1,72 @@
+"""
+基准测试：MultiImageUploader 合并速度
+
+对比逐帧 F.interpolate + torch.stack（原实现）与按尺寸分桶、预分配输出的 merge_stretched:
+    python benchmarks/bench_multi_image_merge.py --inputs 10 --frames 16
+
+默认 10 个输入、每个 16 帧；一半输入为最大尺寸（直接拷贝），另一半分属两种较小尺寸（需要缩放）
+"""
+import argparse
+import time
+
+import torch
+import torch.nn.functional as F
+
+from plugin_loader import load_plugin
+
+load_plugin()
+from smart_caption.nodes.multi_image_uploader import merge_stretched  # noqa: E402
+
+
+def merge_per_frame(images):
+    """原实现：拆成单帧，逐帧缩放后 stack"""
+    frames = [img[i] for img in images for i in range(img.shape[0])]
+    max_height = max(t.shape[0] for t in frames)
+    max_width = max(t.shape[1] for t in frames)
+    resized = []
+    for t in frames:
+        if t.shape[0] != max_height or t.shape[1] != max_width:
+            t_chw = t.permute(2, 0, 1).unsqueeze(0)
+            t = F.interpolate(t_chw, size=(max_height, max_width), mode='bilinear', align_corners=False)
+            t = t.squeeze(0).permute(1, 2, 0)
+        resized.append(t)
+    return torch.stack(resized, dim=0)
+
+
+def make_inputs(count, frames, height, width):
+    shapes = [(height, width), (height // 2, width // 2), (height * 3 // 4, width * 2 // 3)]
+    inputs = []
+    for i in range(count):
+        h, w = shapes[0] if i % 2 == 0 else shapes[1 + (i // 2) % 2]
+        inputs.append(torch.rand(frames, h, w, 3))
+    return inputs
+
+
+def run(label, fn, inputs, repeat):
+    fn(inputs)  # 预热
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(inputs)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms   shape={tuple(result.shape)}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--inputs", type=int, default=10)
+    parser.add_argument("--frames", type=int, default=16)
+    parser.add_argument("--height", type=int, default=512)
+    parser.add_argument("--width", type=int, default=512)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    inputs = make_inputs(args.inputs, args.frames, args.height, args.width)
+    print(f"inputs={args.inputs} frames={args.frames} max={args.width}x{args.height} threads={torch.get_num_threads()}")
+    expected = run("per-frame interpolate", merge_per_frame, inputs, args.repeat)
+    result = run("bucketed, preallocated", merge_stretched, inputs, args.repeat)
+    print(f"max abs diff: {(result - expected).abs().max().item():.2e}")
+
+
+if __name__ == "__main__":
+    main()
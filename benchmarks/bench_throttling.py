@@ -0,0 +1,72 @@
+"""
+基准测试：限流下的重试与自适应并发
+
+模拟服务器只能同时处理 --capacity 个请求，超出的直接返回 429，
+对比关闭重试（只有AIMD）与开启重试（指数退避 + AIMD）时的成功数、请求数和耗时:
+    python benchmarks/bench_throttling.py --images 200 --capacity 20 --concurrency 100
+"""
+import argparse
+import os
+import time
+
+from mock_server import MockDoubaoServer
+from PIL import Image
+
+from plugin_loader import load_plugin
+
+load_plugin()
+from smart_caption.core import classifier, retry  # noqa: E402
+
+# 三轮使用同一批图片：关闭持久化响应缓存，否则后两轮都是缓存命中，不会发送请求
+os.environ["SMART_CAPTION_CACHE"] = "0"
+
+
+def run(label, images, server, max_workers, engine, max_retries):
+    os.environ["SMART_CAPTION_MAX_RETRIES"] = str(max_retries)
+    # 每轮从满并发开始，互不影响
+    retry._limiter = None
+    server.reset_stats()
+    before = retry.stats_snapshot()
+    start = time.perf_counter()
+    results = classifier.classify_images(
+        images,
+        "benchmark",
+        api_key="mock",
+        api_url=server.url,
+        model="mock",
+        max_workers=max_workers,
+        engine=engine
+    )
+    elapsed = time.perf_counter() - start
+    after = retry.stats_snapshot()
+    errors = sum(1 for r in results if r.get('style_tag') == 'ERROR')
+    print(
+        f"{label:<26} {elapsed:7.2f}s  ok={len(images) - errors:<4} errors={errors:<4} "
+        f"requests={server.requests:<5} 429={server.throttled:<5} "
+        f"retries={after['retries'] - before['retries']:<5} "
+        f"limit={int(retry.get_concurrency_limiter().limit)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="模拟单次请求延迟（秒）")
+    parser.add_argument("--capacity", type=int, default=20, help="服务端并发容量")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--retry-after", type=float, default=None, help="429 响应附带的 Retry-After 秒数")
+    args = parser.parse_args()
+
+    # 模拟服务器延迟很短，退避基数相应缩小
+    retry.DEFAULT_RETRY_POLICY = retry.RetryPolicy(max_retries=8, base_delay=0.1, max_delay=2.0)
+    images = [Image.new("RGB", (64, 64), (i % 256, 80, 160)) for i in range(args.images)]
+
+    print(f"images={args.images} latency={args.latency}s capacity={args.capacity} concurrency={args.concurrency}")
+    with MockDoubaoServer(latency=args.latency, capacity=args.capacity, retry_after=args.retry_after) as server:
+        run("thread, no retry (AIMD)", images, server, args.concurrency, "thread", 0)
+        run("thread, retry + AIMD", images, server, args.concurrency, "thread", 8)
+        run("async, retry + AIMD", images, server, args.concurrency, "async", 8)
+
+
+if __name__ == "__main__":
+    main()
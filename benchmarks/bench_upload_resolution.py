@@ -0,0 +1,99 @@
+"""
+基准测试：上传分辨率 / JPEG质量 对 payload 大小、编码耗时、端到端延迟的影响
+
+    python benchmarks/bench_upload_resolution.py --folder D:/photos --limit 50
+    python benchmarks/bench_upload_resolution.py            # 不指定文件夹时使用合成的 4000x3000 图片
+
+端到端延迟 = 编码 + 通过本地模拟服务器发送请求（含固定模型延迟）；
+上传耗时按 --uplink-mbps 估算（本地回环网络无法体现真实带宽）
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+from mock_server import MockDoubaoServer
+from PIL import Image
+
+from plugin_loader import load_plugin
+
+load_plugin()
+from smart_caption.core import doubao_client  # noqa: E402
+from smart_caption.core.image_payload import EncodedImage, UploadPolicy  # noqa: E402
+
+# 关闭持久化响应缓存：重复请求会命中缓存，测到的就不是发送请求的耗时
+os.environ["SMART_CAPTION_CACHE"] = "0"
+
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+
+def load_images(folder, limit):
+    images = []
+    for filename in sorted(os.listdir(folder)):
+        if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+            images.append(Image.open(os.path.join(folder, filename)).convert('RGB'))
+            if len(images) >= limit:
+                break
+    return images
+
+
+def synthetic_images(count, width, height):
+    """带噪声的渐变图，JPEG 压缩率接近真实照片"""
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    images = []
+    for i in range(count):
+        noise = rng.normal(0, 24, (height, width, 3)).astype(np.float32)
+        arr = np.clip(gradient + noise + i * 7 % 64, 0, 255).astype(np.uint8)
+        images.append(Image.fromarray(arr))
+    return images
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folder", default="", help="真实图片文件夹（可选）")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--long-edges", default="0,512,768,1024,1280,2048")
+    parser.add_argument("--qualities", default="95,90,85")
+    parser.add_argument("--latency", type=float, default=0.3, help="模拟模型推理延迟（秒）")
+    parser.add_argument("--uplink-mbps", type=float, default=50.0, help="用于估算上传耗时的上行带宽")
+    args = parser.parse_args()
+
+    if args.folder:
+        images = load_images(args.folder, args.limit)
+    else:
+        images = synthetic_images(args.limit, 4000, 3000)
+    print(f"images={len(images)}  first={images[0].size}  latency={args.latency}s  uplink={args.uplink_mbps}Mbps")
+    print(f"{'long_edge':>9} {'quality':>7} {'avg KB':>9} {'encode ms':>10} {'upload ms*':>10} {'e2e ms':>9}")
+
+    with MockDoubaoServer(latency=args.latency) as server:
+        for long_edge in (int(x) for x in args.long_edges.split(",")):
+            for quality in (int(x) for x in args.qualities.split(",")):
+                policy = UploadPolicy(long_edge, quality)
+                total_bytes = 0
+                encode_time = 0.0
+                e2e_time = 0.0
+                for img in images:
+                    start = time.perf_counter()
+                    encoded = EncodedImage.from_pil(img, policy)
+                    encode_time += time.perf_counter() - start
+                    total_bytes += len(encoded.data_url)
+
+                    doubao_client.call_doubao_api_for_caption(
+                        encoded, f"bench {long_edge} {quality}", api_key="mock", api_url=server.url, model="mock"
+                    )
+                    e2e_time += time.perf_counter() - start
+
+                n = len(images)
+                avg_bytes = total_bytes / n
+                upload_ms = avg_bytes * 8 / (args.uplink_mbps * 1e6) * 1000
+                label = long_edge if long_edge else "original"
+                print(f"{label:>9} {quality:>7} {avg_bytes / 1024:>9.1f} {encode_time / n * 1000:>10.1f} "
+                      f"{upload_ms:>10.1f} {e2e_time / n * 1000 + upload_ms:>9.1f}")
+
+    print("* upload ms 为按上行带宽估算的值，已计入 e2e")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+本地 Doubao 模拟服务器（仅用于基准测试）
+模拟固定延迟的 chat completion 接口，支持 HTTP/1.1 keep-alive
+可设置并发容量：超过容量的请求直接返回 429 + Retry-After，用于模拟限流
+服务器运行在独立进程中，避免与被测客户端争抢 GIL
+"""
+import json
+import multiprocessing
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency, content, stats, capacity=0, retry_after=None):
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+            with stats['requests'].get_lock():
+                stats['requests'].value += 1
+            with stats['bytes'].get_lock():
+                stats['bytes'].value += length
+
+            with stats['in_flight'].get_lock():
+                over_capacity = capacity > 0 and stats['in_flight'].value >= capacity
+                if over_capacity:
+                    stats['throttled'].value += 1
+                else:
+                    stats['in_flight'].value += 1
+            if over_capacity:
+                self.send_response(429)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            try:
+                time.sleep(latency)
+            finally:
+                with stats['in_flight'].get_lock():
+                    stats['in_flight'].value -= 1
+
+            body = json.dumps({
+                "choices": [{"message": {"content": content}}]
+            }, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return _Handler
+
+
+def _serve(latency, content, stats, port_queue, capacity, retry_after):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency, content, stats, capacity, retry_after))
+    server.daemon_threads = True
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+class MockDoubaoServer:
+    """
+    用法:
+        with MockDoubaoServer(latency=0.2) as server:
+            call_doubao_api(..., api_url=server.url)
+            print(server.requests, server.bytes_received)
+    """
+
+    # 提高监听队列，避免数百个并发连接同时建立时被拒绝
+    ThreadingHTTPServer.request_queue_size = 1024
+
+    def __init__(self, latency=0.2, content='{"style_tag": "日常plog"}', capacity=0, retry_after=None):
+        """
+        Args:
+            capacity: 同时处理的请求上限，超出的请求返回 429（0 表示不限）
+            retry_after: 429 响应附带的 Retry-After 秒数（None 表示不附带）
+        """
+        self.stats = {
+            'requests': multiprocessing.Value('q', 0),
+            'bytes': multiprocessing.Value('q', 0),
+            'in_flight': multiprocessing.Value('q', 0),
+            'throttled': multiprocessing.Value('q', 0),
+        }
+        self._port_queue = multiprocessing.Queue()
+        self._process = multiprocessing.Process(
+            target=_serve,
+            args=(latency, content, self.stats, self._port_queue, capacity, retry_after),
+            daemon=True
+        )
+        self.port = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}/api/v3/chat/completions"
+
+    @property
+    def requests(self):
+        return self.stats['requests'].value
+
+    @property
+    def bytes_received(self):
+        return self.stats['bytes'].value
+
+    @property
+    def throttled(self):
+        return self.stats['throttled'].value
+
+    def reset_stats(self):
+        self.stats['requests'].value = 0
+        self.stats['bytes'].value = 0
+        self.stats['throttled'].value = 0
+
+    def __enter__(self):
+        self._process.start()
+        self.port = self._port_queue.get(timeout=10)
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
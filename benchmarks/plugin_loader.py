@@ -0,0 +1,25 @@
+"""
+把插件目录作为包导入（仅用于基准测试）
+节点模块使用相对导入（from ..core import ...），不能直接 `import nodes`
+"""
+import importlib.util
+import os
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "smart_caption"
+
+
+def load_plugin():
+    """导入插件包，之后即可 `from smart_caption.nodes.xxx import ...`"""
+    if PACKAGE_NAME in sys.modules:
+        return sys.modules[PACKAGE_NAME]
+    spec = importlib.util.spec_from_file_location(
+        PACKAGE_NAME,
+        os.path.join(REPO_ROOT, "__init__.py"),
+        submodule_search_locations=[REPO_ROOT]
+    )
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[PACKAGE_NAME] = module
+    spec.loader.exec_module(module)
+    return module
@@ -2,6 +2,21 @@
 from . import doubao_client
 from . import classifier
 from . import multi_pic
+from . import http_client
+from . import async_client
+from . import response_cache
+from . import image_payload
+from . import caption_pe
+from . import fused
+from . import retry
+from . import memory_stats
+from . import batch_layout
+from . import folder_manifest
+from . import decoded_cache
+from . import image_similarity
+from . import model_cascade
+from . import endpoint_pool
+from . import tensor_images
 
-__all__ = ['doubao_client', 'classifier', 'multi_pic']
+__all__ = ['doubao_client', 'classifier', 'multi_pic', 'http_client', 'async_client', 'response_cache', 'image_payload', 'caption_pe', 'fused', 'retry', 'memory_stats', 'batch_layout', 'folder_manifest', 'decoded_cache', 'image_similarity', 'model_cascade', 'endpoint_pool', 'tensor_images']
 
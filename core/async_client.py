@@ -0,0 +1,239 @@
+"""
+Doubao 异步客户端（ComfyUI版本）
+基于 asyncio + 信号量限制在途请求数，单线程即可维持数百个并发请求
+"""
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+import requests
+from PIL import Image
+
+try:
+    import aiohttp
+except ImportError:  # 未安装 aiohttp 时，退回到线程中执行共享连接池的同步请求
+    aiohttp = None
+
+from . import doubao_client, endpoint_pool
+from .http_client import get_http_client
+from .image_payload import EncodedImage
+from .response_cache import cached_call_async
+from .retry import RETRYABLE_STATUS, THROTTLE_STATUS, RetryableError, call_with_retry_async, parse_retry_after
+
+
+DEFAULT_CONCURRENCY = 64
+
+
+class AsyncDoubaoClient:
+    """
+    异步 Doubao 客户端
+
+    用法:
+        async with AsyncDoubaoClient(concurrency=200) as client:
+            result = await client.call_doubao_api(image, pe, api_key=..., ...)
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 60):
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self._semaphore = None
+        self._session = None
+        self._executor = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if aiohttp is not None:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        else:
+            get_http_client(pool_size=self.concurrency)
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _post(self, api_url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        发送请求，返回API原始JSON（429 / 5xx / 连接错误自动退避重试；配置了端点池时每次发送都重新选择端点）
+
+        信号量只在每次发送期间持有，重试前的退避等待不占用在途名额
+        """
+        if self._session is not None:
+            async def _send():
+                with endpoint_pool.route(api_url, headers, payload) as request:
+                    try:
+                        async with self._session.post(request.api_url, headers=request.headers, json=request.payload) as response:
+                            if response.status in RETRYABLE_STATUS:
+                                try:
+                                    response.raise_for_status()
+                                except aiohttp.ClientResponseError as e:
+                                    raise RetryableError(
+                                        e,
+                                        retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                                        throttled=response.status in THROTTLE_STATUS
+                                    )
+                            response.raise_for_status()
+                            return await response.json(content_type=None)
+                    except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                        raise RetryableError(e)
+
+            return await call_with_retry_async(_send, semaphore=self._semaphore)
+
+        # 未安装 aiohttp：同步请求（含重试等待）在线程池中执行，线程数即在途上限
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            doubao_client._post_chat_completion,
+            api_url,
+            headers,
+            payload,
+            self.timeout
+        )
+
+    async def _request(self, kind, build_payload, parse_response, cacheable, image, prompt, text_requirement, api_key, api_url, model):
+        """编码图片 → 查缓存 / 发送请求 → 解析结果"""
+        # 图片编码是CPU操作，放到线程中避免阻塞事件循环
+        payload = await asyncio.to_thread(build_payload, image, prompt, text_requirement, model)
+        headers = doubao_client.build_headers(api_key)
+
+        async def _fetch():
+            return parse_response(await self._post(api_url, headers, payload))
+
+        try:
+            return await cached_call_async(kind, payload, _fetch, cacheable=cacheable)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON 解析失败: {str(e)}, 原始内容: {e.doc}")
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"API 请求失败: {str(e)}")
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"API 请求失败: 超时 ({self.timeout}s)")
+        except Exception as e:
+            if aiohttp is not None and isinstance(e, aiohttp.ClientError):
+                raise RuntimeError(f"API 请求失败: {str(e)}")
+            raise RuntimeError(f"调用 Doubao API 时发生错误: {str(e)}")
+
+    async def call_doubao_api(
+        self,
+        image: Union[str, Image.Image, EncodedImage],
+        prompt: str,
+        text_requirement: str = "",
+        api_key: str = "",
+        api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+        model: str = "doubao-seed-1-6-250615"
+    ) -> Dict[str, Any]:
+        """异步版 doubao_client.call_doubao_api"""
+        return await self._request(
+            "classify",
+            doubao_client.build_classification_payload,
+            doubao_client.parse_classification_response,
+            doubao_client.is_cacheable_classification,
+            image, prompt, text_requirement, api_key, api_url, model
+        )
+
+    async def call_doubao_api_for_caption(
+        self,
+        image: Union[str, Image.Image, EncodedImage],
+        prompt: str,
+        text_requirement: str = "",
+        api_key: str = "",
+        api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+        model: str = "doubao-seed-1-6-250615"
+    ) -> str:
+        """异步版 doubao_client.call_doubao_api_for_caption"""
+        return await self._request(
+            "caption",
+            doubao_client.build_caption_payload,
+            doubao_client.parse_caption_response,
+            doubao_client.is_cacheable_caption,
+            image, prompt, text_requirement, api_key, api_url, model
+        )
+
+
+    async def call_doubao_api_for_group_caption(
+        self,
+        images: List[Union[str, Image.Image, EncodedImage]],
+        prompt: str,
+        text_requirement: str = "",
+        api_key: str = "",
+        api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+        model: str = "doubao-seed-1-6-250615"
+    ) -> str:
+        """异步版 doubao_client.call_doubao_api_for_group_caption"""
+        return await self._request(
+            "group_caption",
+            doubao_client.build_group_caption_payload,
+            doubao_client.parse_caption_response,
+            doubao_client.is_cacheable_caption,
+            images, prompt, text_requirement, api_key, api_url, model
+        )
+
+
+def run_coroutine_sync(coro):
+    """
+    在同步代码中运行协程
+
+    当前线程没有事件循环时直接 asyncio.run；
+    已有运行中的事件循环时，在独立线程中运行，避免嵌套事件循环报错
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    outcome = {}
+
+    def _runner():
+        try:
+            outcome['value'] = asyncio.run(coro)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=_runner)
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['value']
+
+
+def run_async_calls(
+    calls: Sequence[Tuple[str, Dict[str, Any]]],
+    concurrency: int = DEFAULT_CONCURRENCY
+) -> List[Any]:
+    """
+    同步包装：并发执行一批 Doubao 请求（供现有节点直接调用）
+
+    Args:
+        calls: [(kind, kwargs), ...]，kind 为 "classify" / "caption" / "group_caption"，
+               kwargs 与 doubao_client 中对应函数的参数一致
+        concurrency: 最大在途请求数
+
+    Returns:
+        与 calls 顺序一致的结果列表；失败的请求对应位置为 Exception 对象
+    """
+    async def _main():
+        async with AsyncDoubaoClient(concurrency=concurrency) as client:
+            methods = {
+                "classify": client.call_doubao_api,
+                "caption": client.call_doubao_api_for_caption,
+                "group_caption": client.call_doubao_api_for_group_caption,
+            }
+            return await asyncio.gather(
+                *(methods[kind](**kwargs) for kind, kwargs in calls),
+                return_exceptions=True
+            )
+
+    if not calls:
+        return []
+    return run_coroutine_sync(_main())
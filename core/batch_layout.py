@@ -0,0 +1,71 @@
+"""
+批次布局（ComfyUI版本）
+IMAGE batch 要求所有图片同尺寸；pad 模式下每张图片保持原尺寸居中放入统一画布（不放大），
+并用 image_sizes JSON 记录每张图片的原始尺寸和在画布中的区域，下游节点据此只上传原图区域
+"""
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# 画布边长向上取整到该值的倍数，减少不同批次间的形状种类
+PAD_BUCKET = 64
+
+RESIZE_MODES = ["stretch", "pad"]
+
+
+def _round_up(value: int, bucket: int) -> int:
+    return ((value + bucket - 1) // bucket) * bucket if bucket > 1 else value
+
+
+def pad_layout(sizes: Sequence[Tuple[int, int]], bucket: int = PAD_BUCKET) -> Dict[str, Any]:
+    """
+    计算 pad 模式的画布尺寸和每张图片的区域
+
+    Args:
+        sizes: 每张图片的 (width, height)
+        bucket: 画布边长取整倍数
+
+    Returns:
+        image_sizes 字典:
+        {"canvas": [W, H], "images": [{"width": w, "height": h, "box": [left, top, right, bottom]}, ...]}
+    """
+    canvas_w = _round_up(max(w for w, _ in sizes), bucket)
+    canvas_h = _round_up(max(h for _, h in sizes), bucket)
+    images = []
+    for w, h in sizes:
+        left = (canvas_w - w) // 2
+        top = (canvas_h - h) // 2
+        images.append({"width": w, "height": h, "box": [left, top, left + w, top + h]})
+    return {"canvas": [canvas_w, canvas_h], "images": images}
+
+
+def stretch_layout(sizes: Sequence[Tuple[int, int]]) -> Dict[str, Any]:
+    """stretch 模式（所有图片缩放到最大宽高）的 image_sizes：区域即整个画布"""
+    canvas_w = max(w for w, _ in sizes)
+    canvas_h = max(h for _, h in sizes)
+    return {
+        "canvas": [canvas_w, canvas_h],
+        "images": [{"width": w, "height": h, "box": [0, 0, canvas_w, canvas_h]} for w, h in sizes]
+    }
+
+
+def parse_image_boxes(image_sizes: str, tensor) -> Optional[List[Tuple[int, int, int, int]]]:
+    """
+    解析 image_sizes JSON，返回每张图片在画布中的区域
+
+    Returns:
+        [(left, top, right, bottom), ...]；为空、解析失败或与 IMAGE tensor 不匹配时返回 None
+    """
+    if not image_sizes:
+        return None
+    try:
+        data = json.loads(image_sizes)
+        canvas_w, canvas_h = data["canvas"]
+        boxes = [tuple(int(v) for v in item["box"]) for item in data["images"]]
+    except (ValueError, KeyError, TypeError):
+        print(f"⚠️  image_sizes 解析失败，将上传整张画布")
+        return None
+    if len(boxes) != tensor.shape[0] or (canvas_h, canvas_w) != tuple(tensor.shape[1:3]):
+        print(f"⚠️  image_sizes 与图片batch不匹配，将上传整张画布")
+        return None
+    return boxes
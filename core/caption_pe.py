@@ -0,0 +1,39 @@
+"""
+配文PE选择
+根据分类标签选择对应的单图/多图配文PE（配文节点、融合节点、流水线节点共用）
+"""
+from typing import Dict
+
+
+# 配文PE的键：{标签}_单图 / {标签}_多图
+CAPTION_PE_KEYS = [
+    "日常plog_单图", "日常plog_多图",
+    "人像自拍_单图", "人像自拍_多图",
+    "抽象文案_单图", "抽象文案_多图",
+    "图片详细描述_单图", "图片详细描述_多图",
+    "其他_单图", "其他_多图",
+]
+
+
+def select_pe(style_tag: str, pe_configs: Dict[str, str]) -> str:
+    """
+    根据分类标签自动选择对应的PE（单图或多图）
+    
+    Args:
+        style_tag: 分类标签（如 "日常plog" 或 "日常plog_multi_pic"）
+        pe_configs: PE配置字典
+    
+    Returns:
+        对应的PE文本
+    """
+    # 判断是单图还是多图
+    if "_multi_pic" in style_tag:
+        # 多图模式
+        base_tag = style_tag.replace("_multi_pic", "")
+        pe_key = f"{base_tag}_多图"
+    else:
+        # 单图模式
+        pe_key = f"{style_tag}_单图"
+    
+    # 返回对应的PE，如果找不到则使用通用PE
+    return pe_configs.get(pe_key, pe_configs.get("其他_单图", "请生成配文"))
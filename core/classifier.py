@@ -2,37 +2,60 @@
 图片分类器（ComfyUI版本）
 支持单图和多图分类，集成关联判断
 """
-from typing import List, Dict, Any, Union
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import math
+import random
+import threading
+from collections import Counter
+from typing import Callable, List, Dict, Any, Optional, Sequence, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from PIL import Image
-from .doubao_client import call_doubao_api
+from .doubao_client import call_doubao_api, call_doubao_api_multi_images
+from .http_client import get_http_client
+from .image_payload import EncodedImage
+from .async_client import run_async_calls
 from .multi_pic import multi_image_relation_check
+from .model_cascade import ModelCascade
+
+
+# 关联判断阈值：占比最高的标签达到该比例即视为有关联
+RELATION_THRESHOLD = 0.5
+
+
+def _validate_classification(result: Dict[str, Any]) -> Dict[str, Any]:
+    """验证返回格式"""
+    if 'style_tag' not in result:
+        raise ValueError(f"API 返回结果缺少 style_tag 字段: {result}")
+    return result
 
 
 def classify_single_image(
-    image: Union[str, Image.Image],
+    image: Union[str, Image.Image, EncodedImage],
     classification_pe: str,
     text_requirement: str = "",
     api_key: str = "",
     api_url: str = "",
-    model: str = ""
+    model: Union[str, ModelCascade] = ""
 ) -> Dict[str, Any]:
     """
     对单张图片进行分类
     
     Args:
-        image: PIL Image对象或文件路径
+        image: PIL Image对象、文件路径或EncodedImage
         classification_pe: 分类PE
         text_requirement: 文本需求（可选）
         api_key: Doubao API Key
         api_url: API URL
-        model: 模型名称
+        model: 模型名称，或 ModelCascade（先快速模型，必要时升级到强模型）
     
     Returns:
         {"style_tag": "日常plog"} 或
         {"style_tag": "文案", "text": "..."}
     """
     try:
+        if isinstance(model, ModelCascade):
+            return _validate_classification(
+                model.classify(image, classification_pe, text_requirement, api_key, api_url)
+            )
         result = call_doubao_api(
             image=image,
             prompt=classification_pe,
@@ -42,11 +65,7 @@ def classify_single_image(
             model=model
         )
         
-        # 验证返回格式
-        if 'style_tag' not in result:
-            raise ValueError(f"API 返回结果缺少 style_tag 字段: {result}")
-        
-        return result
+        return _validate_classification(result)
     
     except Exception as e:
         return {
@@ -55,36 +74,59 @@ def classify_single_image(
         }
 
 
-def classify_multi_images(
-    images: List[Union[str, Image.Image]],
+def classify_images(
+    images: List[Union[str, Image.Image, EncodedImage]],
     classification_pe: str,
     text_requirement: str = "",
     api_key: str = "",
     api_url: str = "",
     model: str = "",
-    max_workers: int = 5
-) -> Dict[str, Any]:
+    max_workers: int = 5,
+    engine: str = "thread"
+) -> List[Dict[str, Any]]:
     """
-    对多张图片进行分类并判断关联性
+    并发对每张图片单独分类（不做关联判断）
     
     Args:
-        images: PIL Image列表或文件路径列表
+        images: PIL Image、文件路径或EncodedImage列表
         classification_pe: 分类PE
         text_requirement: 文本需求（可选）
         api_key: Doubao API Key
         api_url: API URL
         model: 模型名称
-        max_workers: 并发线程数
+        max_workers: 并发数（thread 为线程数，async 为在途请求上限）
+        engine: 并发引擎，"thread"（线程池）或 "async"（asyncio；模型级联固定使用线程池）
     
     Returns:
-        有关联: {"style_tag": "日常plog_multi_pic"}
-        无关联: {"style_tags": ["人像自拍", "日常plog", "抽象文案"]}
+        与 images 顺序一致的分类结果列表
     """
-    if not images or len(images) < 2:
-        raise ValueError("多图模式至少需要2张图片")
+    if engine == "async" and not isinstance(model, ModelCascade):
+        calls = [
+            ("classify", {
+                "image": img,
+                "prompt": classification_pe,
+                "text_requirement": text_requirement,
+                "api_key": api_key,
+                "api_url": api_url,
+                "model": model
+            })
+            for img in images
+        ]
+        individual_results = []
+        for outcome in run_async_calls(calls, concurrency=max_workers):
+            try:
+                if isinstance(outcome, Exception):
+                    raise outcome
+                individual_results.append(_validate_classification(outcome))
+            except Exception as e:
+                individual_results.append({
+                    'style_tag': 'ERROR',
+                    'error': str(e)
+                })
+        return individual_results
     
-    # 并发调用单图分类
-    individual_results = []
+    # 连接池至少与并发线程数一样大，避免多余连接被丢弃后重新握手
+    get_http_client(pool_size=max_workers)
     
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # 提交所有任务
@@ -117,15 +159,102 @@ def classify_multi_images(
         # 按原始顺序排列结果
         individual_results = [idx_to_result[i] for i in range(len(images))]
     
+    return individual_results
+
+
+def classify_images_in_groups(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    classification_pe: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = "",
+    images_per_request: int = 8,
+    max_workers: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    多图请求模式：每次请求携带最多 images_per_request 张图片，由模型逐张输出标签
+    N 张图片只需 ceil(N / images_per_request) 次请求
+    
+    某个分块的请求失败或输出校验不通过时，该分块回退为逐张分类
+    
+    Returns:
+        与 images 顺序一致的分类结果列表
+    """
+    images_per_request = max(1, int(images_per_request))
+    chunks = [images[i:i + images_per_request] for i in range(0, len(images), images_per_request)]
+    
+    def _classify_chunk(chunk):
+        return classify_chunk(chunk, classification_pe, text_requirement, api_key, api_url, model, max_workers)
+    
+    get_http_client(pool_size=max_workers)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        chunk_results = list(executor.map(_classify_chunk, chunks))
+    
+    return [result for results in chunk_results for result in results]
+
+
+def classify_chunk(
+    chunk: List[Union[str, Image.Image, EncodedImage]],
+    classification_pe: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = "",
+    max_workers: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    一次请求分类一个分块（单张图片走单图请求）；失败时回退为逐张分类
+    
+    Returns:
+        与 chunk 顺序一致的分类结果列表
+    """
+    if len(chunk) == 1:
+        return [classify_single_image(chunk[0], classification_pe, text_requirement, api_key, api_url, model)]
+    try:
+        if isinstance(model, ModelCascade):
+            return model.classify_multi(chunk, classification_pe, text_requirement, api_key, api_url)
+        return call_doubao_api_multi_images(
+            images=chunk,
+            prompt=classification_pe,
+            text_requirement=text_requirement,
+            api_key=api_key,
+            api_url=api_url,
+            model=model
+        )
+    except Exception as e:
+        print(f"   ⚠️  多图请求失败，回退为逐张分类（{len(chunk)}张）: {str(e)}")
+        return classify_images(
+            chunk, classification_pe, text_requirement, api_key, api_url, model,
+            max_workers=max_workers
+        )
+
+
+def relate_classifications(
+    individual_results: List[Dict[str, Any]],
+    prior_tags: Sequence[str] = ()
+) -> Dict[str, Any]:
+    """
+    根据逐张分类结果做关联判断
+    
+    Args:
+        individual_results: 逐张分类结果
+        prior_tags: 同组中不在本次结果里的图片已有的标签（增量处理时清单中未变化的同组文件），只参与投票
+    
+    Returns:
+        有关联: {"style_tag": "日常plog_multi_pic"}
+        无关联: {"style_tags": ["人像自拍", "日常plog", "抽象文案"]}
+    """
     # 提取所有 style_tag
     tags = [result.get('style_tag', 'ERROR') for result in individual_results]
     
     # 调用关联判断函数
     try:
+        votes = tags + list(prior_tags)
         relation_result = multi_image_relation_check(
-            images=list(range(len(images))),  # 传索引即可
-            tags=tags,
-            threshold=0.5
+            images=list(range(len(votes))),  # 传索引即可
+            tags=votes,
+            threshold=RELATION_THRESHOLD
         )
         
         if relation_result['result'] == 'yes':
@@ -146,3 +275,446 @@ def classify_multi_images(
             'error': str(e)
         }
 
+
+def expand_tags(result: Dict[str, Any], count: int) -> List[str]:
+    """把分类结果（统一标签或标签列表）展开为每张图的标签，不足的位置补 ERROR"""
+    if 'style_tag' in result:
+        return [result['style_tag']] * count
+    tags = list(result.get('style_tags', []))
+    return (tags + ['ERROR'] * count)[:count]
+
+
+def _finish_group(results: List[Dict[str, Any]], prior_tags: Sequence[str] = ()) -> Dict[str, Any]:
+    """组内逐张结果 → 组结果（单图组返回单图结果，多图组或有 prior_tags 时做关联判断）"""
+    if not results:
+        return {'style_tags': []}
+    if len(results) == 1 and not prior_tags:
+        return results[0]
+    return relate_classifications(results, prior_tags)
+
+
+def spread_order(count: int) -> List[int]:
+    """
+    组内请求顺序：以组大小为种子的固定随机排列
+    
+    前若干张分散在整组中（连拍、相邻的相似图片不会集中在前面），
+    也不会像等间隔抽样那样与周期性的排列重合；相同大小的分组每次顺序相同
+    """
+    order = list(range(count))
+    random.Random(count).shuffle(order)
+    return order
+
+
+class VoteTally:
+    """
+    关联判断的提前表决计数
+
+    relate_classifications 的结论只取决于占比最高的标签是否达到 RELATION_THRESHOLD；
+    当某个标签已达到所需票数、且剩余票数全部投给其他任一标签也无法追平时，
+    结论（有关联 + 该标签）已确定，剩余请求不会改变 style_tag
+
+    失败的请求（ERROR）单独计数：不会被提前判定为统一标签，但仍作为追平的一方参与判断，
+    vote_sample 为 0 时结论与完整分类一致
+    """
+
+    def __init__(self, total: int, threshold: float = RELATION_THRESHOLD):
+        self.total = total
+        self.need = max(1, math.ceil(threshold * total - 1e-9))
+        self.counts = Counter()
+        self.errors = 0
+        self.received = 0
+
+    def add(self, tag: str):
+        if tag == 'ERROR':
+            self.errors += 1
+        else:
+            self.counts[tag] += 1
+        self.received += 1
+
+    def decided_tag(self) -> Optional[str]:
+        """已确定有关联时返回占比最高的标签，否则返回 None"""
+        if not self.counts:
+            return None
+        ranked = self.counts.most_common(2)
+        tag, count = ranked[0]
+        runner_up = max(ranked[1][1] if len(ranked) > 1 else 0, self.errors)
+        remaining = self.total - self.received
+        if count >= self.need and count > runner_up + remaining:
+            return tag
+        return None
+
+
+class VoteStats:
+    """进程内累计的提前表决统计（配合 vote_stats_snapshot / format_vote_stats_delta 输出单次运行的数据）"""
+
+    FIELDS = ("groups", "decided_early", "requests", "skipped")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str, n: int = 1):
+        with self._lock:
+            self._counts[field] += n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+vote_stats = VoteStats()
+
+
+def vote_stats_snapshot() -> Dict[str, int]:
+    """节点运行前调用，配合 format_vote_stats_delta 输出本次运行节省的请求数"""
+    return vote_stats.snapshot()
+
+
+def format_vote_stats_delta(before: Optional[Dict[str, int]]) -> str:
+    """格式化一次节点运行期间的提前表决统计（没有使用提前表决时返回空字符串）"""
+    if before is None:
+        return ""
+    after = vote_stats.snapshot()
+    delta = {field: after[field] - before[field] for field in VoteStats.FIELDS}
+    if not delta["groups"]:
+        return ""
+    return (
+        f"🗳️ 提前表决: {delta['groups']} 组中 {delta['decided_early']} 组提前确定，"
+        f"发送 {delta['requests']} 次 / 节省 {delta['skipped']} 次请求"
+    )
+
+
+def classify_groups_voting(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    group_ranges: Sequence[Tuple[int, int]],
+    classification_pe: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = "",
+    max_workers: int = 5,
+    vote_sample: int = 0,
+    on_group_done: Optional[Callable[[int, Dict[str, Any], List[Dict[str, Any]]], None]] = None,
+    prior_tags: Optional[Sequence[Sequence[str]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    提前表决的分组分类（逐张请求，所有分组共享一个线程池）
+    
+    - 组内按 spread_order 顺序提交，线程池每次执行 max_workers 个（一波），每个结果返回后重新计票
+    - 某组结论确定为「有关联」时，取消该组还在排队的请求，组内每张图使用统一标签
+    - 结论为「无关联」时仍需每张图的标签（配文按逐张标签选PE），该组剩余请求照常完成
+    - vote_sample > 0 时，超过该数量的大分组只让随机抽取的 vote_sample 张（spread_order 的前若干张）参与表决：
+      样本达到阈值即判定有关联（近似结论），否则再分类其余图片
+    
+    vote_sample 为 0 时结论与 classify_groups 完全一致；prior_tags（每组已有的标签）开始时即计入票数
+    
+    Returns:
+        与 group_ranges 顺序一致的组结果列表；提前确定的分组中未请求的图片，
+        逐张结果为 {"style_tag": 统一标签前缀, "skipped": True}
+    """
+    group_results: List[Optional[Dict[str, Any]]] = [None] * len(group_ranges)
+    priors = prior_tags or [()] * len(group_ranges)
+    states = []
+    for (start, end), prior in zip(group_ranges, priors):
+        order = spread_order(end - start)
+        voters = order[:vote_sample] if 0 < vote_sample < len(order) else order
+        tally = VoteTally(len(voters) + len(prior))
+        for tag in prior:
+            tally.add(tag)
+        states.append({
+            "start": start,
+            "voter_order": voters,
+            "results": [None] * (end - start),
+            "voting": end - start + len(prior) >= 2,
+            "voters": set(voters),
+            "rest": order[len(voters):],
+            "tally": tally,
+            "prior": prior,
+            "pending": set(),
+            "requested": 0,
+            "decided": None
+        })
+    vote_stats.incr("groups", sum(1 for state in states if state["voting"]))
+    
+    get_http_client(pool_size=max_workers)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    future_to_unit = {}
+    
+    def _submit(group_idx, offsets):
+        state = states[group_idx]
+        for offset in offsets:
+            future = executor.submit(
+                classify_single_image, images[state["start"] + offset],
+                classification_pe, text_requirement, api_key, api_url, model
+            )
+            future_to_unit[future] = (group_idx, offset)
+            state["pending"].add(future)
+            state["requested"] += 1
+    
+    def _complete(group_idx, group_result):
+        state = states[group_idx]
+        results = state["results"]
+        if state["decided"] is not None:
+            results = [
+                result if result is not None else {'style_tag': state["decided"], 'skipped': True}
+                for result in results
+            ]
+        if state["voting"]:
+            vote_stats.incr("requests", state["requested"])
+            vote_stats.incr("skipped", len(results) - state["requested"])
+        group_results[group_idx] = group_result
+        if on_group_done:
+            on_group_done(group_idx, group_result, results)
+    
+    try:
+        for group_idx, state in enumerate(states):
+            if state["results"]:
+                _submit(group_idx, state["voter_order"])
+            else:
+                _complete(group_idx, _finish_group([]))
+        
+        while future_to_unit:
+            done, _ = wait(list(future_to_unit), return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = future_to_unit.pop(future, None)
+                if unit is None:
+                    # 同一批完成的请求中，所在分组已提前确定
+                    continue
+                group_idx, offset = unit
+                state = states[group_idx]
+                state["pending"].discard(future)
+                if future.cancelled() or group_results[group_idx] is not None:
+                    continue
+                state["results"][offset] = future.result()
+                
+                if not state["voting"]:
+                    if not state["pending"]:
+                        _complete(group_idx, _finish_group(state["results"], state["prior"]))
+                    continue
+                
+                tally = state["tally"]
+                if offset in state["voters"]:
+                    tally.add(state["results"][offset].get('style_tag', 'ERROR'))
+                    tag = tally.decided_tag()
+                    if tag is None and tally.received == tally.total and state["rest"]:
+                        # 抽样表决结束：样本达到阈值即判定有关联，否则（包括失败的请求过多）分类其余图片
+                        ranked = tally.counts.most_common(1)
+                        if ranked and ranked[0][1] >= tally.need:
+                            tag = ranked[0][0]
+                        else:
+                            _submit(group_idx, state["rest"])
+                    if tag is not None:
+                        # 取消还在排队的请求；已发出的请求不再等待（结果丢弃）
+                        for pending in state["pending"]:
+                            future_to_unit.pop(pending, None)
+                            if pending.cancel():
+                                state["requested"] -= 1
+                        state["pending"].clear()
+                        state["decided"] = tag
+                        vote_stats.incr("decided_early")
+                        _complete(group_idx, {'style_tag': f"{tag}_multi_pic"})
+                        continue
+                
+                if not state["pending"]:
+                    _complete(group_idx, _finish_group(state["results"], state["prior"]))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    return group_results
+
+
+def classify_groups(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    group_ranges: Sequence[Tuple[int, int]],
+    classification_pe: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = "",
+    max_workers: int = 5,
+    engine: str = "thread",
+    request_mode: str = "per_image",
+    images_per_request: int = 8,
+    on_group_done: Optional[Callable[[int, Dict[str, Any], List[Dict[str, Any]]], None]] = None,
+    early_vote: bool = False,
+    vote_sample: int = 0,
+    duplicate_of: Optional[Sequence[int]] = None,
+    prior_tags: Optional[Sequence[Sequence[str]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    对多个分组统一调度分类：所有分组的请求一次性提交，共享同一个并发上限，
+    完成后按组重新组装（单图组返回单图结果，多图组做关联判断）
+    
+    Args:
+        images: 整个batch的图片列表
+        group_ranges: 每组的 (start, end) 下标区间
+        max_workers: 全局并发数（thread 为线程数，async 为在途请求上限）
+        engine: 并发引擎，"thread" 或 "async"（group 请求模式固定使用线程池）
+        request_mode: "per_image" 或 "group"（分块不跨组）
+        on_group_done: 某组全部分类完成时立即回调 (组序号, 组结果, 逐张结果)（仅线程池调度）
+        early_vote: 提前表决（per_image 模式，使用线程池），见 classify_groups_voting
+        vote_sample: 提前表决时大分组只让随机抽取的这么多张参与表决（0 = 全部参与）
+        duplicate_of: 近似重复去重（image_similarity.near_duplicates 的输出）：只请求每簇的代表图，
+                      结果复制给簇内每张图后再按组做关联判断（与 early_vote 同时开启时只去重）
+        prior_tags: 每组已有的标签（增量处理时清单中未变化的同组文件），只参与该组的关联投票
+    
+    Returns:
+        与 group_ranges 顺序一致的组结果列表
+    """
+    group_ranges = [(int(start), int(end)) for start, end in group_ranges]
+    priors = prior_tags or [()] * len(group_ranges)
+    
+    if duplicate_of is not None:
+        if early_vote and request_mode != "group":
+            print(f"   ⚠️  近似去重与提前表决不同时使用，本次只去重")
+    elif early_vote and request_mode != "group":
+        return classify_groups_voting(
+            images, group_ranges, classification_pe, text_requirement, api_key, api_url, model,
+            max_workers=max_workers, vote_sample=vote_sample, on_group_done=on_group_done, prior_tags=prior_tags
+        )
+    
+    group_results: List[Optional[Dict[str, Any]]] = [None] * len(group_ranges)
+    
+    group_of = {idx: (group_idx, idx - start)
+                for group_idx, (start, end) in enumerate(group_ranges) for idx in range(start, end)}
+    # 每张图片的结果来源：去重时为所在簇的代表图，否则为自身
+    members: Dict[int, List[int]] = {}
+    for idx in group_of:
+        source = duplicate_of[idx] if duplicate_of is not None and duplicate_of[idx] in group_of else idx
+        members.setdefault(source, []).append(idx)
+    
+    pending = [end - start for start, end in group_ranges]
+    partial = [[None] * (end - start) for start, end in group_ranges]
+    for group_idx, count in enumerate(pending):
+        if count == 0:
+            group_results[group_idx] = _finish_group([])
+    
+    def _fill(indices, results):
+        # 结果写入簇内每张图片，所在分组全部完成时立即组装
+        for idx, result in zip(indices, results):
+            for member in members[idx]:
+                group_idx, offset = group_of[member]
+                partial[group_idx][offset] = result
+                pending[group_idx] -= 1
+                if pending[group_idx] == 0:
+                    group_results[group_idx] = _finish_group(partial[group_idx], priors[group_idx])
+                    if on_group_done:
+                        on_group_done(group_idx, group_results[group_idx], partial[group_idx])
+    
+    if engine == "async" and request_mode != "group":
+        flat_indices = list(members)
+        flat_results = classify_images(
+            [images[idx] for idx in flat_indices], classification_pe, text_requirement, api_key, api_url, model,
+            max_workers=max_workers, engine="async"
+        )
+        _fill(flat_indices, flat_results)
+        return group_results
+    
+    # 工作单元：(组序号, 图片下标列表)；per_image 模式每张图一个单元，group 模式按组分块（只含需要请求的图片）
+    chunk_size = max(1, int(images_per_request)) if request_mode == "group" else 1
+    units = []
+    for group_idx, (start, end) in enumerate(group_ranges):
+        requested = [idx for idx in range(start, end) if idx in members]
+        for offset in range(0, len(requested), chunk_size):
+            units.append((group_idx, requested[offset:offset + chunk_size]))
+    
+    def _run_unit(unit):
+        _, indices = unit
+        # 回退时组内串行，避免在共享线程池里再嵌套大线程池
+        return classify_chunk(
+            [images[idx] for idx in indices], classification_pe, text_requirement, api_key, api_url, model, max_workers=1
+        )
+    
+    get_http_client(pool_size=max_workers)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(units) or 1))) as executor:
+        future_to_unit = {executor.submit(_run_unit, unit): unit for unit in units}
+        for future in as_completed(future_to_unit):
+            _, indices = future_to_unit[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [{'style_tag': 'ERROR', 'error': str(e)}] * len(indices)
+            _fill(indices, results)
+    
+    return group_results
+
+
+def classify_multi_images(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    classification_pe: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = "",
+    max_workers: int = 5,
+    engine: str = "thread",
+    request_mode: str = "per_image",
+    images_per_request: int = 8,
+    early_vote: bool = False,
+    vote_sample: int = 0,
+    duplicate_of: Optional[Sequence[int]] = None
+) -> Dict[str, Any]:
+    """
+    对多张图片进行分类并判断关联性
+    
+    Args:
+        images: PIL Image、文件路径或EncodedImage列表
+        classification_pe: 分类PE
+        text_requirement: 文本需求（可选）
+        api_key: Doubao API Key
+        api_url: API URL
+        model: 模型名称
+        max_workers: 并发数（thread 为线程数，async 为在途请求上限）
+        engine: 并发引擎，"thread"（线程池）或 "async"（asyncio）
+        request_mode: "per_image"（每张图一次请求）或 "group"（一次请求携带多张图）
+        images_per_request: group 模式下单次请求的图片数上限（受模型限制）
+        early_vote / vote_sample: 提前表决（per_image 模式），见 classify_groups_voting
+        duplicate_of: 近似重复去重，见 classify_groups
+    
+    Returns:
+        有关联: {"style_tag": "日常plog_multi_pic"}
+        无关联: {"style_tags": ["人像自拍", "日常plog", "抽象文案"]}
+    """
+    if not images or len(images) < 2:
+        raise ValueError("多图模式至少需要2张图片")
+    
+    if duplicate_of is not None:
+        return classify_groups(
+            images, [(0, len(images))], classification_pe, text_requirement, api_key, api_url, model,
+            max_workers=max_workers, engine=engine, request_mode=request_mode,
+            images_per_request=images_per_request, early_vote=early_vote, duplicate_of=duplicate_of
+        )[0]
+    
+    if early_vote and request_mode != "group":
+        return classify_groups_voting(
+            images, [(0, len(images))], classification_pe, text_requirement, api_key, api_url, model,
+            max_workers=max_workers, vote_sample=vote_sample
+        )[0]
+    
+    if request_mode == "group":
+        # 一次请求携带多张图片，逐张标签在本地做关联判断
+        individual_results = classify_images_in_groups(
+            images,
+            classification_pe,
+            text_requirement,
+            api_key,
+            api_url,
+            model,
+            images_per_request=images_per_request,
+            max_workers=max_workers
+        )
+    else:
+        # 并发调用单图分类
+        individual_results = classify_images(
+            images,
+            classification_pe,
+            text_requirement,
+            api_key,
+            api_url,
+            model,
+            max_workers=max_workers,
+            engine=engine
+        )
+    
+    return relate_classifications(individual_results)
+
@@ -0,0 +1,156 @@
+"""
+解码结果磁盘缓存（ComfyUI版本）
+把 BatchImageLoader 解码后的整批图片以 uint8 .npy 保存，重启后再次加载未变化的文件夹时
+直接内存映射该文件，不再解码。键为 文件夹指纹 + 加载参数（数量、解码长边、缩放方式）
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from .response_cache import DEFAULT_CACHE_DIR
+
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024 * 1024
+CACHE_VERSION = 1
+
+
+class DecodedBatchCache:
+    """
+    解码结果缓存目录
+
+    每个条目两个文件：<key>.npy（uint8 [B, H, W, C]）和 <key>.json（分组、文件路径、布局等元数据）；
+    超过 max_bytes 时按最近使用时间（文件 mtime，命中时刷新）删除最旧的条目（LRU）
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(fingerprint: str, params: Dict[str, Any]) -> str:
+        """根据文件夹指纹和加载参数生成缓存键"""
+        digest = hashlib.sha256(f"v{CACHE_VERSION}\0{fingerprint}\0".encode("utf-8"))
+        digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key)
+        return base + ".npy", base + ".json"
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Dict[str, Any]]]:
+        """
+        读取缓存
+
+        Returns:
+            (内存映射的 uint8 数组, 元数据)；未命中或文件损坏时返回 None
+        """
+        array_path, meta_path = self._paths(key)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # copy-on-write 映射：只读取需要的页，转换为 tensor 时不会改动缓存文件
+            array = np.load(array_path, mmap_mode="c")
+        except (OSError, ValueError) as e:
+            print(f"⚠️  解码缓存读取失败，将重新解码: {str(e)}")
+            self._remove(key)
+            return None
+        now = time.time()
+        for path in (array_path, meta_path):
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+        return array, meta
+
+    def put(self, key: str, shape: Tuple[int, ...], fill, meta: Dict[str, Any]):
+        """
+        写入缓存
+
+        Args:
+            shape: uint8 数组形状
+            fill: fill(out) 逐张写入内存映射的数组 out（避免在内存中再拼一份整批 uint8）
+            meta: 元数据（可 JSON 序列化）
+        """
+        array_path, meta_path = self._paths(key)
+        tmp_suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp_array = array_path + tmp_suffix
+        tmp_meta = meta_path + tmp_suffix
+        try:
+            out = np.lib.format.open_memmap(tmp_array, mode="w+", dtype=np.uint8, shape=tuple(shape))
+            fill(out)
+            out.flush()
+            del out
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            # 先替换数组再替换元数据：元数据存在即表示条目完整
+            os.replace(tmp_array, array_path)
+            os.replace(tmp_meta, meta_path)
+        except OSError as e:
+            print(f"⚠️  解码缓存写入失败: {str(e)}")
+            for path in (tmp_array, tmp_meta):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        self.evict(keep=key)
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def evict(self, keep: Optional[str] = None):
+        """按最近使用时间删除最旧的条目，直到总大小不超过 max_bytes（keep 指定的条目不删除）"""
+        with self._lock:
+            entries = {}
+            for entry in os.scandir(self.cache_dir):
+                key, ext = os.path.splitext(entry.name)
+                if ext not in (".npy", ".json"):
+                    continue
+                stat = entry.stat()
+                size, used = entries.get(key, (0, 0.0))
+                entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+            total = sum(size for size, _ in entries.values())
+            for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+                if total <= self.max_bytes:
+                    break
+                if key == keep:
+                    continue
+                self._remove(key)
+                total -= size
+
+
+_cache: Optional[DecodedBatchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_decoded_cache() -> Optional[DecodedBatchCache]:
+    """
+    获取进程级共享的解码结果缓存
+
+    环境变量:
+        SMART_CAPTION_CACHE_DIR                缓存目录（与响应缓存相同，条目保存在其下的 decoded/）
+        SMART_CAPTION_DECODED_CACHE_MAX_MB     缓存上限（MB，默认 4096）
+    """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_dir = os.environ.get("SMART_CAPTION_CACHE_DIR", DEFAULT_CACHE_DIR)
+                max_mb = float(os.environ.get("SMART_CAPTION_DECODED_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024))
+                try:
+                    _cache = DecodedBatchCache(os.path.join(cache_dir, "decoded"), max_bytes=int(max_mb * 1024 * 1024))
+                except OSError as e:
+                    print(f"⚠️  解码缓存初始化失败，将不使用缓存: {str(e)}")
+                    return None
+    return _cache
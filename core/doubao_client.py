@@ -2,90 +2,119 @@
 Doubao API 客户端（ComfyUI版本）
 用于调用豆包大模型的图片分类和配文生成接口
 """
-import base64
 import json
 import requests
-import io
-from typing import Dict, Any, Optional, Union
-from pathlib import Path
+from typing import Dict, Any, List, Optional, Union
 from PIL import Image
+from .endpoint_pool import route
+from .http_client import get_http_client
+from .image_payload import EncodedImage
+from .response_cache import cached_call
+from .retry import RETRYABLE_STATUS, THROTTLE_STATUS, RetryableError, call_with_retry, parse_retry_after
 
 
 def pil_to_base64(image: Image.Image) -> str:
     """将PIL Image转换为base64编码"""
-    buffered = io.BytesIO()
-    
-    # 保存为JPEG格式
-    if image.mode == 'RGBA':
-        # 转换RGBA为RGB
-        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-        rgb_image.paste(image, mask=image.split()[3])
-        rgb_image.save(buffered, format="JPEG", quality=95)
-    else:
-        image.save(buffered, format="JPEG", quality=95)
-    
-    img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
-    return f"data:image/jpeg;base64,{img_str}"
+    return EncodedImage.from_pil(image).data_url
 
 
 def image_path_to_base64(image_path: str) -> str:
     """将图片文件路径转换为base64编码"""
-    with open(image_path, 'rb') as f:
-        image_data = f.read()
-        b64_data = base64.b64encode(image_data).decode('utf-8')
-        
-        # 检测图片类型
-        ext = Path(image_path).suffix.lower()
-        mime_type = {
-            '.jpg': 'jpeg',
-            '.jpeg': 'jpeg',
-            '.png': 'png',
-            '.gif': 'gif',
-            '.webp': 'webp',
-            '.bmp': 'bmp'
-        }.get(ext, 'jpeg')
-        
-        return f"data:image/{mime_type};base64,{b64_data}"
+    return EncodedImage.from_path(image_path).data_url
 
 
-def call_doubao_api(
-    image: Union[str, Image.Image],
-    prompt: str,
-    text_requirement: str = "",
-    api_key: str = "",
-    api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
-    model: str = "doubao-seed-1-6-250615"
+def _post_chat_completion(
+    api_url: str,
+    headers: Dict[str, str],
+    payload: Dict[str, Any],
+    timeout: float = 60
 ) -> Dict[str, Any]:
     """
-    调用 Doubao API
-    
-    Args:
-        image: PIL Image对象或图片文件路径
-        prompt: 系统提示词（PE）
-        text_requirement: 文本需求（可选）
-        api_key: Doubao API Key
-        api_url: API URL
-        model: 模型名称
-    
+    通过共享连接池发送 chat completion 请求（429 / 5xx / 连接错误自动退避重试；
+    配置了端点池时每次发送都重新选择端点）
+
     Returns:
-        API返回的JSON结果
+        API返回的原始JSON
     """
-    # 转换图片为base64
-    if isinstance(image, str):
+    def _send():
+        with route(api_url, headers, payload) as request:
+            try:
+                response = get_http_client().post(
+                    request.api_url,
+                    headers=request.headers,
+                    json=request.payload,
+                    timeout=timeout
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                raise RetryableError(e)
+            if response.status_code in RETRYABLE_STATUS:
+                try:
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError as e:
+                    raise RetryableError(
+                        e,
+                        retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                        throttled=response.status_code in THROTTLE_STATUS
+                    )
+            response.raise_for_status()
+            return response.json()
+
+    return call_with_retry(_send)
+
+
+def _image_to_base64(image: Union[str, Image.Image, EncodedImage]) -> str:
+    """将PIL Image、图片路径或已编码图片转换为base64 data URL"""
+    if isinstance(image, EncodedImage):
+        # 已编码：直接复用
+        return image.data_url
+    elif isinstance(image, str):
         # 文件路径
-        image_base64 = image_path_to_base64(image)
+        return image_path_to_base64(image)
     elif isinstance(image, Image.Image):
         # PIL Image
-        image_base64 = pil_to_base64(image)
+        return pil_to_base64(image)
     else:
         raise ValueError(f"不支持的图片类型: {type(image)}")
-    
+
+
+def build_headers(api_key: str) -> Dict[str, str]:
+    """构造请求头"""
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+
+def build_chat_payload(model: str, user_content: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """构造 chat completion 请求体"""
+    return {
+        "model": model,
+        "messages": [
+            {
+                "role": "user",
+                "content": user_content
+            }
+        ],
+        "temperature": 0,  # 完全确定性输出，消除随机性
+        "thinking": {
+            "type": "disabled"  # 关闭思考模式
+        }
+    }
+
+
+def build_classification_payload(
+    image: Union[str, Image.Image, EncodedImage],
+    prompt: str,
+    text_requirement: str = "",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """构造分类请求体（同步/异步客户端共用）"""
     # 构造用户消息内容
     user_content = [
         {
             "type": "image_url",
             "image_url": {
-                "url": image_base64
+                "url": _image_to_base64(image)
             }
         }
     ]
@@ -101,69 +130,409 @@ def call_doubao_api(
         "text": f"{prompt}\n\n请根据以上规则，对以下输入进行分类：\n{text_prompt}\n\n只输出JSON格式结果，不要有任何其他内容。"
     })
     
-    # 构造请求
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "user",
-                "content": user_content
+    return build_chat_payload(model, user_content)
+
+
+def build_multi_image_classification_payload(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    prompt: str,
+    text_requirement: str = "",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """
+    构造多图分类请求体：一次请求携带多张图片，要求模型按顺序逐张输出分类结果
+    """
+    n = len(images)
+    
+    # 每张图片前加序号，帮助模型对齐输出顺序
+    user_content = []
+    for idx, image in enumerate(images):
+        user_content.append({
+            "type": "text",
+            "text": f"第{idx + 1}张图片："
+        })
+        user_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": _image_to_base64(image)
+            }
+        })
+    
+    # 构造文本部分
+    if text_requirement:
+        text_prompt = f'{{"image": "图片内容", "文本需求": "{text_requirement}"}}'
+    else:
+        text_prompt = '{"image": "图片内容"}'
+    
+    user_content.append({
+        "type": "text",
+        "text": (
+            f"{prompt}\n\n以上共{n}张图片，请根据以上规则，把每张图片分别作为以下输入独立分类：\n{text_prompt}\n\n"
+            f"只输出一个长度为{n}的JSON数组，第i个元素是第i张图片的分类结果JSON，"
+            f'例如：[{{"style_tag": "日常plog"}}, {{"style_tag": "人像自拍"}}]。不要有任何其他内容。'
+        )
+    })
+    
+    return build_chat_payload(model, user_content)
+
+
+def build_caption_payload(
+    image: Union[str, Image.Image, EncodedImage],
+    prompt: str,
+    text_requirement: str = "",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """构造配文请求体（同步/异步客户端共用）"""
+    # 构造用户消息内容
+    user_content = [
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": _image_to_base64(image)
             }
-        ],
-        "temperature": 0,  # 完全确定性输出，消除随机性
-        "thinking": {
-            "type": "disabled"  # 关闭思考模式
         }
-    }
+    ]
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    # 构造文本部分
+    if text_requirement:
+        full_prompt = f"{prompt}\n\n额外要求：{text_requirement}"
+    else:
+        full_prompt = prompt
     
-    # 发送请求
-    try:
-        response = requests.post(
-            api_url,
-            headers=headers,
-            json=payload,
-            timeout=60
+    user_content.append({
+        "type": "text",
+        "text": full_prompt
+    })
+    
+    return build_chat_payload(model, user_content)
+
+
+def build_group_caption_payload(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    prompt: str,
+    text_requirement: str = "",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """构造组图配文请求体：一次请求携带整组图片，生成一条概括整组的配文"""
+    user_content = []
+    for idx, image in enumerate(images):
+        user_content.append({
+            "type": "text",
+            "text": f"第{idx + 1}张图片："
+        })
+        user_content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": _image_to_base64(image)
+            }
+        })
+    
+    # 构造文本部分
+    if text_requirement:
+        full_prompt = f"{prompt}\n\n额外要求：{text_requirement}"
+    else:
+        full_prompt = prompt
+    
+    user_content.append({
+        "type": "text",
+        "text": full_prompt
+    })
+    
+    return build_chat_payload(model, user_content)
+
+
+def build_fused_payload(
+    image: Union[str, Image.Image, EncodedImage],
+    classification_pe: str,
+    caption_pe_table: Dict[str, str],
+    text_requirement: str = "",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """
+    构造融合请求体：一次请求内先分类，再按分类标签选用配文PE生成配文
+    
+    Args:
+        caption_pe_table: 分类标签 -> 配文PE（单图）
+    """
+    user_content = [
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": _image_to_base64(image)
+            }
+        }
+    ]
+    
+    # 构造文本部分
+    if text_requirement:
+        text_prompt = f'{{"image": "图片内容", "文本需求": "{text_requirement}"}}'
+    else:
+        text_prompt = '{"image": "图片内容"}'
+    
+    pe_table = json.dumps(caption_pe_table, ensure_ascii=False, indent=2)
+    user_content.append({
+        "type": "text",
+        "text": (
+            f"## 第一步：分类\n{classification_pe}\n\n"
+            f"请根据以上规则，对以下输入进行分类：\n{text_prompt}\n\n"
+            f"## 第二步：配文\n"
+            f"根据第一步得到的 style_tag，在下表中找到对应的配文要求，为这张图片生成配文"
+            f"（表中没有的标签使用“其他”的要求）：\n{pe_table}\n\n"
+            f'只输出一个JSON对象：{{"style_tag": "分类标签", "caption": "配文"}}'
+            f"（分类规则要求输出的其他字段可一并保留），不要有任何其他内容。"
         )
-        response.raise_for_status()
+    })
+    
+    return build_chat_payload(model, user_content)
+
+
+def parse_classification_response(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    从 API 原始返回中提取分类 JSON
+    
+    Raises:
+        ValueError: 返回格式错误
+        json.JSONDecodeError: 模型输出不是合法JSON
+    """
+    if 'choices' in result and len(result['choices']) > 0:
+        content = result['choices'][0]['message']['content']
         
-        # 解析响应
-        result = response.json()
+        # 清理可能的markdown格式
+        content = content.strip()
+        if content.startswith('```json'):
+            content = content[7:]
+        if content.startswith('```'):
+            content = content[3:]
+        if content.endswith('```'):
+            content = content[:-3]
+        content = content.strip()
         
-        # 提取 AI 返回的内容
-        if 'choices' in result and len(result['choices']) > 0:
-            content = result['choices'][0]['message']['content']
-            
-            # 清理可能的markdown格式
-            content = content.strip()
-            if content.startswith('```json'):
-                content = content[7:]
-            if content.startswith('```'):
-                content = content[3:]
-            if content.endswith('```'):
-                content = content[:-3]
-            content = content.strip()
-            
-            # 解析 JSON
-            classification_result = json.loads(content)
-            return classification_result
-        else:
-            raise ValueError(f"API 返回格式错误: {result}")
+        # 解析 JSON
+        return json.loads(content)
+    else:
+        raise ValueError(f"API 返回格式错误: {result}")
+
+
+def parse_multi_classification_response(
+    result: Dict[str, Any],
+    expected_count: int,
+    strict: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    从 API 原始返回中提取多图分类结果数组
+    
+    Args:
+        strict: 为 False 时不校验单个元素，缺少 style_tag 的元素原样返回（由调用方逐张处理）
+    
+    Raises:
+        ValueError: 返回格式错误、数组长度与图片数不一致，或 strict 时有元素缺少 style_tag
+        json.JSONDecodeError: 模型输出不是合法JSON
+    """
+    items = parse_classification_response(result)
+    
+    # 兼容模型把数组包在对象里的情况
+    if isinstance(items, dict):
+        for key in ('results', 'items', 'style_tags'):
+            if isinstance(items.get(key), list):
+                items = items[key]
+                break
+    
+    if not isinstance(items, list):
+        raise ValueError(f"多图分类结果不是数组: {items}")
+    if len(items) != expected_count:
+        raise ValueError(f"多图分类结果数量不一致: 期望 {expected_count}，实际 {len(items)}")
+    
+    # 允许元素直接是标签字符串
+    items = [{'style_tag': item} if isinstance(item, str) else item for item in items]
+    for item in items:
+        if strict and not is_cacheable_classification(item):
+            raise ValueError(f"多图分类结果缺少 style_tag 字段: {item}")
+    return items
+
+
+def parse_caption_response(result: Dict[str, Any]) -> str:
+    """
+    从 API 原始返回中提取配文（纯文本）
+    
+    Raises:
+        ValueError: 返回格式错误
+    """
+    if 'choices' in result and len(result['choices']) > 0:
+        content = result['choices'][0]['message']['content']
+        return content.strip()
+    else:
+        raise ValueError(f"API 返回格式错误: {result}")
+
+
+def is_cacheable_classification(value: Any) -> bool:
+    """只缓存格式正确的分类结果，无效输出下次运行时重新请求"""
+    return isinstance(value, dict) and 'style_tag' in value
+
+
+def is_cacheable_multi_classification(value: Any) -> bool:
+    """只缓存每个元素都格式正确的多图分类结果"""
+    return isinstance(value, list) and all(is_cacheable_classification(item) for item in value)
+
+
+def is_cacheable_fused(value: Any) -> bool:
+    """只缓存同时包含标签和非空配文的融合结果"""
+    return (
+        is_cacheable_classification(value)
+        and isinstance(value.get('caption'), str)
+        and bool(value['caption'].strip())
+    )
+
+
+def is_cacheable_caption(value: Any) -> bool:
+    """只缓存非空配文"""
+    return isinstance(value, str) and bool(value)
+
+
+def call_doubao_api(
+    image: Union[str, Image.Image, EncodedImage],
+    prompt: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """
+    调用 Doubao API
+    
+    Args:
+        image: PIL Image对象、图片文件路径或EncodedImage
+        prompt: 系统提示词（PE）
+        text_requirement: 文本需求（可选）
+        api_key: Doubao API Key
+        api_url: API URL
+        model: 模型名称
+    
+    Returns:
+        API返回的JSON结果
+    """
+    payload = build_classification_payload(image, prompt, text_requirement, model)
+    headers = build_headers(api_key)
+    
+    # 发送请求（相同图片 + PE + 文本需求 + 模型优先命中本地缓存）
+    try:
+        return cached_call(
+            "classify",
+            payload,
+            lambda: parse_classification_response(_post_chat_completion(api_url, headers, payload)),
+            cacheable=is_cacheable_classification
+        )
+    
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"API 请求失败: {str(e)}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 解析失败: {str(e)}, 原始内容: {e.doc}")
+    except Exception as e:
+        raise RuntimeError(f"调用 Doubao API 时发生错误: {str(e)}")
+
+
+def call_doubao_api_multi_images(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    prompt: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+    model: str = "doubao-seed-1-6-250615",
+    strict: bool = True
+) -> List[Dict[str, Any]]:
+    """
+    一次请求对多张图片分别分类
+    
+    Args:
+        images: 图片列表（数量不能超过模型单次请求的图片上限）
+        prompt: 分类PE
+        text_requirement: 文本需求（可选）
+        api_key: Doubao API Key
+        api_url: API URL
+        model: 模型名称
+        strict: 为 False 时个别元素缺少 style_tag 不视为整次失败（这样的结果不写入缓存）
+    
+    Returns:
+        与 images 顺序一致的分类结果列表
+    """
+    payload = build_multi_image_classification_payload(images, prompt, text_requirement, model)
+    headers = build_headers(api_key)
+    
+    # 发送请求（相同图片组 + PE + 文本需求 + 模型优先命中本地缓存）
+    try:
+        return cached_call(
+            "classify_multi",
+            payload,
+            lambda: parse_multi_classification_response(
+                _post_chat_completion(api_url, headers, payload),
+                len(images),
+                strict
+            ),
+            cacheable=is_cacheable_multi_classification
+        )
+    
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"API 请求失败: {str(e)}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON 解析失败: {str(e)}, 原始内容: {e.doc}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"调用 Doubao API 时发生错误: {str(e)}")
+
+
+def call_doubao_api_fused(
+    image: Union[str, Image.Image, EncodedImage],
+    classification_pe: str,
+    caption_pe_table: Dict[str, str],
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+    model: str = "doubao-seed-1-6-250615"
+) -> Dict[str, Any]:
+    """
+    一次请求完成分类 + 配文
+    
+    Args:
+        image: PIL Image对象、图片文件路径或EncodedImage
+        classification_pe: 分类PE
+        caption_pe_table: 分类标签 -> 单图配文PE
+        text_requirement: 文本需求（可选）
+        api_key: Doubao API Key
+        api_url: API URL
+        model: 模型名称
+    
+    Returns:
+        {"style_tag": "...", "caption": "..."}
+    
+    Raises:
+        ValueError: 输出不是合法JSON或缺少 style_tag / caption
+    """
+    payload = build_fused_payload(image, classification_pe, caption_pe_table, text_requirement, model)
+    headers = build_headers(api_key)
+    
+    def _fetch():
+        value = parse_classification_response(_post_chat_completion(api_url, headers, payload))
+        if not is_cacheable_fused(value):
+            raise ValueError(f"融合结果缺少 style_tag 或 caption 字段: {value}")
+        value['caption'] = value['caption'].strip()
+        return value
+    
+    # 发送请求（相同图片 + PE + 文本需求 + 模型优先命中本地缓存）
+    try:
+        return cached_call("fused", payload, _fetch, cacheable=is_cacheable_fused)
     
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"API 请求失败: {str(e)}")
     except json.JSONDecodeError as e:
-        raise ValueError(f"JSON 解析失败: {str(e)}, 原始内容: {content}")
+        raise ValueError(f"JSON 解析失败: {str(e)}, 原始内容: {e.doc}")
+    except ValueError:
+        raise
     except Exception as e:
         raise RuntimeError(f"调用 Doubao API 时发生错误: {str(e)}")
 
 
 def call_doubao_api_for_caption(
-    image: Union[str, Image.Image],
+    image: Union[str, Image.Image, EncodedImage],
     prompt: str,
     text_requirement: str = "",
     api_key: str = "",
@@ -174,7 +543,7 @@ def call_doubao_api_for_caption(
     调用 Doubao API 生成配文（返回纯文本）
     
     Args:
-        image: PIL Image对象或图片文件路径
+        image: PIL Image对象、图片文件路径或EncodedImage
         prompt: 配文生成PE
         text_requirement: 额外的文本需求（可选）
         api_key: Doubao API Key
@@ -184,74 +553,57 @@ def call_doubao_api_for_caption(
     Returns:
         生成的配文文本
     """
-    # 转换图片为base64
-    if isinstance(image, str):
-        image_base64 = image_path_to_base64(image)
-    elif isinstance(image, Image.Image):
-        image_base64 = pil_to_base64(image)
-    else:
-        raise ValueError(f"不支持的图片类型: {type(image)}")
-    
-    # 构造用户消息内容
-    user_content = [
-        {
-            "type": "image_url",
-            "image_url": {
-                "url": image_base64
-            }
-        }
-    ]
+    payload = build_caption_payload(image, prompt, text_requirement, model)
+    headers = build_headers(api_key)
     
-    # 构造文本部分
-    if text_requirement:
-        full_prompt = f"{prompt}\n\n额外要求：{text_requirement}"
-    else:
-        full_prompt = prompt
+    # 发送请求（相同图片 + PE + 文本需求 + 模型优先命中本地缓存）
+    try:
+        return cached_call(
+            "caption",
+            payload,
+            lambda: parse_caption_response(_post_chat_completion(api_url, headers, payload)),
+            cacheable=is_cacheable_caption
+        )
     
-    user_content.append({
-        "type": "text",
-        "text": full_prompt
-    })
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"API 请求失败: {str(e)}")
+    except Exception as e:
+        raise RuntimeError(f"调用 Doubao API 时发生错误: {str(e)}")
+
+
+def call_doubao_api_for_group_caption(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    prompt: str,
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "https://ark.cn-beijing.volces.com/api/v3/chat/completions",
+    model: str = "doubao-seed-1-6-250615"
+) -> str:
+    """
+    一次请求为整组图片生成一条配文（返回纯文本）
     
-    # 构造请求
-    payload = {
-        "model": model,
-        "messages": [
-            {
-                "role": "user",
-                "content": user_content
-            }
-        ],
-        "temperature": 0,  # 完全确定性输出
-        "thinking": {
-            "type": "disabled"  # 关闭思考模式
-        }
-    }
+    Args:
+        images: 同一组的图片列表
+        prompt: 多图配文PE
+        text_requirement: 额外的文本需求（可选）
+        api_key: Doubao API Key
+        api_url: API URL
+        model: 模型名称
     
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    Returns:
+        生成的配文文本
+    """
+    payload = build_group_caption_payload(images, prompt, text_requirement, model)
+    headers = build_headers(api_key)
     
-    # 发送请求
+    # 发送请求（相同图片组 + PE + 文本需求 + 模型优先命中本地缓存）
     try:
-        response = requests.post(
-            api_url,
-            headers=headers,
-            json=payload,
-            timeout=60
+        return cached_call(
+            "group_caption",
+            payload,
+            lambda: parse_caption_response(_post_chat_completion(api_url, headers, payload)),
+            cacheable=is_cacheable_caption
         )
-        response.raise_for_status()
-        
-        # 解析响应
-        result = response.json()
-        
-        # 提取 AI 返回的内容（纯文本）
-        if 'choices' in result and len(result['choices']) > 0:
-            content = result['choices'][0]['message']['content']
-            return content.strip()
-        else:
-            raise ValueError(f"API 返回格式错误: {result}")
     
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"API 请求失败: {str(e)}")
@@ -0,0 +1,287 @@
+"""
+多端点负载均衡与熔断（ComfyUI版本）
+节点配置 endpoints 后，发往该节点主端点（api_url + api_key）的请求分散到端点池中
+服务该请求模型的多个 (api_key, api_url, model)：按「健康度加权的最少在途请求」选择端点；
+连续失败的端点熔断一段时间不再分配请求，冷却后放行一个探测请求，成功即恢复
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+
+from .retry import THROTTLE_STATUS, RetryableError
+
+
+FAILURE_THRESHOLD = 5       # 连续失败多少次后熔断
+COOLDOWN_SECONDS = 30.0     # 熔断后多久放行探测请求
+HEALTH_ALPHA = 0.2          # 健康度（成功率的指数滑动平均）的更新权重
+MIN_HEALTH = 0.05           # 健康度下限，避免权重为 0
+HEALTH_HALF_LIFE = 60.0     # 健康度随时间向 1 恢复的半衰期（秒），避免低负载时降权的端点再也分不到请求
+FAILURE_STATUS = {401, 403, 429}  # 除 5xx 外计入熔断的状态码（密钥失效、无权限、配额耗尽）
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class EndpointSpec(NamedTuple):
+    """端点配置；model 为空时服务所有模型，否则只接收该模型的请求"""
+    api_key: str
+    api_url: str
+    model: str = ""
+
+
+class Endpoint:
+    """
+    一个端点的运行状态（进程内按 EndpointSpec 共享，跨节点运行保留健康度和熔断状态）
+
+    Attributes:
+        outstanding: 在途请求数
+        health: 成功率的指数滑动平均（失败和限流都会降低）
+        state: closed（正常）/ open（熔断）/ half_open（冷却结束，探测请求在途）
+    """
+
+    def __init__(self, spec: EndpointSpec):
+        self.spec = spec
+        self.outstanding = 0
+        self.health = 1.0
+        self.failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.updated = time.monotonic()
+        self.counts = dict.fromkeys(EndpointStats.FIELDS, 0)
+
+    @property
+    def label(self) -> str:
+        """日志中显示的端点名（只显示 api_key 末4位）"""
+        host = urlparse(self.spec.api_url).netloc or self.spec.api_url
+        model = f"{self.spec.model}@" if self.spec.model else ""
+        return f"{model}{host}#{self.spec.api_key[-4:]}"
+
+    def recover(self, now: float):
+        """按距上次更新的时间把健康度向 1 恢复"""
+        self.health = 1 - (1 - self.health) * 0.5 ** ((now - self.updated) / HEALTH_HALF_LIFE)
+        self.updated = now
+
+    def score(self) -> float:
+        return (self.outstanding + 1) / self.health
+
+
+class EndpointStats:
+    """每个端点的累计计数字段"""
+
+    FIELDS = ("requests", "failures", "throttles", "opened")
+
+
+class RoutedRequest(NamedTuple):
+    """路由后的实际请求参数"""
+    endpoint: Optional[Endpoint]
+    api_url: str
+    headers: Dict[str, str]
+    payload: dict
+
+
+class EndpointPool:
+    """一个主端点对应的端点池"""
+
+    def __init__(self, endpoints: List[Endpoint]):
+        self.endpoints = endpoints
+
+    def describe(self) -> str:
+        return f"{len(self.endpoints)} 个端点（{', '.join(endpoint.label for endpoint in self.endpoints)}）"
+
+    def acquire(self, model: str = "") -> Endpoint:
+        """
+        在服务 model 的端点中选择一个并计入在途请求（未固定模型的端点服务所有模型）
+
+        Raises:
+            RetryableError: 这些端点都在熔断中（retry_after 为最早结束冷却的时间）
+        """
+        with _lock:
+            now = time.monotonic()
+            eligible = [e for e in self.endpoints if e.spec.model in ("", model)]
+            candidates = []
+            for endpoint in eligible:
+                if endpoint.state == OPEN and now >= endpoint.open_until:
+                    endpoint.state = HALF_OPEN  # 冷却结束：本次请求作为探测
+                    endpoint.outstanding = 0
+                    candidates = [endpoint]
+                    break
+                if endpoint.state == CLOSED:
+                    endpoint.recover(now)
+                    candidates.append(endpoint)
+            if not candidates:
+                # 全部熔断（或探测请求在途）：等最早结束冷却的端点
+                reopen = [e.open_until for e in eligible if e.state == OPEN]
+                wait = min(reopen) - now if reopen else 1.0
+                raise RetryableError(RuntimeError("端点池中所有端点都在熔断中"), retry_after=max(0.0, wait))
+            # 最少在途请求 / 健康度，得分相同时随机选择，避免总是压在第一个端点
+            best = min(endpoint.score() for endpoint in candidates)
+            endpoint = random.choice([e for e in candidates if e.score() == best])
+            endpoint.outstanding += 1
+            endpoint.counts["requests"] += 1
+            return endpoint
+
+    @staticmethod
+    def release(endpoint: Endpoint, outcome: str):
+        """
+        请求结束
+
+        Args:
+            outcome: "success" / "failure"（计入熔断）/ "throttled"（计入熔断，另记为限流）/
+                "ignored"（与端点健康无关的错误，如 400、输出解析失败）
+        """
+        with _lock:
+            endpoint.outstanding = max(0, endpoint.outstanding - 1)
+            if outcome == "ignored":
+                if endpoint.state == HALF_OPEN:
+                    endpoint.state = OPEN  # 探测没有结论：冷却已结束，下一个请求重新探测
+                return
+            endpoint.recover(time.monotonic())
+            success = outcome == "success"
+            endpoint.health = max(MIN_HEALTH, endpoint.health * (1 - HEALTH_ALPHA) + HEALTH_ALPHA * success)
+            if success:
+                endpoint.failures = 0
+                endpoint.state = CLOSED
+                return
+            if outcome == "throttled":
+                endpoint.counts["throttles"] += 1
+            endpoint.counts["failures"] += 1
+            endpoint.failures += 1
+            if endpoint.state == HALF_OPEN or endpoint.failures >= FAILURE_THRESHOLD:
+                if endpoint.state != OPEN:
+                    endpoint.counts["opened"] += 1
+                endpoint.state = OPEN
+                endpoint.open_until = time.monotonic() + COOLDOWN_SECONDS
+
+
+_lock = threading.Lock()
+_endpoints: Dict[EndpointSpec, Endpoint] = {}
+_pools: Dict[Tuple[str, str], EndpointPool] = {}
+
+
+def parse_endpoints(text: str, api_key: str, api_url: str) -> List[EndpointSpec]:
+    """
+    解析 endpoints 输入：每行一个端点 "api_key, api_url, model"
+
+    空字段沿用节点的 api_key / api_url（model 为空时服务所有模型），
+    空行和 # 开头的行忽略；节点自身的端点总是在池中
+    """
+    specs = [EndpointSpec(api_key, api_url)]
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        fields = [field.strip() for field in line.split(",")] + ["", "", ""]
+        spec = EndpointSpec(fields[0] or api_key, fields[1] or api_url, fields[2])
+        if spec not in specs:
+            specs.append(spec)
+    return specs
+
+
+def configure(api_key: str, api_url: str, endpoints: str) -> Optional[EndpointPool]:
+    """
+    为节点的主端点设置端点池（节点每次运行时调用）；endpoints 为空时移除端点池
+
+    Returns:
+        端点池；只有一个端点时返回 None（不做路由）
+    """
+    specs = parse_endpoints(endpoints, api_key, api_url)
+    with _lock:
+        if len(specs) <= 1:
+            _pools.pop((api_url, api_key), None)
+            return None
+        pool = EndpointPool([_endpoints.setdefault(spec, Endpoint(spec)) for spec in specs])
+        _pools[(api_url, api_key)] = pool
+    return pool
+
+
+def _bearer_key(headers: Dict[str, str]) -> str:
+    value = headers.get("Authorization", "")
+    return value[len("Bearer "):] if value.startswith("Bearer ") else value
+
+
+def _error_status(error: BaseException) -> Optional[int]:
+    """HTTP 错误的状态码（requests 的 HTTPError / aiohttp 的 ClientResponseError），其他异常返回 None"""
+    status = getattr(error, "status", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _outcome(error: BaseException) -> str:
+    """
+    按异常判断请求结果：连接错误、超时、5xx 和 401 / 403 / 429 计入熔断；
+    其他异常（400 等客户端错误、输出解析失败、取消）与端点健康无关
+    """
+    if isinstance(error, RetryableError):
+        status = _error_status(error.cause)
+        if status is None:
+            return "failure"  # 连接错误 / 超时
+    else:
+        status = _error_status(error)
+        if status is None or (status < 500 and status not in FAILURE_STATUS):
+            return "ignored"
+    return "throttled" if status in THROTTLE_STATUS else "failure"
+
+
+@contextmanager
+def route(api_url: str, headers: Dict[str, str], payload: dict):
+    """
+    为一次发送选择端点（每次重试都重新选择，失败的请求自然转移到其他端点）
+
+    用法:
+        with route(api_url, headers, payload) as request:
+            post(request.api_url, headers=request.headers, json=request.payload)
+
+    只在服务 payload 中模型的端点间选择，payload 不做修改（模型级联各级的模型和响应缓存的键保持一致）；
+    主端点没有配置端点池时原样返回。退出时按异常类型记录结果（见 _outcome）
+    """
+    pool = _pools.get((api_url, _bearer_key(headers)))
+    if pool is None:
+        yield RoutedRequest(None, api_url, headers, payload)
+        return
+    endpoint = pool.acquire(payload.get("model", ""))
+    spec = endpoint.spec
+    routed = RoutedRequest(
+        endpoint,
+        spec.api_url,
+        dict(headers, Authorization=f"Bearer {spec.api_key}"),
+        payload
+    )
+    try:
+        yield routed
+    except BaseException as e:
+        pool.release(endpoint, _outcome(e))
+        raise
+    pool.release(endpoint, "success")
+
+
+def stats_snapshot() -> Dict[EndpointSpec, Dict[str, int]]:
+    """节点运行前调用，配合 format_stats_delta 输出本次运行各端点的请求分布"""
+    with _lock:
+        return {spec: dict(endpoint.counts) for spec, endpoint in _endpoints.items()}
+
+
+def format_stats_delta(before: Optional[Dict[EndpointSpec, Dict[str, int]]]) -> str:
+    """格式化一次节点运行期间各端点的请求数、失败和熔断次数（没有经过端点池时返回空字符串）"""
+    if before is None:
+        return ""
+    with _lock:
+        endpoints = list(_endpoints.values())
+        parts = []
+        for endpoint in endpoints:
+            previous = before.get(endpoint.spec, dict.fromkeys(EndpointStats.FIELDS, 0))
+            delta = {field: endpoint.counts[field] - previous[field] for field in EndpointStats.FIELDS}
+            if not delta["requests"]:
+                continue
+            extra = [
+                f"{name} {delta[field]}"
+                for field, name in (("failures", "失败"), ("throttles", "限流"), ("opened", "熔断"))
+                if delta[field]
+            ]
+            state = "" if endpoint.state == CLOSED else f"，当前{'熔断中' if endpoint.state == OPEN else '探测中'}"
+            parts.append(f"{endpoint.label} {delta['requests']} 次{'（' + ' / '.join(extra) + '）' if extra else ''}{state}")
+    if not parts:
+        return ""
+    return "⚖️ 端点分布: " + "；".join(parts)
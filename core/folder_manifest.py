@@ -0,0 +1,224 @@
+"""
+文件夹增量处理清单（ComfyUI版本）
+清单保存在文件夹旁（<文件夹名>.smart_caption_manifest.json），记录每个文件的
+大小、修改时间、内容哈希以及已得到的分类标签和配文。
+增量模式下 BatchImageLoader 只加载新增或内容变化的文件，分类/配文节点把本次结果写回清单，
+并与清单中已有的结果合并输出。
+新文件所在分组中未变化的文件以清单中的标签参与关联判断；分组的关联结论变化时改写这些文件的标签
+"""
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+FOLDER_MANIFEST_TYPE = "FOLDER_MANIFEST"
+MANIFEST_SUFFIX = ".smart_caption_manifest.json"
+MANIFEST_VERSION = 1
+MULTI_PIC_SUFFIX = "_multi_pic"
+
+_save_lock = threading.Lock()
+
+
+def _vote_tag(tag: str) -> str:
+    """清单中的标签 → 关联判断的投票（统一标签还原为单图标签）"""
+    return tag[:-len(MULTI_PIC_SUFFIX)] if tag.endswith(MULTI_PIC_SUFFIX) else tag
+
+
+def _is_done(entry: dict) -> bool:
+    """已有分类结果，且没有因同组关联结论变化而作废"""
+    return "classification" in entry and not entry.get("stale")
+
+
+def manifest_path(folder_path: str) -> str:
+    """文件夹对应的清单路径（与文件夹同级）"""
+    return os.path.normpath(os.path.abspath(folder_path)) + MANIFEST_SUFFIX
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FolderManifest:
+    """
+    一个文件夹的处理清单（FOLDER_MANIFEST 类型的节点输出）
+
+    Attributes:
+        folder: 文件夹绝对路径
+        entries: 相对路径 -> {"size", "mtime", "sha256", "classification", "caption"}
+        files: 本次扫描到的所有文件（相对路径，加载顺序），合并输出按此顺序
+        batch_files: 本次加载进 IMAGE batch 的文件（相对路径），与 batch 一一对应
+        file_groups: 本次扫描到的文件 -> 所属分组（子文件夹名，或 "all"），用于查找未变化的同组文件
+    """
+
+    def __init__(self, folder_path: str, entries: Optional[Dict[str, dict]] = None):
+        self.folder = os.path.normpath(os.path.abspath(folder_path))
+        self.path = manifest_path(folder_path)
+        self.entries = entries or {}
+        self.files: List[str] = []
+        self.batch_files: List[str] = []
+        self.file_groups: Dict[str, str] = {}
+        # 本次加载文件的指纹，写入结果时才落盘（中途失败的文件下次仍会重新处理）
+        self._pending: Dict[str, dict] = {}
+        # 扫描后清单有变化（文件已删除、修改时间刷新），需要保存
+        self.dirty = False
+
+    @classmethod
+    def load(cls, folder_path: str) -> "FolderManifest":
+        """读取清单，不存在或损坏时返回空清单"""
+        path = manifest_path(folder_path)
+        entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") == MANIFEST_VERSION:
+                    entries = data.get("files", {})
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"⚠️  清单读取失败，将全部重新处理: {path} - {str(e)}")
+        return cls(folder_path, entries)
+
+    def relpath(self, path: str) -> str:
+        return os.path.relpath(os.path.abspath(path), self.folder).replace(os.sep, "/")
+
+    def select_changed(self, paths: Sequence[str], groups: Optional[Sequence[str]] = None) -> List[str]:
+        """
+        记录本次扫描到的文件，返回需要处理的文件（新增、内容变化、还没有分类结果或标签已被改写）
+
+        大小和修改时间都未变时直接视为未变化；否则计算内容哈希确认
+        （只是修改时间变化、内容相同的文件不会重新处理）
+
+        Args:
+            paths: 扫描到的文件路径
+            groups: 与 paths 对应的分组名；为 None 时（例如按相似度自动分组）不与已有结果一起做关联判断
+        """
+        self.files = [self.relpath(path) for path in paths]
+        self.file_groups = dict(zip(self.files, groups)) if groups is not None else {}
+        self._pending = {}
+        self.dirty = bool(set(self.entries) - set(self.files))
+        changed = []
+        for path, rel in zip(paths, self.files):
+            stat = os.stat(path)
+            entry = self.entries.get(rel)
+            fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+            if entry and entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime_ns:
+                if _is_done(entry):
+                    continue
+                fingerprint["sha256"] = entry.get("sha256")
+            else:
+                fingerprint["sha256"] = file_sha256(path)
+                if entry and entry.get("sha256") == fingerprint["sha256"] and _is_done(entry):
+                    entry.update(fingerprint)
+                    self.dirty = True
+                    continue
+            self._pending[rel] = fingerprint
+            changed.append(path)
+        return changed
+
+    def set_batch(self, paths: Sequence[str]):
+        """记录本次实际加载进 batch 的文件（与 IMAGE batch 顺序一致）"""
+        self.batch_files = [self.relpath(path) for path in paths]
+
+    def groupmates(self, start: int, end: int) -> List[str]:
+        """batch[start:end] 所在分组中，不在本次 batch 里且清单中已有分类结果的文件"""
+        names = {self.file_groups.get(rel) for rel in self.batch_files[start:end]} - {None}
+        if not names:
+            return []
+        batch = set(self.batch_files)
+        return [
+            rel for rel in self.files
+            if self.file_groups.get(rel) in names and rel not in batch
+            and "classification" in self.entries.get(rel, {})
+        ]
+
+    def groupmate_votes(self, group_ranges: Sequence[Tuple[int, int]]) -> List[List[str]]:
+        """
+        每个 batch 分组中未变化的同组文件的已有标签，作为关联判断的额外投票
+
+        有关联的分组保存的是统一标签，投票时还原为单图标签（逐张标签没有保存）
+        """
+        return [
+            [_vote_tag(self.entries[rel]["classification"]) for rel in self.groupmates(start, end)]
+            for start, end in group_ranges
+        ]
+
+    def update_groupmates(self, group_ranges: Sequence[Tuple[int, int]], group_results: Sequence[Dict[str, Any]]) -> int:
+        """
+        按本次（含已有标签）的关联结论改写未变化的同组文件的标签（随之后的 record 保存）
+
+        有关联时统一为该组标签；无关联时还原为单图标签。
+        标签变化的文件配文作废，标记为需要重新处理（下次运行时重新加载）
+
+        Returns:
+            标签被改写的文件数
+        """
+        changed = 0
+        for (start, end), result in zip(group_ranges, group_results):
+            for rel in self.groupmates(start, end):
+                entry = self.entries[rel]
+                tag = result['style_tag'] if 'style_tag' in result else _vote_tag(entry["classification"])
+                if entry["classification"] == tag:
+                    continue
+                entry["classification"] = tag
+                if entry.pop("caption", None) is not None:
+                    entry["stale"] = True
+                changed += 1
+        return changed
+
+    def matches(self, tensor) -> bool:
+        """判断是否与给定 IMAGE tensor 对应"""
+        return len(self.batch_files) == tensor.shape[0]
+
+    def record(self, field: str, values: Sequence[Optional[str]]):
+        """
+        把本次 batch 的结果写回清单并保存
+
+        Args:
+            field: "classification" 或 "caption"
+            values: 与 batch_files 一一对应；None 表示失败，该文件的记录会被移除，下次重新处理
+        """
+        for rel, value in zip(self.batch_files, values):
+            if value is None:
+                self.entries.pop(rel, None)
+                continue
+            entry = self.entries.get(rel)
+            if rel in self._pending:
+                if field == "classification" or entry is None:
+                    # 新增/变化的文件：以本次指纹重建记录，旧结果作废
+                    entry = dict(self._pending.pop(rel))
+                    self.entries[rel] = entry
+            if entry is not None:
+                entry[field] = value
+        self.save()
+
+    def merged_values(self, field: str) -> List[Optional[str]]:
+        """本次扫描到的所有文件的结果（按加载顺序，没有时为 None）"""
+        return [self.entries.get(rel, {}).get(field) for rel in self.files]
+
+    def merged_classifications(self) -> Dict[str, list]:
+        """合并后的分类输出（与 ImageClassifier 的多标签格式一致，附带文件列表）"""
+        tags = [tag or "ERROR" for tag in self.merged_values("classification")]
+        return {"style_tags": tags, "files": list(self.files)}
+
+    def merged_captions(self) -> Dict[str, list]:
+        """合并后的配文输出（与 SmartCaptionGenerator 格式一致，附带文件列表）"""
+        return {"captions": self.merged_values("caption"), "files": list(self.files)}
+
+    def save(self):
+        """原子写入清单（只保留本次扫描仍存在的文件）"""
+        if self.files:
+            current = set(self.files)
+            self.entries = {rel: entry for rel, entry in self.entries.items() if rel in current}
+        data = {"version": MANIFEST_VERSION, "folder": self.folder, "files": self.entries}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with _save_lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+        self.dirty = False
@@ -0,0 +1,107 @@
+"""
+融合分类配文（ComfyUI版本）
+一次请求同时返回分类标签和配文；输出校验失败时回退为 分类 → 配文 两步请求
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Union
+
+from PIL import Image
+
+from .caption_pe import select_pe
+from .classifier import classify_single_image
+from .doubao_client import call_doubao_api_fused, call_doubao_api_for_caption
+from .http_client import get_http_client
+from .image_payload import EncodedImage
+
+
+def build_caption_pe_table(pe_configs: Dict[str, str]) -> Dict[str, str]:
+    """从PE配置中提取 分类标签 -> 单图配文PE"""
+    return {
+        key[:-len("_单图")]: pe
+        for key, pe in pe_configs.items()
+        if key.endswith("_单图")
+    }
+
+
+def classify_and_caption_single_image(
+    image: Union[str, Image.Image, EncodedImage],
+    classification_pe: str,
+    pe_configs: Dict[str, str],
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = ""
+) -> Dict[str, Any]:
+    """
+    对单张图片分类并生成配文
+    
+    Returns:
+        {"style_tag": "...", "caption": "...", "path": "fused" | "fallback" | "error"}
+        path 表示结果来自融合请求还是两步回退；请求本身失败（连接错误、超时、重试耗尽）时
+        不回退，直接返回 style_tag 为 ERROR 的结果（path 为 error）
+    """
+    try:
+        result = call_doubao_api_fused(
+            image=image,
+            classification_pe=classification_pe,
+            caption_pe_table=build_caption_pe_table(pe_configs),
+            text_requirement=text_requirement,
+            api_key=api_key,
+            api_url=api_url,
+            model=model
+        )
+        result = dict(result)
+        result['path'] = 'fused'
+        return result
+    except (ValueError, json.JSONDecodeError) as e:
+        print(f"   ⚠️  融合请求未通过校验，回退为两步请求: {str(e)}")
+    except RuntimeError as e:
+        # 端点已经失败：回退只会再发两次请求
+        return {'style_tag': 'ERROR', 'error': str(e), 'caption': f"生成失败: {str(e)}", 'path': 'error'}
+    
+    # 回退：先分类，再按标签选择PE生成配文
+    result = dict(classify_single_image(image, classification_pe, text_requirement, api_key, api_url, model))
+    result['path'] = 'fallback'
+    if result.get('style_tag') == 'ERROR':
+        result['caption'] = f"生成失败: {result.get('error', '')}"
+        return result
+    
+    try:
+        result['caption'] = call_doubao_api_for_caption(
+            image,
+            select_pe(result['style_tag'], pe_configs),
+            text_requirement,
+            api_key,
+            api_url,
+            model
+        )
+    except Exception as e:
+        result['caption'] = f"生成失败: {str(e)}"
+    return result
+
+
+def classify_and_caption_images(
+    images: List[Union[str, Image.Image, EncodedImage]],
+    classification_pe: str,
+    pe_configs: Dict[str, str],
+    text_requirement: str = "",
+    api_key: str = "",
+    api_url: str = "",
+    model: str = "",
+    max_workers: int = 5
+) -> List[Dict[str, Any]]:
+    """
+    并发对多张图片分类并生成配文（逐张，不做关联判断）
+    
+    Returns:
+        与 images 顺序一致的结果列表
+    """
+    get_http_client(pool_size=max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(
+            lambda img: classify_and_caption_single_image(
+                img, classification_pe, pe_configs, text_requirement, api_key, api_url, model
+            ),
+            images
+        ))
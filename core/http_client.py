@@ -0,0 +1,132 @@
+"""
+Doubao HTTP 连接池（ComfyUI版本）
+所有 Doubao 请求共享同一个 keep-alive Session，避免每张图片重新进行 TCP+TLS 握手
+"""
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_POOL_SIZE = 10
+
+
+class DoubaoHTTPClient:
+    """
+    进程级共享的 HTTP 客户端
+
+    - 内部持有一个 requests.Session，连接在请求之间保持 keep-alive
+    - 连接池大小可随调用方的并发数（max_workers）增长，但不会缩小
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE):
+        self._lock = threading.Lock()
+        self.pool_size = max(1, int(pool_size))
+        self.session = requests.Session()
+        self.session.headers.update({"Connection": "keep-alive"})
+        self._mount_adapters(self.pool_size)
+
+    def _mount_adapters(self, pool_size: int):
+        """按指定大小挂载 HTTP/HTTPS 连接池"""
+        for prefix in ("https://", "http://"):
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=pool_size,
+                pool_block=False
+            )
+            old_adapter = self.session.adapters.get(prefix)
+            self.session.mount(prefix, adapter)
+            if old_adapter is not None:
+                old_adapter.close()
+
+    def ensure_pool_size(self, pool_size: int):
+        """
+        保证连接池至少能容纳 pool_size 个并发连接
+
+        Args:
+            pool_size: 期望的并发连接数（通常等于线程池的 max_workers）
+        """
+        pool_size = int(pool_size)
+        if pool_size <= self.pool_size:
+            return
+        with self._lock:
+            if pool_size > self.pool_size:
+                self._mount_adapters(pool_size)
+                self.pool_size = pool_size
+
+    def post(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        json: Dict[str, Any],
+        timeout: float = 60
+    ) -> requests.Response:
+        """发送 POST 请求（复用连接池中的连接）"""
+        return self.session.post(url, headers=headers, json=json, timeout=timeout)
+
+    def warm_up(self, api_url: str, connections: int = 1, timeout: float = 10):
+        """
+        预热连接：提前完成 DNS、TCP、TLS 握手，使首批请求直接复用连接
+
+        Args:
+            api_url: API 地址（只使用其 scheme + host 部分）
+            connections: 预热的连接数
+            timeout: 单次预热请求超时（秒）
+        """
+        parts = urlsplit(api_url)
+        if not parts.scheme or not parts.netloc:
+            return
+        base_url = f"{parts.scheme}://{parts.netloc}/"
+        connections = max(1, int(connections))
+        self.ensure_pool_size(connections)
+
+        def _touch():
+            try:
+                # 任意状态码都说明连接已建立，不关心响应内容
+                self.session.head(base_url, timeout=timeout)
+            except requests.exceptions.RequestException:
+                pass
+
+        threads = [threading.Thread(target=_touch, daemon=True) for _ in range(connections)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
+
+
+_client: Optional[DoubaoHTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_http_client(pool_size: Optional[int] = None) -> DoubaoHTTPClient:
+    """
+    获取进程级共享的 HTTP 客户端
+
+    Args:
+        pool_size: 若指定，则保证连接池至少为该大小
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DoubaoHTTPClient(pool_size or DEFAULT_POOL_SIZE)
+    if pool_size:
+        _client.ensure_pool_size(pool_size)
+    return _client
+
+
+def warm_up_in_background(api_url: str, connections: int = 1) -> threading.Thread:
+    """在后台线程预热连接，不阻塞节点加载"""
+    thread = threading.Thread(
+        target=get_http_client().warm_up,
+        args=(api_url, connections),
+        daemon=True
+    )
+    thread.start()
+    return thread
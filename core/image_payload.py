@@ -0,0 +1,208 @@
+"""
+图片编码句柄（ComfyUI版本）
+每张图片在一次运行中只做一次 JPEG + base64 编码，分类、配文、重试都复用同一份数据
+"""
+import base64
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from itertools import islice
+from typing import Iterable, List, NamedTuple, Optional, Sequence
+
+from PIL import Image
+
+
+# 在节点之间传递编码结果的 ComfyUI 自定义类型
+ENCODED_IMAGES_TYPE = "ENCODED_IMAGES"
+
+# 在节点之间传递原始文件路径的 ComfyUI 自定义类型
+IMAGE_FILES_TYPE = "IMAGE_FILES"
+
+DEFAULT_JPEG_QUALITY = 95
+
+
+class UploadPolicy(NamedTuple):
+    """
+    上传策略：编码前先把长边缩到 max_long_edge（0 表示保持原尺寸），再按 quality 编码JPEG
+
+    服务端本身也会把超大图片缩放后再送入模型，本地先缩放可以省掉编码时间和上传字节
+    """
+    max_long_edge: int = 0
+    quality: int = DEFAULT_JPEG_QUALITY
+
+
+# 保持原有行为：原尺寸 + JPEG q95
+ORIGINAL_POLICY = UploadPolicy()
+
+_MIME_TYPES = {
+    '.jpg': 'jpeg',
+    '.jpeg': 'jpeg',
+    '.png': 'png',
+    '.gif': 'gif',
+    '.webp': 'webp',
+    '.bmp': 'bmp'
+}
+
+
+def pil_to_jpeg_bytes(image: Image.Image, quality: int = DEFAULT_JPEG_QUALITY) -> bytes:
+    """将PIL Image编码为JPEG字节（RGBA在白底上合成）"""
+    buffered = io.BytesIO()
+
+    if image.mode == 'RGBA':
+        # 转换RGBA为RGB
+        rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+        rgb_image.paste(image, mask=image.split()[3])
+        rgb_image.save(buffered, format="JPEG", quality=quality)
+    else:
+        image.save(buffered, format="JPEG", quality=quality)
+
+    return buffered.getvalue()
+
+
+def downscale_for_upload(image: Image.Image, max_long_edge: int) -> Image.Image:
+    """按长边等比缩小（不放大），max_long_edge <= 0 时原样返回"""
+    if max_long_edge <= 0:
+        return image
+    width, height = image.size
+    long_edge = max(width, height)
+    if long_edge <= max_long_edge:
+        return image
+    scale = max_long_edge / long_edge
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    # reducing_gap 先做整数倍快速缩小，再用 LANCZOS 精修；2.0 时画质与直接缩放几乎无差别，大图快 2~3 倍
+    return image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+
+
+class EncodedImage:
+    """
+    已编码的图片
+
+    Attributes:
+        data_url: 可直接放入 image_url 的 base64 data URL
+        sha256: 编码后字节的哈希（用于缓存键、去重）
+        num_bytes: 编码后字节数
+    """
+
+    __slots__ = ('data_url', 'sha256', 'num_bytes')
+
+    def __init__(self, data: bytes, mime_type: str = 'jpeg'):
+        self.sha256 = hashlib.sha256(data).hexdigest()
+        self.num_bytes = len(data)
+        self.data_url = f"data:image/{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+    @classmethod
+    def from_pil(cls, image: Image.Image, policy: UploadPolicy = ORIGINAL_POLICY) -> "EncodedImage":
+        """按上传策略缩放并编码PIL Image"""
+        image = downscale_for_upload(image, policy.max_long_edge)
+        return cls(pil_to_jpeg_bytes(image, policy.quality), 'jpeg')
+
+    @classmethod
+    def from_path(cls, image_path: str) -> "EncodedImage":
+        """直接读取图片文件字节（不解码）"""
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        mime_type = _MIME_TYPES.get(Path(image_path).suffix.lower(), 'jpeg')
+        return cls(data, mime_type)
+
+    def __repr__(self):
+        return f"EncodedImage(sha256={self.sha256[:12]}, bytes={self.num_bytes})"
+
+
+class EncodedImageBatch(list):
+    """
+    与 IMAGE batch 一一对应的编码结果列表（ENCODED_IMAGES 类型的节点输出）
+
+    shape 记录编码时 IMAGE tensor 的形状，policy 记录编码时的上传策略，
+    下游节点据此确认句柄与当前图片、当前阶段的策略都匹配
+    """
+
+    def __init__(
+        self,
+        items: Sequence[EncodedImage] = (),
+        shape: Optional[tuple] = None,
+        policy: UploadPolicy = ORIGINAL_POLICY
+    ):
+        super().__init__(items)
+        self.shape = tuple(shape) if shape is not None else None
+        self.policy = policy
+
+    def matches(self, tensor, policy: Optional[UploadPolicy] = None) -> bool:
+        """判断是否与给定 IMAGE tensor（及上传策略）对应"""
+        if self.shape is None or tuple(tensor.shape) != self.shape or len(self) != tensor.shape[0]:
+            return False
+        return policy is None or policy == self.policy
+
+
+class ImageFileList(list):
+    """
+    与 IMAGE batch 一一对应的原始文件路径列表（IMAGE_FILES 类型的节点输出）
+
+    下游节点可直接从文件上传，跳过 tensor → PIL → JPEG 的往返
+    """
+
+    def __init__(self, paths: Sequence[str] = (), shape: Optional[tuple] = None):
+        super().__init__(paths)
+        self.shape = tuple(shape) if shape is not None else None
+
+    def matches(self, tensor) -> bool:
+        """判断是否与给定 IMAGE tensor 对应"""
+        return self.shape is not None and tuple(tensor.shape) == self.shape and len(self) == tensor.shape[0]
+
+
+def encode_file(image_path: str, policy: UploadPolicy = ORIGINAL_POLICY) -> EncodedImage:
+    """
+    从文件编码单张图片
+
+    原图策略时直接上传文件字节（不解码、不重新编码）；
+    需要缩放时从文件解码一次再按策略编码
+    """
+    if policy == ORIGINAL_POLICY:
+        return EncodedImage.from_path(image_path)
+    with Image.open(image_path) as img:
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGB')
+        return EncodedImage.from_pil(img, policy)
+
+
+def encode_files(
+    paths: Sequence[str],
+    policy: UploadPolicy = ORIGINAL_POLICY,
+    max_workers: int = 4
+) -> List[EncodedImage]:
+    """
+    并行从文件编码一组图片
+
+    Returns:
+        与输入顺序一致的 EncodedImage 列表
+    """
+    if len(paths) <= 1 or max_workers <= 1:
+        return [encode_file(path, policy) for path in paths]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda path: encode_file(path, policy), paths))
+
+
+def encode_images(
+    pil_images: Iterable[Image.Image],
+    policy: UploadPolicy = ORIGINAL_POLICY,
+    max_workers: int = 4
+) -> List[EncodedImage]:
+    """
+    并行缩放+编码一组图片（PIL缩放/编码时释放GIL，线程池即可并行）
+
+    pil_images 可以是惰性生成器：每次只取 max_workers * 2 张编码，
+    同一时刻内存中只有这一小批解码后的图片
+
+    Returns:
+        与输入顺序一致的 EncodedImage 列表
+    """
+    if max_workers <= 1:
+        return [EncodedImage.from_pil(img, policy) for img in pil_images]
+    iterator = iter(pil_images)
+    encoded = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            window = list(islice(iterator, max_workers * 2))
+            if not window:
+                return encoded
+            encoded.extend(executor.map(lambda img: EncodedImage.from_pil(img, policy), window))
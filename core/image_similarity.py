@@ -0,0 +1,213 @@
+"""
+本地图片相似度（ComfyUI版本）
+感知哈希（pHash）、颜色直方图与 EXIF 拍摄时间，全部用 NumPy 向量化计算，不调用 API。
+用于平铺文件夹的自动分组（相似或拍摄时间相近的图片归为同一个候选分组），
+以及 batch 内的近似重复去重（每簇只请求一张代表图）
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# pHash：缩到 32x32 灰度做 DCT，取左上 8x8 低频系数与中位数比较，得到 64 位哈希
+HASH_SAMPLE_SIZE = 32
+HASH_SIZE = 8
+# 颜色直方图：RGB 每通道 4 档，共 64 个 bin
+HIST_LEVELS = 4
+
+# 自动分组默认阈值
+DEFAULT_HASH_DISTANCE = 12      # pHash 汉明距离（0-64）
+DEFAULT_COLOR_DISTANCE = 0.35   # 颜色直方图 Hellinger 距离（0-1）
+DEFAULT_TIME_GAP = 120.0        # 拍摄时间间隔（秒）
+# 近似重复默认阈值（pHash 汉明距离）
+DEFAULT_DUPLICATE_DISTANCE = 6
+
+_EXIF_IFD = 0x8769
+_EXIF_DATETIME_ORIGINAL = 36867
+_EXIF_DATETIME = 306
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """n 点 DCT-II 正交变换矩阵"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(HASH_SAMPLE_SIZE)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """uint64 数组逐元素统计 1 的个数"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[values.view(np.uint8)].reshape(values.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def thumbnails(pil_images: Iterable[Image.Image]) -> np.ndarray:
+    """
+    每张图片缩放一次到 32x32（reducing_gap 让大图先整数倍缩小）
+
+    Returns:
+        uint8 [N, 32, 32, 3]
+    """
+    size = (HASH_SAMPLE_SIZE, HASH_SAMPLE_SIZE)
+    return np.stack([
+        np.asarray(img.convert("RGB").resize(size, Image.BILINEAR, reducing_gap=2.0))
+        for img in pil_images
+    ])
+
+
+def hash_thumbnails(thumbs: np.ndarray) -> np.ndarray:
+    """
+    整批计算 pHash：灰度 → DCT → 低频 8x8 与中位数比较
+
+    Args:
+        thumbs: [N, 32, 32, 3]，取值范围不限（0-255 或 0-1 均可）
+
+    Returns:
+        uint64 [N]
+    """
+    gray = thumbs.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    coeffs = (_DCT @ gray @ _DCT.T)[:, :HASH_SIZE, :HASH_SIZE].reshape(len(thumbs), -1)
+    bits = coeffs > np.median(coeffs, axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view(">u8").astype(np.uint64).ravel()
+
+
+def image_features(pil_images: Iterable[Image.Image]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算感知哈希和颜色直方图（缩略图之后的计算整批向量化）
+
+    Returns:
+        (hashes, hists)
+        - hashes: uint64 [N]
+        - hists: float32 [N, 64]，为归一化直方图的平方根（两两点积即 Bhattacharyya 系数）
+    """
+    thumbs = thumbnails(pil_images)
+    hashes = hash_thumbnails(thumbs)
+
+    # 颜色直方图：整批一次 bincount
+    quantized = (thumbs // (256 // HIST_LEVELS)).astype(np.int64)
+    bins = (quantized[..., 0] * HIST_LEVELS + quantized[..., 1]) * HIST_LEVELS + quantized[..., 2]
+    num_bins = HIST_LEVELS ** 3
+    bins = bins.reshape(len(thumbs), -1) + np.arange(len(thumbs))[:, None] * num_bins
+    counts = np.bincount(bins.ravel(), minlength=len(thumbs) * num_bins).reshape(len(thumbs), num_bins)
+    hists = np.sqrt(counts / counts.sum(axis=1, keepdims=True)).astype(np.float32)
+    return hashes, hists
+
+
+def read_timestamp(path: str) -> Optional[float]:
+    """读取 EXIF 拍摄时间（只解析文件头，不解码图片），没有时返回 None"""
+    try:
+        with Image.open(path) as img:
+            exif = img.getexif()
+            value = exif.get_ifd(_EXIF_IFD).get(_EXIF_DATETIME_ORIGINAL) or exif.get(_EXIF_DATETIME)
+        if not value:
+            return None
+        return datetime.strptime(str(value).strip("\x00 ")[:19], "%Y:%m:%d %H:%M:%S").timestamp()
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def read_timestamps(paths: Sequence[str]) -> np.ndarray:
+    """批量读取拍摄时间，float64 [N]，没有的为 NaN"""
+    return np.array([read_timestamp(path) or np.nan for path in paths], dtype=np.float64)
+
+
+def connected_components(count: int, edges_i: np.ndarray, edges_j: np.ndarray) -> np.ndarray:
+    """
+    无向图连通分量（标签传播 + 指针跳跃，全部向量化）
+
+    Returns:
+        int64 [N] 分量标签，按首次出现的顺序编号为 0, 1, 2, ...
+    """
+    labels = np.arange(count)
+    while len(edges_i):
+        updated = labels.copy()
+        np.minimum.at(updated, edges_i, labels[edges_j])
+        np.minimum.at(updated, edges_j, labels[edges_i])
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            break
+        labels = updated
+    _, first_index, inverse = np.unique(labels, return_index=True, return_inverse=True)
+    rank = np.empty(len(first_index), dtype=np.int64)
+    rank[np.argsort(first_index)] = np.arange(len(first_index))
+    return rank[inverse]
+
+
+def cluster_images(
+    hashes: np.ndarray,
+    hists: np.ndarray,
+    timestamps: Optional[np.ndarray] = None,
+    hash_distance: int = DEFAULT_HASH_DISTANCE,
+    color_distance: float = DEFAULT_COLOR_DISTANCE,
+    time_gap: float = DEFAULT_TIME_GAP,
+    chunk_size: int = 1024
+) -> np.ndarray:
+    """
+    图片聚类：两张图片颜色相近（Hellinger 距离 ≤ color_distance），且 pHash 相近
+    或拍摄时间间隔 ≤ time_gap 时相连，连通分量即为候选分组
+
+    两两距离按 chunk_size 行分块计算，内存占用与 chunk_size * N 成正比
+
+    Returns:
+        int64 [N] 分组标签，按首张图片的顺序编号
+    """
+    count = len(hashes)
+    if timestamps is None:
+        timestamps = np.full(count, np.nan)
+    # Hellinger 距离 d = sqrt(1 - BC)，d ≤ t 等价于 BC ≥ 1 - t²
+    min_overlap = 1.0 - color_distance ** 2
+    edges_i: List[np.ndarray] = []
+    edges_j: List[np.ndarray] = []
+    for start in range(0, count, chunk_size):
+        rows = slice(start, min(count, start + chunk_size))
+        similar_hash = popcount64(hashes[rows, None] ^ hashes[None, :]) <= hash_distance
+        close_time = np.abs(timestamps[rows, None] - timestamps[None, :]) <= time_gap  # NaN 比较为 False
+        similar_color = hists[rows] @ hists.T >= min_overlap
+        linked = (similar_hash | close_time) & similar_color
+        # 只保留 j > i 的边
+        linked &= np.arange(count)[None, :] > np.arange(rows.start, rows.stop)[:, None]
+        i, j = np.nonzero(linked)
+        edges_i.append(i + start)
+        edges_j.append(j)
+    return connected_components(
+        count,
+        np.concatenate(edges_i) if edges_i else np.empty(0, dtype=np.int64),
+        np.concatenate(edges_j) if edges_j else np.empty(0, dtype=np.int64)
+    )
+
+
+def near_duplicates(hashes: np.ndarray, max_distance: int = DEFAULT_DUPLICATE_DISTANCE) -> List[int]:
+    """
+    近似重复去重：按顺序扫描，尚未归属的图片成为代表图，
+    与其 pHash 汉明距离 ≤ max_distance 且尚未归属的图片都归入该簇
+
+    以代表图为中心划分（不做传递合并），簇内任意图片与代表图都足够相似，
+    不会因连续的微小差异把整段连拍串成一簇
+
+    Returns:
+        duplicate_of: 每张图片所属簇的代表图下标（代表图为自身，且总是簇内下标最小的图片）
+    """
+    duplicate_of = np.full(len(hashes), -1, dtype=np.int64)
+    for idx in range(len(hashes)):
+        if duplicate_of[idx] >= 0:
+            continue
+        members = (duplicate_of < 0) & (popcount64(hashes ^ hashes[idx]) <= max_distance)
+        duplicate_of[members] = idx
+    return duplicate_of.tolist()
+
+
+def format_duplicates(duplicate_of: Sequence[int], max_distance: int) -> str:
+    """去重结果的一行摘要（节点日志）"""
+    representatives = len(set(duplicate_of))
+    return (
+        f"🪞 近似去重（汉明距离 ≤ {max_distance}）: {len(duplicate_of)} 张图片 → {representatives} 张代表图，"
+        f"{len(duplicate_of) - representatives} 张复用代表图结果"
+    )
@@ -0,0 +1,95 @@
+"""
+进程内存统计（ComfyUI版本）
+用于在节点日志中输出峰值常驻内存（RSS）
+"""
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:  # 可选依赖
+    psutil = None
+
+
+def _read_proc_status(field: str) -> Optional[int]:
+    """读取 /proc/self/status 中的内存字段（字节）"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """
+    重置进程的峰值RSS（仅 Linux 支持）
+
+    Returns:
+        是否重置成功；失败时 peak_rss_bytes 返回的是进程启动以来的峰值
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def current_rss_bytes() -> Optional[int]:
+    """当前RSS（字节），无法获取时返回 None"""
+    value = _read_proc_status("VmRSS")
+    if value is not None:
+        return value
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """峰值RSS（字节），无法获取时返回 None"""
+    value = _read_proc_status("VmHWM")
+    if value is not None:
+        return value
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 单位为 KB，macOS 为字节
+        return peak if sys.platform == "darwin" else peak * 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss)
+    return None
+
+
+class PeakRSSTracker:
+    """
+    统计一段代码期间的峰值RSS
+
+    用法:
+        tracker = PeakRSSTracker()
+        ...
+        print(tracker.format())
+    """
+
+    def __init__(self):
+        self.start_rss = current_rss_bytes()
+        self.reset = reset_peak_rss()
+
+    def format(self) -> str:
+        """格式化峰值内存，无法获取时返回空字符串"""
+        peak = peak_rss_bytes()
+        if peak is None:
+            return ""
+        text = f"🧠 峰值内存(RSS): {peak / 1024 / 1024:.0f} MB"
+        if self.start_rss is not None:
+            text += f"（开始时 {self.start_rss / 1024 / 1024:.0f} MB）"
+        if not self.reset:
+            text += "（进程启动以来的峰值）"
+        return text
@@ -0,0 +1,181 @@
+"""
+模型级联（ComfyUI版本）
+分类先用快速模型；输出无效、标签为 其他/ERROR，或要求的置信度字段低于阈值时，
+再用强模型重新分类该图片。ModelCascade 可以代替模型名传给 classifier 中的分类函数
+"""
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+from PIL import Image
+
+from .doubao_client import call_doubao_api, call_doubao_api_multi_images
+from .image_payload import EncodedImage
+
+
+# 快速模型输出这些标签时升级到强模型
+ESCALATE_TAGS = ("其他", "ERROR")
+CONFIDENCE_FIELD = "confidence"
+CONFIDENCE_INSTRUCTION = (
+    f'\n\n另外在每个分类结果的JSON对象中增加 "{CONFIDENCE_FIELD}" 字段：'
+    f'0到1之间的小数，表示对 style_tag 判断的把握程度。'
+)
+
+
+class ModelCascade(NamedTuple):
+    """
+    两级模型级联
+
+    Attributes:
+        fast_model: 先请求的快速模型
+        strong_model: 需要升级时请求的强模型
+        min_confidence: > 0 时要求快速模型输出 confidence 字段，缺失或低于该值时升级
+    """
+    fast_model: str
+    strong_model: str
+    min_confidence: float = 0.0
+
+    def fast_prompt(self, prompt: str) -> str:
+        """快速模型的分类PE（需要置信度时追加输出要求）"""
+        return prompt + CONFIDENCE_INSTRUCTION if self.min_confidence > 0 else prompt
+
+    def escalation_reason(self, result: Any) -> Optional[str]:
+        """
+        判断快速模型的结果是否需要升级
+
+        Returns:
+            None（直接采用）或升级原因："invalid" / "tag" / "confidence"
+        """
+        if not isinstance(result, dict) or 'style_tag' not in result:
+            return "invalid"
+        if result['style_tag'] in ESCALATE_TAGS:
+            return "tag"
+        if self.min_confidence > 0:
+            try:
+                confidence = float(result.get(CONFIDENCE_FIELD))
+            except (TypeError, ValueError):
+                return "confidence"
+            if confidence < self.min_confidence:
+                return "confidence"
+        return None
+
+    def classify(
+        self,
+        image: Union[str, Image.Image, EncodedImage],
+        prompt: str,
+        text_requirement: str = "",
+        api_key: str = "",
+        api_url: str = ""
+    ) -> Dict[str, Any]:
+        """
+        单图级联分类
+
+        Returns:
+            快速模型的结果，或升级后强模型的结果（强模型失败时抛出异常）
+        """
+        start = time.perf_counter()
+        try:
+            result = call_doubao_api(image, self.fast_prompt(prompt), text_requirement, api_key, api_url, self.fast_model)
+        except Exception:
+            result = None
+        cascade_stats.record("fast", 1, time.perf_counter() - start)
+        reason = self.escalation_reason(result)
+        if reason is None:
+            return result
+        cascade_stats.incr(reason)
+        return self._classify_strong(image, prompt, text_requirement, api_key, api_url)
+
+    def classify_multi(
+        self,
+        images: List[Union[str, Image.Image, EncodedImage]],
+        prompt: str,
+        text_requirement: str = "",
+        api_key: str = "",
+        api_url: str = ""
+    ) -> List[Dict[str, Any]]:
+        """
+        多图请求的级联分类：快速模型一次请求分类整块，需要升级的图片（包括缺少 style_tag 的单个元素）
+        再逐张请求强模型
+
+        Raises:
+            快速模型的多图请求失败或输出数组不完整时抛出异常（由调用方回退为逐张分类）
+        """
+        start = time.perf_counter()
+        try:
+            results = call_doubao_api_multi_images(
+                images, self.fast_prompt(prompt), text_requirement, api_key, api_url, self.fast_model, strict=False
+            )
+        finally:
+            cascade_stats.record("fast", 1, time.perf_counter() - start)
+        results = list(results)
+        for idx, result in enumerate(results):
+            reason = self.escalation_reason(result)
+            if reason is None:
+                continue
+            cascade_stats.incr(reason)
+            try:
+                results[idx] = self._classify_strong(images[idx], prompt, text_requirement, api_key, api_url)
+            except Exception as e:
+                results[idx] = {'style_tag': 'ERROR', 'error': str(e)}
+        return results
+
+    def _classify_strong(self, image, prompt, text_requirement, api_key, api_url) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            return call_doubao_api(image, prompt, text_requirement, api_key, api_url, self.strong_model)
+        finally:
+            cascade_stats.record("strong", 1, time.perf_counter() - start)
+
+
+class CascadeStats:
+    """进程内累计的模型级联统计（配合 stats_snapshot / format_stats_delta 输出单次运行的数据）"""
+
+    FIELDS = ("fast", "fast_seconds", "strong", "strong_seconds", "invalid", "tag", "confidence")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str, n: float = 1):
+        with self._lock:
+            self._counts[field] += n
+
+    def record(self, tier: str, requests: int, seconds: float):
+        """记录某一级的请求数和耗时"""
+        with self._lock:
+            self._counts[tier] += requests
+            self._counts[f"{tier}_seconds"] += seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counts)
+
+
+cascade_stats = CascadeStats()
+
+
+def stats_snapshot() -> Dict[str, float]:
+    """节点运行前调用，配合 format_stats_delta 输出本次运行的级联统计"""
+    return cascade_stats.snapshot()
+
+
+def format_stats_delta(before: Optional[Dict[str, float]]) -> str:
+    """格式化一次节点运行期间的级联统计（没有使用级联时返回空字符串）"""
+    if before is None:
+        return ""
+    after = cascade_stats.snapshot()
+    delta = {field: after[field] - before[field] for field in CascadeStats.FIELDS}
+    if not delta["fast"]:
+        return ""
+
+    def _tier(name, tier):
+        count = int(delta[tier])
+        average = delta[f"{tier}_seconds"] / count * 1000 if count else 0.0
+        return f"{name} {count} 次（平均 {average:.0f} ms）"
+
+    escalated = int(delta["invalid"] + delta["tag"] + delta["confidence"])
+    return (
+        f"🪜 模型级联: {_tier('快速模型', 'fast')}，{_tier('强模型', 'strong')}；"
+        f"升级 {escalated} 张（无效输出 {int(delta['invalid'])} / 其他或ERROR {int(delta['tag'])} / "
+        f"低置信度 {int(delta['confidence'])}）"
+    )
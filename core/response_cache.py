@@ -0,0 +1,240 @@
+"""
+Doubao 响应缓存（ComfyUI版本）
+基于 SQLite 的内容寻址缓存：键为 请求类型 + 请求体（图片内容 + PE + 文本需求 + 模型）的哈希
+重复运行工作流时，未变化的图片直接命中缓存，不再调用 API
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
+DEFAULT_MAX_ENTRIES = 50000
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE_DAYS = 30
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """
+    持久化响应缓存
+
+    - 大小淘汰：超过 max_entries 条或 max_bytes 字节时，按最近访问时间（LRU）删除
+    - 时间淘汰：超过 max_age_days 天未写入的条目视为过期
+    - 统计：hits / misses 计数（进程内累计）
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_age_days: float = DEFAULT_MAX_AGE_DAYS,
+        evict_interval: int = 100
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.evict_interval = evict_interval
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+
+    @staticmethod
+    def make_key(kind: str, payload: Dict[str, Any]) -> str:
+        """根据请求类型和请求体生成缓存键（与 api_url / api_key 无关）"""
+        digest = hashlib.sha256(kind.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取缓存，未命中或已过期返回 default"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.max_age > 0 and now - row[1] > self.max_age):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return default
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, kind: str, value: Any):
+        """写入缓存（value 需可JSON序列化）"""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, kind, value, size, created_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, kind, data, len(data), now, now)
+            )
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= self.evict_interval:
+                self._puts_since_evict = 0
+                self._evict_locked(now)
+
+    def evict(self):
+        """立即执行一次淘汰"""
+        with self._lock:
+            self._evict_locked(time.time())
+
+    def _evict_locked(self, now: float):
+        if self.max_age > 0:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        # 按最近访问时间从旧到新删除，直到同时满足条数和字节上限
+        to_delete = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at ASC"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            to_delete.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中统计和当前条目数"""
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": count,
+                "bytes": total
+            }
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取进程级共享的响应缓存
+
+    环境变量:
+        SMART_CAPTION_CACHE=0          关闭缓存
+        SMART_CAPTION_CACHE_DIR        缓存目录（默认为插件目录下的 cache/）
+        SMART_CAPTION_CACHE_MAX_MB     缓存上限（MB）
+        SMART_CAPTION_CACHE_MAX_DAYS   条目有效期（天）
+    """
+    global _cache
+    if os.environ.get("SMART_CAPTION_CACHE", "1") == "0":
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache_dir = os.environ.get("SMART_CAPTION_CACHE_DIR", DEFAULT_CACHE_DIR)
+                max_mb = float(os.environ.get("SMART_CAPTION_CACHE_MAX_MB", DEFAULT_MAX_BYTES / 1024 / 1024))
+                max_days = float(os.environ.get("SMART_CAPTION_CACHE_MAX_DAYS", DEFAULT_MAX_AGE_DAYS))
+                try:
+                    _cache = ResponseCache(
+                        os.path.join(cache_dir, "responses.sqlite3"),
+                        max_bytes=int(max_mb * 1024 * 1024),
+                        max_age_days=max_days
+                    )
+                except (OSError, sqlite3.Error) as e:
+                    print(f"⚠️  响应缓存初始化失败，将不使用缓存: {str(e)}")
+                    return None
+    return _cache
+
+
+def cached_call(kind: str, payload: Dict[str, Any], fetch, cacheable=lambda value: True):
+    """
+    带缓存地执行一次请求
+
+    Args:
+        kind: 请求类型（"classify" / "caption"）
+        payload: 请求体（用于生成缓存键）
+        fetch: 无参函数，未命中时调用并返回结果
+        cacheable: 判断结果是否应写入缓存
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return fetch()
+
+    key = cache.make_key(kind, payload)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    value = fetch()
+    if cacheable(value):
+        cache.put(key, kind, value)
+    return value
+
+
+async def cached_call_async(kind: str, payload: Dict[str, Any], fetch, cacheable=lambda value: True):
+    """cached_call 的异步版本，fetch 为无参协程函数（SQLite 读写和键的哈希在线程中执行，不阻塞事件循环）"""
+    cache = await asyncio.to_thread(get_response_cache)
+    if cache is None:
+        return await fetch()
+
+    key = await asyncio.to_thread(cache.make_key, kind, payload)
+    value = await asyncio.to_thread(cache.get, key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    value = await fetch()
+    if cacheable(value):
+        await asyncio.to_thread(cache.put, key, kind, value)
+    return value
+
+
+def format_stats_delta(before: Optional[Dict[str, int]]) -> str:
+    """格式化一次节点运行期间的命中统计（before 为运行前的 stats()）"""
+    cache = get_response_cache()
+    if cache is None or before is None:
+        return ""
+    after = cache.stats()
+    hits = after["hits"] - before["hits"]
+    misses = after["misses"] - before["misses"]
+    return f"💾 响应缓存: 命中 {hits} / 未命中 {misses}（共 {after['entries']} 条）"
+
+
+def stats_snapshot() -> Optional[Dict[str, int]]:
+    """节点运行前调用，配合 format_stats_delta 输出本次运行的命中情况"""
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else None
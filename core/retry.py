@@ -0,0 +1,340 @@
+"""
+Doubao 请求重试与自适应并发（ComfyUI版本）
+429 / 5xx / 连接错误按指数退避 + 抖动重试（优先遵守 Retry-After），
+并用 AIMD 控制在途请求数：被限流时减半，成功后逐步回升
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, NamedTuple, Optional
+
+
+# 可重试的HTTP状态码；其中 429 / 503 视为限流信号，会触发并发减半
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+DEFAULT_MAX_CONCURRENCY = 512
+
+
+class RetryPolicy(NamedTuple):
+    """
+    重试策略
+
+    第 n 次重试前等待 min(max_delay, base_delay * 2^n) 内的随机时长（full jitter）；
+    服务端返回 Retry-After 时以其为准（不超过 max_delay）
+    """
+    max_retries: int = 4
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class RetryableError(Exception):
+    """
+    可重试的请求失败
+
+    Attributes:
+        cause: 原始异常（重试耗尽后原样抛出，调用方的错误处理保持不变）
+        retry_after: 服务端建议的等待秒数
+        throttled: 是否为限流信号
+    """
+
+    def __init__(self, cause: Exception, retry_after: Optional[float] = None, throttled: bool = False):
+        super().__init__(str(cause))
+        self.cause = cause
+        self.retry_after = retry_after
+        self.throttled = throttled
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或HTTP日期），无法解析时返回 None"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int, retry_after: Optional[float] = None) -> float:
+    """计算第 attempt 次重试（从0开始）前的等待时间"""
+    if retry_after is not None:
+        return min(policy.max_delay, retry_after)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD 并发控制器
+
+    - 乘性减：收到限流信号时，上限降为当前在途数的一半；
+      只有在上一次减半之后发出的请求才能再次触发减半，避免同一波429连续减半
+    - 加性增：每次成功上限增加 1/limit，约每一轮并发成功后 +1
+    - 线程池与 asyncio 两条路径共用同一个控制器；异步等待者按到达顺序排队，
+      有空位时由归还名额的一方通过 call_soon_threadsafe 唤醒（不轮询）
+    """
+
+    def __init__(self, max_limit: int = DEFAULT_MAX_CONCURRENCY, min_limit: int = 1):
+        self.max_limit = max(1, int(max_limit))
+        self.min_limit = max(1, min(int(min_limit), self.max_limit))
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        # 每次减半后 +1；请求获取名额时记下当时的 epoch
+        self.epoch = 0
+        self._cond = threading.Condition()
+        self._async_waiters = deque()  # (事件循环, future)
+
+    def _try_enter_locked(self) -> bool:
+        if self.in_flight < max(self.min_limit, int(self.limit)):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self) -> int:
+        """同步获取一个请求名额（阻塞直到有空位），返回当前 epoch"""
+        with self._cond:
+            while not self._try_enter_locked():
+                self._cond.wait()
+            return self.epoch
+
+    async def acquire_async(self) -> int:
+        """异步获取一个请求名额（不阻塞事件循环，先到先得），返回当前 epoch"""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if not self._async_waiters and self._try_enter_locked():
+                return self.epoch
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+        try:
+            return await waiter[1]
+        except asyncio.CancelledError:
+            with self._cond:
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+                elif not waiter[1].cancelled():
+                    # 名额已经分配给本次等待：归还
+                    self._release_locked()
+            raise
+
+    def _grant(self, future: asyncio.Future, epoch: int):
+        """在等待者的事件循环中执行：交付名额；等待已被取消时归还"""
+        if future.done():
+            self.release()
+        else:
+            future.set_result(epoch)
+
+    def _wake_async_locked(self):
+        """把空出的名额按顺序分配给异步等待者"""
+        while self._async_waiters and self._try_enter_locked():
+            loop, future = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._grant, future, self.epoch)
+            except RuntimeError:
+                # 等待者的事件循环已关闭
+                self.in_flight -= 1
+
+    def _release_locked(self):
+        self.in_flight -= 1
+        self._wake_async_locked()
+        self._cond.notify()
+
+    def release(self):
+        """归还名额"""
+        with self._cond:
+            self._release_locked()
+
+    @contextmanager
+    def slot(self):
+        epoch = self.acquire()
+        try:
+            yield epoch
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        epoch = await self.acquire_async()
+        try:
+            yield epoch
+        finally:
+            self.release()
+
+    def on_success(self):
+        """请求成功：加性增"""
+        with self._cond:
+            if self.limit < self.max_limit:
+                self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+                self._wake_async_locked()
+                self._cond.notify_all()
+
+    def on_throttle(self, epoch: int) -> bool:
+        """
+        收到限流信号：乘性减
+
+        Args:
+            epoch: 被限流的请求获取名额时的 epoch
+
+        Returns:
+            本次是否实际降低了上限（请求发出后已经减过半时返回 False）
+        """
+        with self._cond:
+            if epoch != self.epoch:
+                return False
+            self.epoch += 1
+            # 在途数 +1 计入刚刚失败的这个请求
+            self.limit = max(float(self.min_limit), min(self.limit, self.in_flight + 1) / 2)
+            return True
+
+
+class RetryStats:
+    """进程内累计的请求/重试/限流计数（配合 stats_snapshot / format_stats_delta 输出单次运行的数据）"""
+
+    FIELDS = ("requests", "retries", "throttles", "failures")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def incr(self, field: str, n: int = 1):
+        with self._lock:
+            self._counts[field] += n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+
+_limiter: Optional[AdaptiveConcurrency] = None
+_limiter_lock = threading.Lock()
+retry_stats = RetryStats()
+
+
+def get_concurrency_limiter() -> AdaptiveConcurrency:
+    """
+    获取进程级共享的并发控制器（所有节点共享同一份限流状态）
+
+    环境变量:
+        SMART_CAPTION_MAX_CONCURRENCY   在途请求数上限（默认 512）
+    """
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                max_limit = int(os.environ.get("SMART_CAPTION_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+                _limiter = AdaptiveConcurrency(max_limit=max_limit)
+    return _limiter
+
+
+def _retry_policy() -> RetryPolicy:
+    """读取环境变量 SMART_CAPTION_MAX_RETRIES 覆盖默认重试次数"""
+    max_retries = os.environ.get("SMART_CAPTION_MAX_RETRIES")
+    if max_retries is None:
+        return DEFAULT_RETRY_POLICY
+    return DEFAULT_RETRY_POLICY._replace(max_retries=max(0, int(max_retries)))
+
+
+def _on_retryable(error: RetryableError, attempt: int, policy: RetryPolicy, limiter: AdaptiveConcurrency, epoch: int) -> float:
+    """记录一次可重试失败；需要重试时返回等待秒数，重试耗尽时抛出原始异常"""
+    if error.throttled:
+        retry_stats.incr("throttles")
+        limiter.on_throttle(epoch)
+    if attempt >= policy.max_retries:
+        retry_stats.incr("failures")
+        raise error.cause
+    retry_stats.incr("retries")
+    return backoff_delay(policy, attempt, error.retry_after)
+
+
+def call_with_retry(send, policy: Optional[RetryPolicy] = None, limiter: Optional[AdaptiveConcurrency] = None):
+    """
+    带重试与自适应并发地执行一次请求
+
+    Args:
+        send: 无参函数，成功时返回结果，可重试的失败抛出 RetryableError
+        policy: 重试策略（默认读取环境变量）
+        limiter: 并发控制器（默认为进程级共享实例）
+    """
+    policy = policy or _retry_policy()
+    limiter = limiter or get_concurrency_limiter()
+    attempt = 0
+    while True:
+        retry_stats.incr("requests")
+        epoch = limiter.epoch
+        try:
+            with limiter.slot() as epoch:
+                result = send()
+        except RetryableError as e:
+            # 等待发生在名额之外，退避期间不占用并发
+            time.sleep(_on_retryable(e, attempt, policy, limiter, epoch))
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
+
+
+async def call_with_retry_async(
+    send,
+    policy: Optional[RetryPolicy] = None,
+    limiter: Optional[AdaptiveConcurrency] = None,
+    semaphore: Optional[asyncio.Semaphore] = None
+):
+    """
+    call_with_retry 的异步版本，send 为无参协程函数
+
+    Args:
+        semaphore: 调用方的在途上限（如客户端信号量）；每次发送前先于并发控制器获取、发送结束即释放，
+                   退避等待和排队等待信号量的请求都不计入在途数
+    """
+    policy = policy or _retry_policy()
+    limiter = limiter or get_concurrency_limiter()
+    attempt = 0
+    while True:
+        retry_stats.incr("requests")
+        epoch = limiter.epoch
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                async with limiter.slot_async() as epoch:
+                    result = await send()
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+        except RetryableError as e:
+            await asyncio.sleep(_on_retryable(e, attempt, policy, limiter, epoch))
+            attempt += 1
+            continue
+        limiter.on_success()
+        return result
+
+
+def stats_snapshot() -> Dict[str, int]:
+    """节点运行前调用，配合 format_stats_delta 输出本次运行的重试情况"""
+    return retry_stats.snapshot()
+
+
+def format_stats_delta(before: Optional[Dict[str, int]]) -> str:
+    """格式化一次节点运行期间的重试/限流统计（没有重试时返回空字符串）"""
+    if before is None:
+        return ""
+    after = retry_stats.snapshot()
+    delta = {field: after[field] - before[field] for field in RetryStats.FIELDS}
+    if not delta["retries"] and not delta["throttles"] and not delta["failures"]:
+        return ""
+    limiter = get_concurrency_limiter()
+    return (
+        f"🔁 请求重试: 发送 {delta['requests']} 次 / 重试 {delta['retries']} / "
+        f"限流 {delta['throttles']} / 放弃 {delta['failures']}（当前并发上限 {int(limiter.limit)}）"
+    )
@@ -0,0 +1,99 @@
+"""
+IMAGE tensor 转换（ComfyUI版本）
+IMAGE tensor → uint8 / PIL / 缩略图 / 上传数据，分类、配文、融合、流水线节点共用
+"""
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from . import batch_layout, image_payload, image_similarity
+
+
+# tensor → uint8 每次转换的图片数（临时 float 副本只有这么多张）
+TENSOR_CHUNK_SIZE = 8
+
+
+def tensor_to_uint8(tensor):
+    """
+    0-1 float tensor → uint8 tensor（CPU）
+    
+    在 torch 中一次完成缩放、截断到 [0, 255] 和取整（向零取整，与原来的 astype(np.uint8) 一致），
+    超出范围的值不再回绕
+    """
+    return tensor.mul(255.0).clamp_(0, 255).to(torch.uint8).cpu()
+
+
+def iter_tensor_images(tensor, boxes=None, chunk_size=TENSOR_CHUNK_SIZE):
+    """
+    逐张惰性生成 PIL Image（按 chunk_size 分块转换，不会把整批复制为 float）
+    
+    Args:
+        tensor: shape [B, H, W, C], range 0-1
+        boxes: 可选，每张图片的 (left, top, right, bottom) 区域，只转换该区域（pad 模式的原图部分）
+    Yields:
+        PIL Image
+    """
+    if boxes is not None:
+        for i, (left, top, right, bottom) in enumerate(boxes):
+            yield Image.fromarray(tensor_to_uint8(tensor[i, top:bottom, left:right]).numpy())
+        return
+    
+    for start in range(0, tensor.shape[0], chunk_size):
+        chunk = tensor_to_uint8(tensor[start:start + chunk_size]).numpy()
+        for i in range(chunk.shape[0]):
+            yield Image.fromarray(chunk[i])
+
+
+def tensor_thumbnails(tensor, boxes=None, chunk_size=TENSOR_CHUNK_SIZE):
+    """
+    整批缩小为 32x32 缩略图（区域平均池化，直接读取 tensor，不转换 PIL）
+    
+    Returns:
+        numpy float32 [B, 32, 32, 3]，取值 0-1
+    """
+    size = image_similarity.HASH_SAMPLE_SIZE
+    if boxes is not None:
+        parts = [
+            F.adaptive_avg_pool2d(tensor[i, top:bottom, left:right, :3].permute(2, 0, 1).unsqueeze(0), size)
+            for i, (left, top, right, bottom) in enumerate(boxes)
+        ]
+    else:
+        parts = [
+            F.adaptive_avg_pool2d(tensor[start:start + chunk_size, :, :, :3].permute(0, 3, 1, 2), size)
+            for start in range(0, tensor.shape[0], chunk_size)
+        ]
+    return torch.cat(parts).permute(0, 2, 3, 1).float().cpu().numpy()
+
+
+def find_duplicates(image, image_sizes="", max_distance=image_similarity.DEFAULT_DUPLICATE_DISTANCE):
+    """
+    batch 内近似重复去重（本地 pHash，不调用 API）
+    
+    Returns:
+        duplicate_of: 每张图片所属簇的代表图下标（代表图为自身）
+    """
+    boxes = batch_layout.parse_image_boxes(image_sizes, image)
+    hashes = image_similarity.hash_thumbnails(tensor_thumbnails(image, boxes))
+    duplicate_of = image_similarity.near_duplicates(hashes, max_distance)
+    print(f"   {image_similarity.format_duplicates(duplicate_of, max_distance)}")
+    return duplicate_of
+
+
+def encode_image_batch(image, upload_policy, image_files=None, image_sizes=""):
+    """
+    将IMAGE batch编码为上传数据
+    
+    image_files（BatchImageLoader输出）与 batch 对应时直接从原始文件编码，
+    跳过 tensor → PIL → JPEG 的往返；原图策略下直接上传文件字节。
+    否则从tensor编码，有 image_sizes 时只编码每张图片的原图区域（不上传 pad 的黑边）
+    
+    Returns:
+        list of EncodedImage
+    """
+    if image_files is not None:
+        if image_files.matches(image):
+            print(f"   📎 直接从原始文件编码（{len(image_files)} 个文件）")
+            return image_payload.encode_files(image_files, upload_policy)
+        print(f"⚠️  image_files 与图片batch不匹配，改为从tensor编码")
+    boxes = batch_layout.parse_image_boxes(image_sizes, image)
+    return image_payload.encode_images(iter_tensor_images(image, boxes), upload_policy)
@@ -3,6 +3,8 @@ from . import image_classifier
 from . import caption_generator
 from . import batch_image_loader
 from . import multi_image_uploader
+from . import fused_classify_caption
+from . import pipeline_classify_caption
 
-__all__ = ['image_classifier', 'caption_generator', 'batch_image_loader', 'multi_image_uploader']
+__all__ = ['image_classifier', 'caption_generator', 'batch_image_loader', 'multi_image_uploader', 'fused_classify_caption', 'pipeline_classify_caption']
 
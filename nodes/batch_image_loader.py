@@ -4,23 +4,137 @@ BatchImageLoader节点 - 批量图片加载器
 """
 import os
 import json
+import hashlib
+import time
 import torch
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
+from ..core import batch_layout, decoded_cache, folder_manifest, image_payload, image_similarity, memory_stats
 
 
-def load_images_from_folder(folder_path, max_images=100):
+# 支持的图片格式
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
+
+
+def decode_image(file_path, long_edge=0, use_draft=True):
+    """
+    解码单张图片为RGB（在工作线程中调用，PIL解码时释放GIL）
+    
+    Args:
+        file_path: 图片路径
+        long_edge: 目标长边（0 表示原尺寸）
+        use_draft: JPEG 使用 draft 模式在解码时直接按 1/2、1/4、1/8 缩小
+    
+    Returns:
+        已完成解码的 PIL Image
+    """
+    img = Image.open(file_path)
+    if use_draft and long_edge > 0 and img.format == 'JPEG':
+        scale = long_edge / max(img.size)
+        if scale < 1:
+            # draft 只会缩到不小于目标尺寸的最近档位，剩余部分由下面的缩放完成
+            img.draft('RGB', (max(1, int(img.width * scale)), max(1, int(img.height * scale))))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    else:
+        img.load()
+    if long_edge > 0:
+        img = image_payload.downscale_for_upload(img, long_edge)
+    return img
+
+
+def _list_images(dir_path):
+    """用 os.scandir 列出目录下的图片文件（按文件名排序的 DirEntry 列表）"""
+    with os.scandir(dir_path) as it:
+        entries = [entry for entry in it if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS]
+    return sorted(entries, key=lambda entry: entry.name)
+
+
+def _scan_image_entries(folder_path):
+    """
+    按加载顺序列出图片文件（不解码、不读取文件内容）
+    
+    Returns:
+        (subdirs, [(组名, DirEntry), ...])；没有子文件夹时组名为 "all"
+    """
+    with os.scandir(folder_path) as it:
+        subdirs = [entry.name for entry in it if entry.is_dir()]
+    
+    candidates = []
+    if subdirs:
+        # 有子文件夹：按子文件夹分组（根目录下的图片不加载）
+        for subdir in sorted(subdirs):
+            for entry in _list_images(os.path.join(folder_path, subdir)):
+                candidates.append((subdir, entry))
+    else:
+        # 没有子文件夹：所有图片作为一组
+        for entry in _list_images(folder_path):
+            candidates.append(("all", entry))
+    return subdirs, candidates
+
+
+def _scan_image_files(folder_path):
+    """
+    按加载顺序列出图片文件
+    
+    Returns:
+        (subdirs, [(组名, 文件路径), ...])；没有子文件夹时组名为 "all"
+    """
+    subdirs, entries = _scan_image_entries(folder_path)
+    return subdirs, [(group_name, entry.path) for group_name, entry in entries]
+
+
+def folder_fingerprint(folder_path):
+    """
+    文件夹指纹：加载器会读取的每个文件的 组名/文件名、大小、修改时间 的哈希
+    
+    只做 os.scandir 遍历和 stat，不解码图片，文件增删改、重命名都会改变指纹
+    """
+    digest = hashlib.sha256()
+    _, entries = _scan_image_entries(folder_path)
+    for group_name, entry in entries:
+        stat = entry.stat()
+        digest.update(f"{group_name}/{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+    return digest.hexdigest()
+
+
+def auto_group_images(loaded):
+    """
+    平铺文件夹的自动分组：按感知哈希、颜色直方图和 EXIF 拍摄时间聚类（本地计算，不调用 API）
+    
+    Args:
+        loaded: [(组名, 文件路径, PIL Image)]
+    
+    Returns:
+        重新排序后的 loaded：同一分组的图片连续排列，组名为 auto_1, auto_2, ...
+        （分组按其第一张图片的原始顺序排列，组内保持原始顺序）
+    """
+    hashes, hists = image_similarity.image_features([img for _, _, img in loaded])
+    timestamps = image_similarity.read_timestamps([file_path for _, file_path, _ in loaded])
+    labels = image_similarity.cluster_images(hashes, hists, timestamps)
+    order = np.argsort(labels, kind="stable")
+    return [(f"auto_{labels[i] + 1}", loaded[i][1], loaded[i][2]) for i in order]
+
+
+def load_images_from_folder(folder_path, max_images=100, return_paths=False, max_workers=8, long_edge=0, manifest=None, auto_group=False):
     """
     从文件夹加载所有图片（支持自动分组）
     
     Args:
         folder_path: 文件夹路径
         max_images: 最大加载图片数
+        return_paths: 是否同时返回每张图片的文件路径
+        max_workers: 并行解码线程数
+        long_edge: 解码目标长边（0 表示原尺寸）
+        manifest: 增量模式的 FolderManifest，只加载新增或变化的文件（可能一张都不加载）
+        auto_group: 没有子文件夹时按图片相似度和拍摄时间自动分组（否则所有图片为一组 "all"）
     
     Returns:
-        (pil_images, groups_info)
+        (pil_images, groups_info)，return_paths=True 时为 (pil_images, groups_info, file_paths)
         - pil_images: list of PIL Images
         - groups_info: dict with group structure
+        - file_paths: 与 pil_images 一一对应的文件路径
     """
     if not os.path.exists(folder_path):
         raise ValueError(f"文件夹不存在: {folder_path}")
@@ -28,86 +142,67 @@ def load_images_from_folder(folder_path, max_images=100):
     if not os.path.isdir(folder_path):
         raise ValueError(f"路径不是文件夹: {folder_path}")
     
-    # 支持的图片格式
-    image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}
-    
-    # 检查是否有子文件夹
-    subdirs = [d for d in os.listdir(folder_path) 
-               if os.path.isdir(os.path.join(folder_path, d))]
-    
-    pil_images = []
-    groups = []  # 存储每组的起始和结束索引
-    
+    subdirs, candidates = _scan_image_files(folder_path)
     if subdirs:
-        # 有子文件夹：按子文件夹分组
         print(f"   📂 检测到 {len(subdirs)} 个子文件夹，将自动分组")
-        
-        for subdir in sorted(subdirs):
-            subdir_path = os.path.join(folder_path, subdir)
-            group_start = len(pil_images)
-            
-            # 加载当前子文件夹的图片
-            for filename in sorted(os.listdir(subdir_path)):
-                ext = os.path.splitext(filename)[1].lower()
-                if ext in image_extensions:
-                    file_path = os.path.join(subdir_path, filename)
-                    try:
-                        img = Image.open(file_path)
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        pil_images.append(img)
-                        
-                        if len(pil_images) >= max_images:
-                            break
-                    except Exception as e:
-                        print(f"⚠️  加载图片失败: {file_path} - {str(e)}")
-                        continue
-            
-            group_end = len(pil_images)
-            
-            # 记录分组（如果该组有图片）
-            if group_end > group_start:
-                groups.append({
-                    "name": subdir,
-                    "start": group_start,
-                    "end": group_end,
-                    "count": group_end - group_start
-                })
-                print(f"   ✓ {subdir}: {group_end - group_start} 张图片")
-            
-            if len(pil_images) >= max_images:
-                break
+    elif auto_group:
+        print(f"   📄 无子文件夹，将按图片相似度自动分组")
     else:
-        # 没有子文件夹：所有图片作为一组
         print(f"   📄 无子文件夹，所有图片作为一组")
-        
-        for filename in sorted(os.listdir(folder_path)):
-            ext = os.path.splitext(filename)[1].lower()
-            if ext in image_extensions:
-                file_path = os.path.join(folder_path, filename)
-                try:
-                    img = Image.open(file_path)
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    pil_images.append(img)
-                    
-                    if len(pil_images) >= max_images:
-                        break
-                except Exception as e:
-                    print(f"⚠️  加载图片失败: {file_path} - {str(e)}")
-                    continue
-        
-        # 所有图片作为一组
-        if pil_images:
+    
+    if manifest is not None:
+        # 按子文件夹分组时，新文件与清单中未变化的同组文件一起做关联判断（自动分组的组名每次不同，不参与）
+        scan_groups = None if auto_group and not subdirs else [group_name for group_name, _ in candidates]
+        changed = set(manifest.select_changed([file_path for _, file_path in candidates], scan_groups))
+        print(f"   🧾 增量模式: 共 {len(candidates)} 个文件，新增或变化 {len(changed)} 个")
+        candidates = [c for c in candidates if c[1] in changed]
+    
+    def _decode(candidate):
+        group_name, file_path = candidate
+        try:
+            return decode_image(file_path, long_edge)
+        except Exception as e:
+            print(f"⚠️  加载图片失败: {file_path} - {str(e)}")
+            return None
+    
+    # 并行解码，结果按文件顺序收集；有失败时继续解码后续文件补足 max_images
+    loaded = []  # [(组名, 文件路径, PIL Image)]
+    next_idx = 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        while len(loaded) < max_images and next_idx < len(candidates):
+            wave = candidates[next_idx:next_idx + max_images - len(loaded)]
+            next_idx += len(wave)
+            for (group_name, file_path), img in zip(wave, executor.map(_decode, wave)):
+                if img is not None:
+                    loaded.append((group_name, file_path, img))
+    
+    if not loaded and manifest is None:
+        raise ValueError(f"文件夹中没有找到图片: {folder_path}")
+    
+    if auto_group and not subdirs and len(loaded) > 1:
+        start_time = time.perf_counter()
+        loaded = auto_group_images(loaded)
+        print(f"   🧩 自动分组: {len(loaded)} 张图片 → {len(set(name for name, _, _ in loaded))} 组（{(time.perf_counter() - start_time) * 1000:.0f} ms）")
+    
+    # 按加载结果计算分组边界（连续的同名图片为一组）
+    groups = []  # 存储每组的起始和结束索引
+    for idx, (group_name, _, _) in enumerate(loaded):
+        if groups and groups[-1]["name"] == group_name:
+            groups[-1]["end"] = idx + 1
+            groups[-1]["count"] += 1
+        else:
             groups.append({
-                "name": "all",
-                "start": 0,
-                "end": len(pil_images),
-                "count": len(pil_images)
+                "name": group_name,
+                "start": idx,
+                "end": idx + 1,
+                "count": 1
             })
+    if subdirs or auto_group:
+        for group in groups:
+            print(f"   ✓ {group['name']}: {group['count']} 张图片")
     
-    if not pil_images:
-        raise ValueError(f"文件夹中没有找到图片: {folder_path}")
+    pil_images = [img for _, _, img in loaded]
+    file_paths = [file_path for _, file_path, _ in loaded]
     
     # 构造分组信息
     groups_info = {
@@ -115,15 +210,23 @@ def load_images_from_folder(folder_path, max_images=100):
         "groups": groups
     }
     
+    if return_paths:
+        return pil_images, groups_info, file_paths
     return pil_images, groups_info
 
 
-def pil_batch_to_tensor(pil_images):
+def pil_batch_to_tensor(pil_images, release=False, layout=None):
     """
     将PIL Image列表转换为ComfyUI的IMAGE tensor
     
+    预分配输出tensor后逐张原地填充，不产生逐张float32副本和np.stack的整批副本，
+    峰值内存约为 输出tensor + 解码后的PIL图片
+    
     Args:
         pil_images: list of PIL Images
+        release: 填充后立即释放对应的PIL图片（会把列表中的元素置为None）
+        layout: batch_layout.pad_layout 的结果；指定时每张图片按原尺寸放入画布中的区域（不缩放，其余部分为黑色），
+                否则所有图片缩放到最大宽高
     
     Returns:
         torch.Tensor: shape [B, H, W, C], range 0-1
@@ -131,27 +234,57 @@ def pil_batch_to_tensor(pil_images):
     if not pil_images:
         raise ValueError("图片列表为空")
     
-    # 获取最大尺寸（用于统一大小）
-    max_width = max(img.width for img in pil_images)
-    max_height = max(img.height for img in pil_images)
+    if layout is not None:
+        canvas_width, canvas_height = layout["canvas"]
+        batch_tensor = torch.zeros((len(pil_images), canvas_height, canvas_width, 3), dtype=torch.float32)
+    else:
+        # 获取最大尺寸（用于统一大小）
+        max_width = max(img.width for img in pil_images)
+        max_height = max(img.height for img in pil_images)
+        batch_tensor = torch.empty((len(pil_images), max_height, max_width, 3), dtype=torch.float32)
     
-    # 转换每张图片
-    images_np = []
-    for img in pil_images:
-        # 如果尺寸不一致，resize到最大尺寸
-        if img.size != (max_width, max_height):
-            img = img.resize((max_width, max_height), Image.LANCZOS)
+    # 逐张填充
+    for i in range(len(pil_images)):
+        img = pil_images[i]
+        if release:
+            pil_images[i] = None
         
-        # 转换为numpy数组
-        img_np = np.array(img).astype(np.float32) / 255.0
-        images_np.append(img_np)
+        if layout is not None:
+            left, top, right, bottom = layout["images"][i]["box"]
+            target = batch_tensor[i, top:bottom, left:right]
+        else:
+            # 如果尺寸不一致，resize到最大尺寸
+            if img.size != (max_width, max_height):
+                img = img.resize((max_width, max_height), Image.LANCZOS)
+            target = batch_tensor[i]
+        
+        # uint8 -> float32 直接写入输出tensor，再原地归一化
+        target.copy_(torch.from_numpy(np.array(img)))
+        target.div_(255.0)
+        del img
     
-    # 堆叠成batch
-    batch_tensor = torch.from_numpy(np.stack(images_np, axis=0))
+    return batch_tensor
+
+
+def uint8_batch_to_tensor(array):
+    """
+    将 uint8 数组 [B, H, W, C]（例如解码缓存的内存映射）转换为ComfyUI的IMAGE tensor
     
+    与 pil_batch_to_tensor 相同的逐张填充方式，结果逐位一致；内存映射只按页读取，不整批载入
+    """
+    batch_tensor = torch.empty(array.shape, dtype=torch.float32)
+    for i in range(array.shape[0]):
+        batch_tensor[i].copy_(torch.from_numpy(array[i]))
+        batch_tensor[i].div_(255.0)
     return batch_tensor
 
 
+def fill_uint8_batch(out, images_tensor):
+    """把IMAGE tensor逐张写回 uint8 数组（写入解码缓存用，不产生整批副本）"""
+    for i in range(images_tensor.shape[0]):
+        out[i] = (images_tensor[i] * 255.0).round_().to(torch.uint8).numpy()
+
+
 class BatchImageLoader:
     """
     批量图片加载器节点
@@ -174,44 +307,164 @@ class BatchImageLoader:
                     "max": 1000,
                     "step": 1
                 }),
+                "decode_workers": ("INT", {
+                    "default": 8,
+                    "min": 1,
+                    "max": 64,
+                    "step": 1
+                }),
+                "decode_long_edge": ("INT", {
+                    "default": 0,  # 0 = 原尺寸解码
+                    "min": 0,
+                    "max": 8192,
+                    "step": 64
+                }),
+                "resize_mode": (batch_layout.RESIZE_MODES, {
+                    "default": "stretch"  # pad: 不放大，居中放入统一画布
+                }),
+                "incremental": ("BOOLEAN", {
+                    "default": False  # 只加载清单中没有结果或内容变化的文件
+                }),
+                "cache_decoded": ("BOOLEAN", {
+                    "default": False  # 解码结果写入磁盘缓存，文件夹未变化时重启后直接内存映射
+                }),
+                "auto_group": ("BOOLEAN", {
+                    "default": False  # 没有子文件夹时按感知哈希/颜色/拍摄时间自动分组（本地计算）
+                }),
             }
         }
     
-    RETURN_TYPES = ("IMAGE", "STRING")
-    RETURN_NAMES = ("images", "groups")
+    RETURN_TYPES = ("IMAGE", "STRING", image_payload.IMAGE_FILES_TYPE, "STRING", folder_manifest.FOLDER_MANIFEST_TYPE)
+    RETURN_NAMES = ("images", "groups", "image_files", "image_sizes", "manifest")
     FUNCTION = "load_images"
     CATEGORY = "SmartCaption"
     
-    def load_images(self, folder_path, max_images=100):
+    @classmethod
+    def IS_CHANGED(cls, folder_path, incremental=False, **kwargs):
+        """
+        文件夹指纹：文件没有变化时 ComfyUI 复用本节点及下游节点的缓存输出，
+        有文件增删改时才重新加载（下游节点的缓存键包含本节点的指纹，随之失效）
+        """
+        try:
+            fingerprint = folder_fingerprint(folder_path)
+            if incremental:
+                # 增量模式的输出还取决于清单（例如手动删除清单以全部重新处理）
+                path = folder_manifest.manifest_path(folder_path)
+                if os.path.exists(path):
+                    stat = os.stat(path)
+                    fingerprint += f":{stat.st_size}:{stat.st_mtime_ns}"
+            return fingerprint
+        except OSError:
+            # 文件夹不存在等情况：每次都重新执行（由 load_images 报错）
+            return float("nan")
+    
+    def load_images(self, folder_path, max_images=100, decode_workers=8, decode_long_edge=0, resize_mode="stretch", incremental=False, cache_decoded=False, auto_group=False):
         """
         加载图片主函数
         
         Returns:
-            (images_tensor, groups_json)
+            (images_tensor, groups_json, image_files, image_sizes_json, manifest)
         """
         try:
+            memory_tracker = memory_stats.PeakRSSTracker()
             print(f"\n{'='*60}")
             print(f"📁 BatchImageLoader - 开始加载图片")
             print(f"   文件夹: {folder_path}")
             print(f"   最大数量: {max_images}")
+            if decode_long_edge > 0:
+                print(f"   解码长边: {decode_long_edge}")
             print(f"{'='*60}")
             
-            # 从文件夹加载图片（支持分组）
-            pil_images, groups_info = load_images_from_folder(folder_path, max_images)
+            manifest = folder_manifest.FolderManifest.load(folder_path) if incremental and os.path.isdir(folder_path) else None
             
-            print(f"✅ 成功加载 {len(pil_images)} 张图片")
-            print(f"   分组数: {len(groups_info['groups'])}")
+            # 解码缓存：文件夹指纹 + 加载参数相同时直接内存映射上次的解码结果（增量模式下每次batch不同，不使用）
+            cache, cache_key, cached = None, None, None
+            if cache_decoded and manifest is None and os.path.isdir(folder_path):
+                cache = decoded_cache.get_decoded_cache()
+                if cache is not None:
+                    fingerprint = folder_fingerprint(folder_path)
+                    cache_key = cache.make_key(fingerprint, {
+                        "folder": os.path.abspath(folder_path),
+                        "max_images": max_images,
+                        "long_edge": decode_long_edge,
+                        "resize_mode": resize_mode,
+                        "auto_group": auto_group
+                    })
+                    cached = cache.get(cache_key)
             
-            # 转换为tensor
-            images_tensor = pil_batch_to_tensor(pil_images)
+            if cached is not None:
+                array, meta = cached
+                images_tensor = uint8_batch_to_tensor(array)
+                del array, cached
+                groups_info, file_paths, layout = meta["groups"], meta["files"], meta["layout"]
+                print(f"⚡ 命中解码缓存，跳过解码: {len(file_paths)} 张图片")
+                print(f"   分组数: {len(groups_info['groups'])}")
+            else:
+                # 从文件夹加载图片（支持分组）
+                pil_images, groups_info, file_paths = load_images_from_folder(
+                    folder_path, max_images, return_paths=True,
+                    max_workers=decode_workers, long_edge=decode_long_edge, manifest=manifest,
+                    auto_group=auto_group
+                )
+                
+                if manifest is not None:
+                    manifest.set_batch(file_paths)
+                    if manifest.dirty:
+                        # 写回未变化文件刷新后的修改时间，并移除已删除的文件
+                        manifest.save()
+                    if not pil_images:
+                        # 没有需要处理的文件：输出空batch，下游节点直接输出清单中的结果
+                        print(f"✅ 没有新增或变化的图片，下游节点将直接输出已有结果")
+                        print(f"{'='*60}\n")
+                        empty = torch.zeros((0, 64, 64, 3), dtype=torch.float32)
+                        return (
+                            empty,
+                            json.dumps(groups_info, ensure_ascii=False),
+                            image_payload.ImageFileList([], shape=empty.shape),
+                            json.dumps({"canvas": [64, 64], "images": []}),
+                            manifest
+                        )
+                
+                print(f"✅ 成功加载 {len(pil_images)} 张图片")
+                print(f"   分组数: {len(groups_info['groups'])}")
+                
+                # 记录每张图片的原始尺寸和在画布中的区域
+                sizes = [img.size for img in pil_images]
+                if resize_mode == "pad":
+                    layout = batch_layout.pad_layout(sizes)
+                    print(f"   📐 pad 模式: 画布 {layout['canvas'][0]}x{layout['canvas'][1]}，图片不放大")
+                else:
+                    layout = batch_layout.stretch_layout(sizes)
+                
+                # 转换为tensor（逐张填充后立即释放PIL图片）
+                images_tensor = pil_batch_to_tensor(pil_images, release=True, layout=layout if resize_mode == "pad" else None)
+                del pil_images
+                
+                if cache_key is not None and folder_fingerprint(folder_path) == fingerprint:
+                    # 加载期间文件夹没有变化才写入
+                    cache.put(
+                        cache_key,
+                        tuple(images_tensor.shape),
+                        lambda out: fill_uint8_batch(out, images_tensor),
+                        {"groups": groups_info, "files": file_paths, "layout": layout}
+                    )
+                    print(f"   💾 解码结果已写入缓存")
             
             # 将分组信息转为JSON
             groups_json = json.dumps(groups_info, ensure_ascii=False)
             
-            print(f"   尺寸: {images_tensor.shape}")
+            # 原始文件句柄：下游节点可直接上传文件字节，不再从tensor重新编码
+            image_files = image_payload.ImageFileList(file_paths, shape=images_tensor.shape)
+            
+            print(f"   尺寸: {images_tensor.shape}（{images_tensor.numel() * 4 / 1024 / 1024:.0f} MB）")
+            memory_summary = memory_tracker.format()
+            if memory_summary:
+                print(f"   {memory_summary}")
             print(f"{'='*60}\n")
             
-            return (images_tensor, groups_json)
+            image_sizes_json = json.dumps(layout, ensure_ascii=False)
+            
+            return (images_tensor, groups_json, image_files, image_sizes_json, manifest)
         
         except Exception as e:
             error_msg = f"加载图片失败: {str(e)}"
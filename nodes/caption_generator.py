@@ -3,11 +3,10 @@ SmartCaptionGenerator节点 - 智能配文生成器
 """
 import os
 import json
-import torch
-import numpy as np
-from PIL import Image
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from ..core import doubao_client
+from concurrent.futures import ThreadPoolExecutor
+from ..core import doubao_client, async_client, response_cache, image_payload, retry, folder_manifest, image_similarity, endpoint_pool
+from ..core.caption_pe import select_pe
+from ..core.tensor_images import encode_image_batch, find_duplicates
 
 
 def load_default_captions():
@@ -26,35 +25,24 @@ def load_default_captions():
         }
 
 
-def tensor_to_pil_batch(tensor):
-    """
-    将ComfyUI的IMAGE tensor转换为PIL Image列表
-    Args:
-        tensor: shape [B, H, W, C], range 0-1
-    Returns:
-        list of PIL Images
-    """
-    images_np = (255. * tensor.cpu().numpy()).astype(np.uint8)
-    pil_images = []
-    for i in range(images_np.shape[0]):
-        img = Image.fromarray(images_np[i])
-        pil_images.append(img)
-    return pil_images
-
-
-def parse_classifications(classifications_json, batch_size):
+def parse_classifications(classifications_json, batch_size, batch_files=None):
     """
     解析分类结果JSON，返回每张图对应的标签
     
     Args:
         classifications_json: JSON字符串
         batch_size: batch大小
+        batch_files: 本次batch的文件（清单相对路径）；分类结果是清单合并结果（带 files）时按文件取标签
     
     Returns:
         list of style_tags
     """
     data = json.loads(classifications_json)
     
+    if batch_files is not None and "files" in data and "style_tags" in data:
+        tag_by_file = dict(zip(data["files"], data["style_tags"]))
+        return [tag_by_file.get(rel, "ERROR") for rel in batch_files]
+    
     # 单标签情况（单图或多图有关联）
     if "style_tag" in data:
         # 所有图片使用同一个标签
@@ -69,28 +57,135 @@ def parse_classifications(classifications_json, batch_size):
         raise ValueError("Invalid classification JSON format")
 
 
-def select_pe(style_tag, pe_configs):
+def parse_group_ranges(groups_json, batch_size):
     """
-    根据分类标签自动选择对应的PE（单图或多图）
+    解析BatchImageLoader输出的分组信息
     
-    Args:
-        style_tag: 分类标签（如 "日常plog" 或 "日常plog_multi_pic"）
-        pe_configs: PE配置字典
+    Returns:
+        [(name, start, end), ...]；无分组信息或与batch不匹配时，整个batch作为一组
+    """
+    if groups_json:
+        try:
+            groups_info = json.loads(groups_json)
+            ranges = [(g["name"], g["start"], g["end"]) for g in groups_info.get("groups", [])]
+            if ranges and ranges[-1][2] == batch_size:
+                return ranges
+            print(f"⚠️  分组信息与图片数不匹配，将作为整体处理")
+        except Exception:
+            print(f"⚠️  分组信息解析失败，将作为整体处理")
+    return [("all", 0, batch_size)]
+
+
+def _sample_evenly(indices, limit):
+    """从组内均匀抽取最多 limit 张图片（保留首尾）"""
+    if len(indices) <= limit:
+        return list(indices)
+    if limit <= 1:
+        return [indices[0]]
+    return [indices[round(i * (len(indices) - 1) / (limit - 1))] for i in range(limit)]
+
+
+def build_caption_jobs(api_images, style_tags, pe_configs, caption_mode, group_ranges, images_per_request=8,
+                       duplicate_of=None):
+    """
+    规划配文请求
+    
+    - per_image: 每张图片一次请求
+    - group: 组内所有图片标签相同且为 xxx_multi_pic 时，整组合并为一次多图请求，结果映射到组内每张图；
+             其余图片仍逐张请求
+    - duplicate_of（近似重复去重）: 同一簇内标签相同的图片共用一次逐张请求，配文映射到每张图
     
     Returns:
-        对应的PE文本
+        list of dict: {"kind", "indices", "images"/"image", "prompt", "tag", "label"}
     """
-    # 判断是单图还是多图
-    if "_multi_pic" in style_tag:
-        # 多图模式
-        base_tag = style_tag.replace("_multi_pic", "")
-        pe_key = f"{base_tag}_多图"
+    jobs = []
+    shared = {}  # (代表图下标, 标签) -> 逐张配文请求
+    for name, start, end in group_ranges:
+        indices = list(range(start, end))
+        group_tags = set(style_tags[start:end])
+        
+        if (caption_mode == "group" and len(indices) > 1 and len(group_tags) == 1
+                and "_multi_pic" in style_tags[start]):
+            tag = style_tags[start]
+            jobs.append({
+                "kind": "group_caption",
+                "indices": indices,
+                "images": [api_images[i] for i in _sample_evenly(indices, images_per_request)],
+                "prompt": select_pe(tag, pe_configs),
+                "tag": tag,
+                "label": f"分组 {name}"
+            })
+            continue
+        
+        for idx in indices:
+            if duplicate_of is not None:
+                key = (duplicate_of[idx], style_tags[idx])
+                if key in shared:
+                    shared[key]["indices"].append(idx)
+                    continue
+            jobs.append({
+                "kind": "caption",
+                "indices": [idx],
+                "image": api_images[idx],
+                "prompt": select_pe(style_tags[idx], pe_configs),
+                "tag": style_tags[idx],
+                "label": f"图片 {idx+1}"
+            })
+            if duplicate_of is not None:
+                shared[key] = jobs[-1]
+    return jobs
+
+
+# 配文请求类型 -> 同步调用函数
+CAPTION_FUNCTIONS = {
+    "caption": doubao_client.call_doubao_api_for_caption,
+    "group_caption": doubao_client.call_doubao_api_for_group_caption,
+}
+
+
+def caption_job_kwargs(job, text_requirement, api_key, api_url, model):
+    """配文请求的调用参数（与 doubao_client 中对应函数一致）"""
+    kwargs = {
+        "prompt": job["prompt"],
+        "text_requirement": text_requirement,
+        "api_key": api_key,
+        "api_url": api_url,
+        "model": model
+    }
+    if job["kind"] == "group_caption":
+        kwargs["images"] = job["images"]
     else:
-        # 单图模式
-        pe_key = f"{style_tag}_单图"
+        kwargs["image"] = job["image"]
+    return kwargs
+
+
+def run_caption_jobs(jobs, text_requirement, api_key, api_url, model, max_workers=5, engine="thread"):
+    """
+    并发执行配文请求
+    
+    Returns:
+        与 jobs 顺序一致的结果列表，失败的位置为 Exception
+    """
+    def _kwargs(job):
+        return caption_job_kwargs(job, text_requirement, api_key, api_url, model)
     
-    # 返回对应的PE，如果找不到则使用通用PE
-    return pe_configs.get(pe_key, pe_configs.get("其他_单图", "请生成配文"))
+    if engine == "async":
+        # asyncio 引擎：单线程维持最多 max_workers 个在途请求
+        calls = [(job["kind"], _kwargs(job)) for job in jobs]
+        return async_client.run_async_calls(calls, concurrency=max_workers)
+    
+    # 使用并发处理提高速度（连接池随并发数增长，复用keep-alive连接）
+    doubao_client.get_http_client(pool_size=max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(CAPTION_FUNCTIONS[job["kind"]], **_kwargs(job)) for job in jobs]
+        
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result())
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
 
 
 class SmartCaptionGenerator:
@@ -155,6 +250,60 @@ class SmartCaptionGenerator:
                     "multiline": False,
                     "forceInput": False  # 可以从其他节点输入，也可以留空
                 }),
+                "max_workers": ("INT", {
+                    "default": 5,
+                    "min": 1,
+                    "max": 512,
+                    "step": 1
+                }),
+                "engine": (["thread", "async"], {
+                    "default": "thread"
+                }),
+                "upload_long_edge": ("INT", {
+                    "default": 0,  # 0 = 原图上传
+                    "min": 0,
+                    "max": 8192,
+                    "step": 64
+                }),
+                "upload_quality": ("INT", {
+                    "default": 95,
+                    "min": 50,
+                    "max": 100,
+                    "step": 1
+                }),
+                "encoded_images": (image_payload.ENCODED_IMAGES_TYPE,),  # 可选，从ImageClassifier输入，避免重复编码
+                "image_files": (image_payload.IMAGE_FILES_TYPE,),  # 可选，从BatchImageLoader输入，直接上传原始文件
+                "image_sizes": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader/MultiImageUploader输入，只上传原图区域
+                }),
+                "groups": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader输入
+                }),
+                "caption_mode": (["per_image", "group"], {
+                    "default": "per_image"  # group: 有关联的组只生成一条配文
+                }),
+                "images_per_request": ("INT", {
+                    "default": 8,
+                    "min": 2,
+                    "max": 50,
+                    "step": 1
+                }),
+                "manifest": (folder_manifest.FOLDER_MANIFEST_TYPE,),  # 可选，从BatchImageLoader（增量模式）输入
+                "dedup": ("BOOLEAN", {
+                    "default": False  # 近似重复且标签相同的图片只请求一次，配文复制给簇内每张图
+                }),
+                "dedup_distance": ("INT", {
+                    "default": image_similarity.DEFAULT_DUPLICATE_DISTANCE,  # pHash 汉明距离阈值（64位）
+                    "min": 0,
+                    "max": 32,
+                    "step": 1
+                }),
+                "endpoints": ("STRING", {
+                    "default": "",  # 端点池：每行 "api_key, api_url, model"，空字段沿用本节点的配置
+                    "multiline": True
+                }),
             }
         }
     
@@ -180,25 +329,61 @@ class SmartCaptionGenerator:
         api_key,
         api_url,
         model,
-        text_requirement=""
+        text_requirement="",
+        max_workers=5,
+        engine="thread",
+        upload_long_edge=0,
+        upload_quality=95,
+        encoded_images=None,
+        groups="",
+        caption_mode="per_image",
+        images_per_request=8,
+        image_files=None,
+        image_sizes="",
+        manifest=None,
+        dedup=False,
+        dedup_distance=image_similarity.DEFAULT_DUPLICATE_DISTANCE,
+        endpoints=""
     ):
         """
         生成配文主函数
         
         Returns:
             (captions_json, image)
+            连接 manifest 时 captions 为清单中所有文件的合并结果；
+            去重时附带 duplicate_of（每张图片所属簇的代表图下标）
         """
         try:
             batch_size = image.shape[0]
-            pil_images = tensor_to_pil_batch(image)
+            if manifest is not None and not manifest.matches(image):
+                print(f"⚠️  manifest 与图片batch不匹配，本次结果不写入清单")
+                manifest = None
+            if manifest is not None and batch_size == 0:
+                print(f"✍️  SmartCaptionGenerator - 没有新增或变化的图片，输出清单中的 {len(manifest.files)} 条配文")
+                return (json.dumps(manifest.merged_captions(), ensure_ascii=False), image)
+            
+            upload_policy = image_payload.UploadPolicy(upload_long_edge, upload_quality)
+            if encoded_images is not None and encoded_images.matches(image, upload_policy):
+                # 复用分类节点的编码结果（上传策略一致时）
+                api_images = list(encoded_images)
+            else:
+                api_images = encode_image_batch(image, upload_policy, image_files, image_sizes)
+            cache_before = response_cache.stats_snapshot()
+            retry_before = retry.stats_snapshot()
+            endpoint_before = endpoint_pool.stats_snapshot()
             
             print(f"\n{'='*60}")
             print(f"✍️  SmartCaptionGenerator - 开始生成配文")
             print(f"   图片数: {batch_size}")
+            pool = endpoint_pool.configure(api_key, api_url, endpoints)
+            if pool is not None:
+                print(f"   ⚖️ 端点池: {pool.describe()}")
             print(f"{'='*60}")
             
             # 解析分类结果
-            style_tags = parse_classifications(classifications, batch_size)
+            style_tags = parse_classifications(
+                classifications, batch_size, manifest.batch_files if manifest is not None else None
+            )
             
             # 准备PE配置（单图和多图分开）
             pe_configs = {
@@ -217,52 +402,68 @@ class SmartCaptionGenerator:
             # 为每张图片生成配文
             captions = []
             
-            # 使用并发处理提高速度
-            with ThreadPoolExecutor(max_workers=5) as executor:
-                # 提交所有任务
-                future_to_idx = {}
-                for idx, (img, tag) in enumerate(zip(pil_images, style_tags)):
-                    # 选择对应的PE
-                    selected_pe = select_pe(tag, pe_configs)
-                    
-                    # 显示使用的PE类型
-                    pe_type = "多图" if "_multi_pic" in tag else "单图"
-                    print(f"   📝 图片 {idx+1}: {tag} ({pe_type}PE) -> 生成配文中...")
-                    
-                    future = executor.submit(
-                        doubao_client.call_doubao_api_for_caption,
-                        img,
-                        selected_pe,
-                        text_requirement,
-                        api_key,
-                        api_url,
-                        model
-                    )
-                    future_to_idx[future] = idx
-                
-                # 收集结果
-                idx_to_caption = {}
-                for future in as_completed(future_to_idx):
-                    idx = future_to_idx[future]
-                    try:
-                        # call_doubao_api_for_caption 直接返回配文字符串
-                        caption = future.result()
-                        idx_to_caption[idx] = caption
-                        print(f"   ✅ 图片 {idx+1}: {caption}")
-                    except Exception as e:
-                        idx_to_caption[idx] = f"生成失败: {str(e)}"
-                        print(f"   ❌ 图片 {idx+1}: 生成失败 - {str(e)}")
-                
-                # 按顺序排列
-                captions = [idx_to_caption[i] for i in range(batch_size)]
+            # 规划请求：逐张配文，或有关联的组合并为一次请求
+            group_ranges = parse_group_ranges(groups, batch_size)
+            duplicate_of = find_duplicates(image, image_sizes, dedup_distance) if dedup and batch_size > 1 else None
+            jobs = build_caption_jobs(
+                api_images, style_tags, pe_configs, caption_mode, group_ranges, images_per_request, duplicate_of
+            )
+            for job in jobs:
+                pe_type = "多图" if "_multi_pic" in job["tag"] else "单图"
+                if job["kind"] == "group_caption":
+                    count = len(job['indices'])
+                    sent = len(job['images'])
+                    size = f"{count}张中抽取{sent}张" if sent < count else f"{count}张"
+                    print(f"   📝 {job['label']} ({size}): {job['tag']} ({pe_type}PE, 合并为1次请求) -> 生成配文中...")
+                elif len(job["indices"]) > 1:
+                    print(f"   📝 {job['label']}: {job['tag']} ({pe_type}PE, 另有 {len(job['indices']) - 1} 张近似重复共用) -> 生成配文中...")
+                else:
+                    print(f"   📝 {job['label']}: {job['tag']} ({pe_type}PE) -> 生成配文中...")
+            
+            outcomes = run_caption_jobs(
+                jobs, text_requirement, api_key, api_url, model, max_workers, engine
+            )
+            
+            # 结果映射回每张图片
+            captions = [None] * batch_size
+            failed = set()
+            for job, outcome in zip(jobs, outcomes):
+                if isinstance(outcome, Exception):
+                    caption = f"生成失败: {str(outcome)}"
+                    print(f"   ❌ {job['label']}: 生成失败 - {str(outcome)}")
+                    failed.update(job["indices"])
+                else:
+                    caption = outcome
+                    print(f"   ✅ {job['label']}: {caption}")
+                for idx in job["indices"]:
+                    captions[idx] = caption
+            
+            if len(jobs) < batch_size:
+                print(f"   🔗 合并配文: {batch_size} 张图片共 {len(jobs)} 次请求")
             
             # 构造返回JSON
-            captions_json = json.dumps({
-                "captions": captions
-            }, ensure_ascii=False)
+            result = {"captions": captions}
+            if duplicate_of is not None:
+                result["duplicate_of"] = duplicate_of
+            captions_json = json.dumps(result, ensure_ascii=False)
+            
+            if manifest is not None:
+                # 本次结果写回清单（失败的文件下次重新处理），输出与已有结果合并
+                manifest.record("caption", [None if idx in failed else caption for idx, caption in enumerate(captions)])
+                captions_json = json.dumps(manifest.merged_captions(), ensure_ascii=False)
+                print(f"   🧾 清单: 本次 {batch_size} 张，合并输出 {len(manifest.files)} 张")
             
             print(f"{'='*60}")
             print(f"✅ 配文生成完成")
+            cache_summary = response_cache.format_stats_delta(cache_before)
+            if cache_summary:
+                print(f"   {cache_summary}")
+            retry_summary = retry.format_stats_delta(retry_before)
+            if retry_summary:
+                print(f"   {retry_summary}")
+            endpoint_summary = endpoint_pool.format_stats_delta(endpoint_before)
+            if endpoint_summary:
+                print(f"   {endpoint_summary}")
             print(f"{'='*60}\n")
             
             return (captions_json, image)
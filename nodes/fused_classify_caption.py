@@ -0,0 +1,243 @@
+"""
+FusedClassifyCaption节点 - 融合分类配文
+一次请求同时完成分类和配文，请求数和延迟约为 ImageClassifier + SmartCaptionGenerator 的一半
+"""
+import json
+from ..core import endpoint_pool, fused, image_payload, response_cache, retry
+from ..core.caption_pe import CAPTION_PE_KEYS
+from ..core.multi_pic import multi_image_relation_check
+from ..core.tensor_images import encode_image_batch
+from .image_classifier import load_default_classification_pe
+from .caption_generator import parse_group_ranges, build_caption_jobs, run_caption_jobs
+
+
+class FusedClassifyCaption:
+    """
+    融合分类配文节点
+    每张图片一次请求返回 {style_tag, caption}；输出校验失败时自动回退为两步请求。
+    多图且有关联的组保留逐张配文；caption_mode 为 group 时丢弃这些配文，每组再发一次多图配文请求
+    （请求数多于两步流程中 group 模式的配文，只在需要整组一条配文时使用）。
+    """
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        required = {
+            "image": ("IMAGE",),
+            "classification_pe": ("STRING", {
+                "multiline": True,
+                "default": load_default_classification_pe(),
+                "dynamicPrompts": False
+            }),
+        }
+        for key in CAPTION_PE_KEYS:
+            required[f"{key}_pe"] = ("STRING", {
+                "forceInput": True  # 必须从其他节点输入
+            })
+        required.update({
+            "api_key": ("STRING", {
+                "default": "d26ed5b5-0816-4bec-b045-c353abc16667"
+            }),
+            "api_url": ("STRING", {
+                "default": "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
+            }),
+            "model": ("STRING", {
+                "default": "doubao-seed-1-6-250615"
+            }),
+        })
+        return {
+            "required": required,
+            "optional": {
+                "text_requirement": ("STRING", {
+                    "default": "",
+                    "multiline": False
+                }),
+                "groups": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader输入
+                }),
+                "image_sizes": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader/MultiImageUploader输入，只上传原图区域
+                }),
+                "max_workers": ("INT", {
+                    "default": 5,
+                    "min": 1,
+                    "max": 512,
+                    "step": 1
+                }),
+                "upload_long_edge": ("INT", {
+                    "default": 0,  # 0 = 原图上传
+                    "min": 0,
+                    "max": 8192,
+                    "step": 64
+                }),
+                "upload_quality": ("INT", {
+                    "default": 95,
+                    "min": 50,
+                    "max": 100,
+                    "step": 1
+                }),
+                "caption_mode": (["per_image", "group"], {
+                    "default": "per_image"  # group: 有关联的组额外请求一条多图配文
+                }),
+                "images_per_request": ("INT", {
+                    "default": 8,
+                    "min": 2,
+                    "max": 50,
+                    "step": 1
+                }),
+                "endpoints": ("STRING", {
+                    "default": "",  # 端点池：每行 "api_key, api_url, model"，空字段沿用本节点的配置
+                    "multiline": True
+                }),
+            }
+        }
+    
+    RETURN_TYPES = ("STRING", "STRING", "IMAGE")
+    RETURN_NAMES = ("classifications", "captions", "image")
+    FUNCTION = "classify_and_caption"
+    CATEGORY = "SmartCaption"
+    
+    def classify_and_caption(
+        self,
+        image,
+        classification_pe,
+        api_key,
+        api_url,
+        model,
+        text_requirement="",
+        groups="",
+        image_sizes="",
+        max_workers=5,
+        upload_long_edge=0,
+        upload_quality=95,
+        caption_mode="per_image",
+        images_per_request=8,
+        endpoints="",
+        **pe_inputs
+    ):
+        """
+        融合分类配文主函数
+        
+        Returns:
+            (classifications_json, captions_json, image)
+        """
+        try:
+            batch_size = image.shape[0]
+            cache_before = response_cache.stats_snapshot()
+            retry_before = retry.stats_snapshot()
+            endpoint_before = endpoint_pool.stats_snapshot()
+            
+            print(f"\n{'='*60}")
+            print(f"⚡ FusedClassifyCaption - 融合分类配文")
+            print(f"   图片数: {batch_size}")
+            pool = endpoint_pool.configure(api_key, api_url, endpoints)
+            if pool is not None:
+                print(f"   ⚖️ 端点池: {pool.describe()}")
+            print(f"{'='*60}")
+            
+            pe_configs = {key: pe_inputs.get(f"{key}_pe", "") for key in CAPTION_PE_KEYS}
+            
+            upload_policy = image_payload.UploadPolicy(upload_long_edge, upload_quality)
+            encoded_images = encode_image_batch(image, upload_policy, image_sizes=image_sizes)
+            
+            # 每张图片一次融合请求
+            results = fused.classify_and_caption_images(
+                encoded_images,
+                classification_pe,
+                pe_configs,
+                text_requirement,
+                api_key,
+                api_url,
+                model,
+                max_workers=max_workers
+            )
+            tags = [r.get('style_tag', 'ERROR') for r in results]
+            captions = [r.get('caption', '') for r in results]
+            
+            # 多图分组：本地关联判断；group 模式下有关联的组改用多图PE生成一条组图配文
+            group_ranges = parse_group_ranges(groups, batch_size)
+            whole_batch_tag = None
+            for name, start, end in group_ranges:
+                if end - start < 2:
+                    continue
+                relation = multi_image_relation_check(
+                    images=list(range(start, end)),
+                    tags=tags[start:end],
+                    threshold=0.5
+                )
+                if relation['result'] == 'yes':
+                    tags[start:end] = [relation['tag']] * (end - start)
+                    print(f"   🔗 {name}: 有关联 -> {relation['tag']}")
+                    if len(group_ranges) == 1:
+                        whole_batch_tag = relation['tag']
+            
+            group_jobs = [
+                job for job in build_caption_jobs(
+                    encoded_images, tags, pe_configs, "group", group_ranges, images_per_request
+                )
+                if job["kind"] == "group_caption"
+            ] if caption_mode == "group" else []
+            if group_jobs:
+                outcomes = run_caption_jobs(
+                    group_jobs, text_requirement, api_key, api_url, model, max_workers
+                )
+                for job, outcome in zip(group_jobs, outcomes):
+                    caption = f"生成失败: {str(outcome)}" if isinstance(outcome, Exception) else outcome
+                    for idx in job["indices"]:
+                        captions[idx] = caption
+            
+            for idx, (tag, caption) in enumerate(zip(tags, captions)):
+                print(f"   ✅ 图片 {idx+1}: {tag} -> {caption}")
+            
+            # 分类结果与 ImageClassifier 输出格式一致
+            if batch_size == 1:
+                classification = {k: v for k, v in results[0].items() if k not in ('caption', 'path')}
+            elif whole_batch_tag:
+                classification = {"style_tag": whole_batch_tag}
+            else:
+                classification = {"style_tags": tags}
+            
+            fused_count = sum(1 for r in results if r.get('path') == 'fused')
+            fallback_count = sum(1 for r in results if r.get('path') == 'fallback')
+            print(f"{'='*60}")
+            print(
+                f"✅ 融合完成: 融合请求 {fused_count} 张，回退两步 {fallback_count} 张，"
+                f"请求失败 {batch_size - fused_count - fallback_count} 张，组图配文 {len(group_jobs)} 组"
+            )
+            cache_summary = response_cache.format_stats_delta(cache_before)
+            if cache_summary:
+                print(f"   {cache_summary}")
+            retry_summary = retry.format_stats_delta(retry_before)
+            if retry_summary:
+                print(f"   {retry_summary}")
+            endpoint_summary = endpoint_pool.format_stats_delta(endpoint_before)
+            if endpoint_summary:
+                print(f"   {endpoint_summary}")
+            print(f"{'='*60}\n")
+            
+            return (
+                json.dumps(classification, ensure_ascii=False),
+                json.dumps({"captions": captions}, ensure_ascii=False),
+                image
+            )
+        
+        except Exception as e:
+            error_msg = f"融合分类配文失败: {str(e)}"
+            print(f"❌ {error_msg}")
+            
+            return (
+                json.dumps({"style_tag": "ERROR", "error": error_msg}, ensure_ascii=False),
+                json.dumps({"captions": [error_msg], "error": error_msg}, ensure_ascii=False),
+                image
+            )
+
+
+# 节点类映射
+NODE_CLASS_MAPPINGS = {
+    "FusedClassifyCaption": FusedClassifyCaption
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "FusedClassifyCaption": "融合分类配文 ⚡"
+}
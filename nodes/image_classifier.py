@@ -3,10 +3,8 @@ ImageClassifier节点 - 图片分类器
 """
 import os
 import json
-import torch
-import numpy as np
-from PIL import Image
-from ..core import classifier, doubao_client
+from ..core import classifier, doubao_client, response_cache, image_payload, retry, folder_manifest, image_similarity, model_cascade, endpoint_pool
+from ..core.tensor_images import encode_image_batch, find_duplicates
 
 
 def load_default_classification_pe():
@@ -19,26 +17,6 @@ def load_default_classification_pe():
         return "# 分类PE加载失败，请手动输入分类规则"
 
 
-def tensor_to_pil_batch(tensor):
-    """
-    将ComfyUI的IMAGE tensor转换为PIL Image列表
-    Args:
-        tensor: shape [B, H, W, C], range 0-1
-    Returns:
-        list of PIL Images
-    """
-    # 转换为numpy，范围0-255
-    images_np = (255. * tensor.cpu().numpy()).astype(np.uint8)
-    
-    # 转换为PIL Image列表
-    pil_images = []
-    for i in range(images_np.shape[0]):
-        img = Image.fromarray(images_np[i])
-        pil_images.append(img)
-    
-    return pil_images
-
-
 class ImageClassifier:
     """
     图片分类器节点
@@ -77,27 +55,115 @@ class ImageClassifier:
                     "default": "",
                     "forceInput": False  # 可选，从BatchImageLoader输入
                 }),
+                "max_workers": ("INT", {
+                    "default": 5,
+                    "min": 1,
+                    "max": 512,
+                    "step": 1
+                }),
+                "engine": (["thread", "async"], {
+                    "default": "thread"
+                }),
+                "upload_long_edge": ("INT", {
+                    "default": 0,  # 0 = 原图上传
+                    "min": 0,
+                    "max": 8192,
+                    "step": 64
+                }),
+                "upload_quality": ("INT", {
+                    "default": 95,
+                    "min": 50,
+                    "max": 100,
+                    "step": 1
+                }),
+                "image_files": (image_payload.IMAGE_FILES_TYPE,),  # 可选，从BatchImageLoader输入，直接上传原始文件
+                "image_sizes": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader/MultiImageUploader输入，只上传原图区域
+                }),
+                "request_mode": (["per_image", "group"], {
+                    "default": "per_image"  # group: 一次请求携带一组图片
+                }),
+                "images_per_request": ("INT", {
+                    "default": 8,
+                    "min": 2,
+                    "max": 50,
+                    "step": 1
+                }),
+                "manifest": (folder_manifest.FOLDER_MANIFEST_TYPE,),  # 可选，从BatchImageLoader（增量模式）输入
+                "early_vote": ("BOOLEAN", {
+                    "default": False  # 关联结论确定后取消剩余分类请求（仅 per_image 模式）
+                }),
+                "vote_sample": ("INT", {
+                    "default": 0,  # 0 = 全部参与表决；>0 时大分组只抽取这么多张表决
+                    "min": 0,
+                    "max": 1000,
+                    "step": 1
+                }),
+                "dedup": ("BOOLEAN", {
+                    "default": False  # 近似重复的图片只请求一张代表图，结果复制给簇内每张图
+                }),
+                "dedup_distance": ("INT", {
+                    "default": image_similarity.DEFAULT_DUPLICATE_DISTANCE,  # pHash 汉明距离阈值（64位）
+                    "min": 0,
+                    "max": 32,
+                    "step": 1
+                }),
+                "cascade_model": ("STRING", {
+                    "default": "",  # 快速模型；留空不使用级联，所有图片直接请求 model
+                    "multiline": False
+                }),
+                "cascade_confidence": ("FLOAT", {
+                    "default": 0.0,  # >0 时要求快速模型输出 confidence，低于该值升级到 model
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.05
+                }),
+                "endpoints": ("STRING", {
+                    "default": "",  # 端点池：每行 "api_key, api_url, model"，空字段沿用本节点的配置
+                    "multiline": True
+                }),
             }
         }
     
-    RETURN_TYPES = ("STRING", "IMAGE")
-    RETURN_NAMES = ("classifications", "image")
+    RETURN_TYPES = ("STRING", "IMAGE", image_payload.ENCODED_IMAGES_TYPE)
+    RETURN_NAMES = ("classifications", "image", "encoded_images")
     FUNCTION = "classify"
     CATEGORY = "SmartCaption"
     
-    def classify(self, image, classification_pe, api_key, api_url, model, text_requirement="", mode="auto", groups=""):
+    def classify(self, image, classification_pe, api_key, api_url, model, text_requirement="", mode="auto", groups="", max_workers=5, engine="thread", upload_long_edge=0, upload_quality=95,
+                 request_mode="per_image", images_per_request=8, image_files=None, image_sizes="", manifest=None,
+                 early_vote=False, vote_sample=0, dedup=False, dedup_distance=image_similarity.DEFAULT_DUPLICATE_DISTANCE,
+                 cascade_model="", cascade_confidence=0.0, endpoints=""):
         """
         分类主函数
         
         Returns:
-            (classifications_json, image)
+            (classifications_json, image, encoded_images)
+            连接 manifest 时 classifications 为清单中所有文件的合并结果；
+            去重时附带 duplicate_of（每张图片所属簇的代表图下标）
         """
+        encoded_batch = image_payload.EncodedImageBatch()
         try:
             # 获取batch size
             batch_size = image.shape[0]
             
-            # 转换tensor为PIL Images
-            pil_images = tensor_to_pil_batch(image)
+            if manifest is not None and not manifest.matches(image):
+                print(f"⚠️  manifest 与图片batch不匹配，本次结果不写入清单")
+                manifest = None
+            if manifest is not None and batch_size == 0:
+                print(f"📷 ImageClassifier - 没有新增或变化的图片，输出清单中的 {len(manifest.files)} 个结果")
+                return (json.dumps(manifest.merged_classifications(), ensure_ascii=False), image, encoded_batch)
+            cache_before = response_cache.stats_snapshot()
+            retry_before = retry.stats_snapshot()
+            vote_before = classifier.vote_stats_snapshot()
+            cascade_before = model_cascade.stats_snapshot()
+            endpoint_before = endpoint_pool.stats_snapshot()
+            
+            # 按上传策略缩放后一次性编码（下游配文节点复用同一份编码）
+            upload_policy = image_payload.UploadPolicy(upload_long_edge, upload_quality)
+            encoded_images = encode_image_batch(image, upload_policy, image_files, image_sizes)
+            encoded_batch = image_payload.EncodedImageBatch(encoded_images, shape=image.shape, policy=upload_policy)
             
             # 解析分组信息
             groups_info = None
@@ -120,12 +186,35 @@ class ImageClassifier:
             print(f"   模式: {mode} | 图片数: {batch_size}")
             if groups_info:
                 print(f"   分组数: {len(groups_info.get('groups', []))}")
+            if cascade_model.strip():
+                # 模型级联：先请求快速模型，必要时升级到 model
+                model = model_cascade.ModelCascade(cascade_model.strip(), model, cascade_confidence)
+                print(f"   🪜 模型级联: {model.fast_model} → {model.strong_model}")
+            pool = endpoint_pool.configure(api_key, api_url, endpoints)
+            if pool is not None:
+                print(f"   ⚖️ 端点池: {pool.describe()}")
             print(f"{'='*60}")
             
+            # 近似重复去重：每簇只请求代表图
+            duplicate_of = None
+            if dedup and mode == "multi" and batch_size > 1:
+                duplicate_of = find_duplicates(image, image_sizes, dedup_distance)
+            
+            # 增量处理：新文件所在分组中未变化的文件以清单中的标签参与关联判断
+            batch_groups = groups_info.get('groups') if groups_info else None
+            if not batch_groups:
+                batch_groups = [{"name": "all", "start": 0, "end": batch_size, "count": batch_size}]
+            batch_ranges = [(group['start'], group['end']) for group in batch_groups]
+            prior_tags = manifest.groupmate_votes(batch_ranges) if manifest is not None else None
+            if prior_tags is not None and not any(prior_tags):
+                prior_tags = None
+            if prior_tags is not None:
+                print(f"   🧾 清单: 同组 {sum(len(tags) for tags in prior_tags)} 张未变化的图片以已有标签参与关联判断")
+            
             # 单图模式
-            if mode == "single" or batch_size == 1:
+            if prior_tags is None and (mode == "single" or batch_size == 1):
                 result = classifier.classify_single_image(
-                    image=pil_images[0],
+                    image=encoded_images[0],
                     classification_pe=classification_pe,
                     text_requirement=text_requirement,
                     api_key=api_key,
@@ -138,52 +227,46 @@ class ImageClassifier:
                 
             # 多图模式
             else:
-                # 如果有分组信息，按组分别处理
-                if groups_info and len(groups_info.get('groups', [])) > 1:
-                    print(f"   🗂️  检测到多组图片，将分别判断关联")
-                    all_results = []
+                # 如果有分组信息（或需要与清单中的同组图片一起判断关联），按组分别处理
+                if len(batch_groups) > 1 or prior_tags is not None:
+                    if len(batch_groups) > 1:
+                        print(f"   🗂️  检测到多组图片，所有分组统一调度（并发上限 {max_workers}），按组分别判断关联")
                     
-                    for group in groups_info['groups']:
-                        group_name = group['name']
-                        start_idx = group['start']
-                        end_idx = group['end']
-                        
-                        print(f"\n   📁 处理分组: {group_name} ({group['count']}张)")
-                        
-                        # 提取当前组的图片
-                        group_images = pil_images[start_idx:end_idx]
-                        
-                        # 对当前组进行分类
-                        if len(group_images) == 1:
-                            # 单图
-                            group_result = classifier.classify_single_image(
-                                image=group_images[0],
-                                classification_pe=classification_pe,
-                                text_requirement=text_requirement,
-                                api_key=api_key,
-                                api_url=api_url,
-                                model=model
-                            )
-                            all_results.append(group_result)
-                        else:
-                            # 多图
-                            group_result = classifier.classify_multi_images(
-                                images=group_images,
-                                classification_pe=classification_pe,
-                                text_requirement=text_requirement,
-                                api_key=api_key,
-                                api_url=api_url,
-                                model=model
-                            )
-                            all_results.append(group_result)
+                    def _report_group(group_idx, group_result, _):
+                        group = batch_groups[group_idx]
+                        tag = group_result.get('style_tag') or group_result.get('style_tags')
+                        print(f"   📁 分组完成: {group['name']} ({group['count']}张) -> {tag}")
+                    
+                    all_results = classifier.classify_groups(
+                        images=encoded_images,
+                        group_ranges=batch_ranges,
+                        classification_pe=classification_pe,
+                        text_requirement=text_requirement,
+                        api_key=api_key,
+                        api_url=api_url,
+                        model=model,
+                        max_workers=max_workers,
+                        engine=engine,
+                        request_mode=request_mode,
+                        images_per_request=images_per_request,
+                        on_group_done=_report_group,
+                        early_vote=early_vote,
+                        vote_sample=vote_sample,
+                        duplicate_of=duplicate_of,
+                        prior_tags=prior_tags
+                    )
+                    if prior_tags is not None:
+                        rewritten = manifest.update_groupmates(batch_ranges, all_results)
+                        if rewritten:
+                            print(f"   🧾 清单: 关联结论变化，改写 {rewritten} 张同组图片的标签（已有配文作废，下次运行重新处理）")
                     
                     # 合并所有组的结果
-                    # 展开为每张图的标签列表
+                    # 展开为每张图的标签列表（有关联的组，组内每张图都使用统一标签）
                     all_tags = []
-                    for result in all_results:
+                    for group, result in zip(batch_groups, all_results):
                         if 'style_tag' in result:
                             # 单标签或有关联
-                            all_tags.append(result['style_tag'])
+                            all_tags.extend([result['style_tag']] * group['count'])
                         elif 'style_tags' in result:
                             # 多标签
                             all_tags.extend(result['style_tags'])
@@ -195,12 +278,19 @@ class ImageClassifier:
                 else:
                     # 无分组或只有一组，作为整体处理
                     result = classifier.classify_multi_images(
-                        images=pil_images,
+                        images=encoded_images,
                         classification_pe=classification_pe,
                         text_requirement=text_requirement,
                         api_key=api_key,
                         api_url=api_url,
-                        model=model
+                        model=model,
+                        max_workers=max_workers,
+                        engine=engine,
+                        request_mode=request_mode,
+                        images_per_request=images_per_request,
+                        early_vote=early_vote,
+                        vote_sample=vote_sample,
+                        duplicate_of=duplicate_of
                     )
                     
                     classifications_json = json.dumps(result, ensure_ascii=False)
@@ -210,9 +300,37 @@ class ImageClassifier:
                     else:
                         print(f"⚠️  多图无关联: {result.get('style_tags', [])}")
             
+            if duplicate_of is not None:
+                # 输出去重映射：下标 i 的结果来自 duplicate_of[i]
+                classifications_json = json.dumps(
+                    dict(json.loads(classifications_json), duplicate_of=duplicate_of), ensure_ascii=False
+                )
+            
+            if manifest is not None:
+                # 本次结果写回清单，输出与已有结果合并
+                tags = classifier.expand_tags(json.loads(classifications_json), batch_size)
+                manifest.record("classification", [None if tag == "ERROR" else tag for tag in tags])
+                classifications_json = json.dumps(manifest.merged_classifications(), ensure_ascii=False)
+                print(f"   🧾 清单: 本次 {batch_size} 张，合并输出 {len(manifest.files)} 张")
+            
+            cache_summary = response_cache.format_stats_delta(cache_before)
+            if cache_summary:
+                print(f"   {cache_summary}")
+            retry_summary = retry.format_stats_delta(retry_before)
+            if retry_summary:
+                print(f"   {retry_summary}")
+            vote_summary = classifier.format_vote_stats_delta(vote_before)
+            if vote_summary:
+                print(f"   {vote_summary}")
+            cascade_summary = model_cascade.format_stats_delta(cascade_before)
+            if cascade_summary:
+                print(f"   {cascade_summary}")
+            endpoint_summary = endpoint_pool.format_stats_delta(endpoint_before)
+            if endpoint_summary:
+                print(f"   {endpoint_summary}")
             print(f"{'='*60}\n")
             
-            return (classifications_json, image)
+            return (classifications_json, image, encoded_batch)
         
         except Exception as e:
             error_msg = f"分类失败: {str(e)}"
@@ -224,7 +342,7 @@ class ImageClassifier:
                 "error": error_msg
             }, ensure_ascii=False)
             
-            return (error_json, image)
+            return (error_json, image, encoded_batch)
 
 
 # 节点类映射
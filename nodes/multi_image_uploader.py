@@ -2,7 +2,85 @@
 MultiImageUploader节点 - 多图上传器
 支持连接多个Load Image节点，自动合并成batch
 """
+import json
 import torch
+import torch.nn.functional as F
+from ..core import batch_layout
+
+
+def merge_stretched(images):
+    """
+    把多个IMAGE batch合并为一个batch，尺寸不同的图片双线性缩放到最大宽高
+    
+    输出tensor预先分配；尺寸已一致的输入整批拷贝，
+    尺寸不同的输入按原尺寸分桶，每个桶只调用一次 F.interpolate
+    
+    Args:
+        images: IMAGE tensor 列表，每个 shape [B, H, W, C]
+    Returns:
+        shape [sum(B), max_H, max_W, C]
+    """
+    max_height = max(img.shape[1] for img in images)
+    max_width = max(img.shape[2] for img in images)
+    first = images[0]
+    result = torch.empty(
+        (sum(img.shape[0] for img in images), max_height, max_width, first.shape[3]),
+        dtype=first.dtype,
+        device=first.device
+    )
+    
+    # 按原尺寸分桶: (H, W) -> [(输出起始位置, 输入batch), ...]
+    buckets = {}
+    offset = 0
+    for img in images:
+        count = img.shape[0]
+        if img.shape[1] == max_height and img.shape[2] == max_width:
+            result[offset:offset + count] = img
+        else:
+            buckets.setdefault((img.shape[1], img.shape[2]), []).append((offset, img))
+        offset += count
+    
+    for entries in buckets.values():
+        batch = entries[0][1] if len(entries) == 1 else torch.cat([img for _, img in entries], dim=0)
+        # [B, H, W, C] -> [B, C, H, W] -> resize -> [B, H, W, C]
+        resized = F.interpolate(
+            batch.permute(0, 3, 1, 2).to(result.device),
+            size=(max_height, max_width),
+            mode='bilinear',
+            align_corners=False
+        ).permute(0, 2, 3, 1)
+        pos = 0
+        for offset, img in entries:
+            count = img.shape[0]
+            result[offset:offset + count] = resized[pos:pos + count]
+            pos += count
+    
+    return result
+
+
+def merge_padded(images, layout):
+    """
+    把多个IMAGE batch按 pad 布局合并（不缩放），每个输入batch整批拷贝到各自区域
+    
+    Args:
+        images: IMAGE tensor 列表
+        layout: batch_layout.pad_layout 的返回值
+    """
+    canvas_w, canvas_h = layout["canvas"]
+    first = images[0]
+    result = torch.zeros(
+        (len(layout["images"]), canvas_h, canvas_w, first.shape[3]),
+        dtype=first.dtype,
+        device=first.device
+    )
+    offset = 0
+    for img in images:
+        count = img.shape[0]
+        # 同一输入batch内尺寸相同，区域也相同
+        left, top, right, bottom = layout["images"][offset]["box"]
+        result[offset:offset + count, top:bottom, left:right] = img
+        offset += count
+    return result
 
 
 class MultiImageUploader:
@@ -27,11 +105,14 @@ class MultiImageUploader:
                 "image_8": ("IMAGE",),
                 "image_9": ("IMAGE",),
                 "image_10": ("IMAGE",),
+                "resize_mode": (batch_layout.RESIZE_MODES, {
+                    "default": "stretch"  # pad: 不缩放，居中放入统一画布，输出 image_sizes 供下游只上传原图区域
+                }),
             }
         }
     
-    RETURN_TYPES = ("IMAGE",)
-    RETURN_NAMES = ("images",)
+    RETURN_TYPES = ("IMAGE", "STRING")
+    RETURN_NAMES = ("images", "image_sizes")
     FUNCTION = "merge_images"
     CATEGORY = "SmartCaption"
     
@@ -46,13 +127,14 @@ class MultiImageUploader:
         image_7=None,
         image_8=None,
         image_9=None,
-        image_10=None
+        image_10=None,
+        resize_mode="stretch"
     ):
         """
         合并多个图片为batch
         
         Returns:
-            (images_batch,)
+            (images_batch, image_sizes_json)
         """
         try:
             print(f"\n{'='*60}")
@@ -70,49 +152,31 @@ class MultiImageUploader:
             
             print(f"   连接的图片数: {len(images)}")
             
-            # 收集所有图片tensor
-            all_tensors = []
             for idx, img in enumerate(images):
-                # 每个image可能本身就是batch，需要分解
-                if img.shape[0] == 1:
-                    all_tensors.append(img[0])  # 去掉batch维度
-                else:
-                    # 已经是batch，分解每一张
-                    for i in range(img.shape[0]):
-                        all_tensors.append(img[i])
                 print(f"   ✓ 图片 {idx+1}: shape {img.shape}")
             
-            print(f"   总共收集 {len(all_tensors)} 张图片")
-            
-            # 统一图片尺寸（找最大尺寸）
-            max_height = max(t.shape[0] for t in all_tensors)
-            max_width = max(t.shape[1] for t in all_tensors)
+            total = sum(img.shape[0] for img in images)
+            print(f"   总共收集 {total} 张图片")
             
-            # Resize所有图片到统一尺寸
-            import torch.nn.functional as F
-            resized_tensors = []
-            for t in all_tensors:
-                if t.shape[0] != max_height or t.shape[1] != max_width:
-                    # 需要resize: [H, W, C] -> [C, H, W] -> resize -> [H, W, C]
-                    t_chw = t.permute(2, 0, 1).unsqueeze(0)  # [1, C, H, W]
-                    t_resized = F.interpolate(
-                        t_chw,
-                        size=(max_height, max_width),
-                        mode='bilinear',
-                        align_corners=False
-                    )
-                    t_hwc = t_resized.squeeze(0).permute(1, 2, 0)  # [H, W, C]
-                    resized_tensors.append(t_hwc)
-                else:
-                    resized_tensors.append(t)
+            sizes = []
+            for img in images:
+                sizes.extend([(img.shape[2], img.shape[1])] * img.shape[0])
+            if resize_mode == "pad":
+                # 不缩放：每张图片原尺寸居中放入画布
+                layout = batch_layout.pad_layout(sizes)
+                result = merge_padded(images, layout)
+                
+                print(f"✅ 合并完成(pad): {result.shape}")
+                print(f"{'='*60}\n")
+                
+                return (result, json.dumps(layout))
             
-            # 堆叠成batch: [B, H, W, C]
-            result = torch.stack(resized_tensors, dim=0)
+            result = merge_stretched(images)
             
             print(f"✅ 合并完成: {result.shape}")
             print(f"{'='*60}\n")
             
-            return (result,)
+            return (result, json.dumps(batch_layout.stretch_layout(sizes)))
         
         except Exception as e:
             error_msg = f"合并图片失败: {str(e)}"
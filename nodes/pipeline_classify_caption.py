@@ -0,0 +1,307 @@
+"""
+PipelineClassifyCaption节点 - 流水线分类配文
+分类与配文流水线执行：某个分组分类和关联判断完成后，立即开始该组的配文请求，
+不必等待整批图片分类结束
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ..core import classifier, doubao_client, image_payload, image_similarity, model_cascade, endpoint_pool, response_cache, retry
+from ..core.caption_pe import CAPTION_PE_KEYS
+from ..core.tensor_images import encode_image_batch, find_duplicates
+from .image_classifier import load_default_classification_pe
+from .caption_generator import parse_group_ranges, build_caption_jobs, caption_job_kwargs, CAPTION_FUNCTIONS
+
+
+class PipelineClassifyCaption:
+    """
+    流水线分类配文节点
+    所有分组的分类请求共享一个并发上限；每组完成后立即提交该组的配文请求，
+    分类与配文同时进行（两个阶段各自最多 max_workers 个在途请求）
+    """
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        required = {
+            "image": ("IMAGE",),
+            "classification_pe": ("STRING", {
+                "multiline": True,
+                "default": load_default_classification_pe(),
+                "dynamicPrompts": False
+            }),
+        }
+        for key in CAPTION_PE_KEYS:
+            required[f"{key}_pe"] = ("STRING", {
+                "forceInput": True  # 必须从其他节点输入
+            })
+        required.update({
+            "api_key": ("STRING", {
+                "default": "d26ed5b5-0816-4bec-b045-c353abc16667"
+            }),
+            "api_url": ("STRING", {
+                "default": "https://ark.cn-beijing.volces.com/api/v3/chat/completions"
+            }),
+            "model": ("STRING", {
+                "default": "doubao-seed-1-6-250615"
+            }),
+        })
+        return {
+            "required": required,
+            "optional": {
+                "text_requirement": ("STRING", {
+                    "default": "",
+                    "multiline": False
+                }),
+                "groups": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader输入
+                }),
+                "image_sizes": ("STRING", {
+                    "default": "",
+                    "forceInput": False  # 可选，从BatchImageLoader/MultiImageUploader输入，只上传原图区域
+                }),
+                "early_vote": ("BOOLEAN", {
+                    "default": False  # 关联结论确定后取消剩余分类请求（仅 per_image 模式）
+                }),
+                "vote_sample": ("INT", {
+                    "default": 0,  # 0 = 全部参与表决；>0 时大分组只抽取这么多张表决
+                    "min": 0,
+                    "max": 1000,
+                    "step": 1
+                }),
+                "dedup": ("BOOLEAN", {
+                    "default": False  # 近似重复的图片只请求一张代表图，结果复制给簇内每张图
+                }),
+                "dedup_distance": ("INT", {
+                    "default": image_similarity.DEFAULT_DUPLICATE_DISTANCE,  # pHash 汉明距离阈值（64位）
+                    "min": 0,
+                    "max": 32,
+                    "step": 1
+                }),
+                "cascade_model": ("STRING", {
+                    "default": "",  # 快速模型；留空不使用级联，所有图片直接请求 model
+                    "multiline": False
+                }),
+                "cascade_confidence": ("FLOAT", {
+                    "default": 0.0,  # >0 时要求快速模型输出 confidence，低于该值升级到 model
+                    "min": 0.0,
+                    "max": 1.0,
+                    "step": 0.05
+                }),
+                "max_workers": ("INT", {
+                    "default": 5,
+                    "min": 1,
+                    "max": 512,
+                    "step": 1
+                }),
+                "upload_long_edge": ("INT", {
+                    "default": 0,  # 0 = 原图上传
+                    "min": 0,
+                    "max": 8192,
+                    "step": 64
+                }),
+                "upload_quality": ("INT", {
+                    "default": 95,
+                    "min": 50,
+                    "max": 100,
+                    "step": 1
+                }),
+                "request_mode": (["per_image", "group"], {
+                    "default": "per_image"  # group: 分类时一次请求携带一组图片
+                }),
+                "caption_mode": (["per_image", "group"], {
+                    "default": "per_image"  # group: 有关联的组只生成一条配文
+                }),
+                "images_per_request": ("INT", {
+                    "default": 8,
+                    "min": 2,
+                    "max": 50,
+                    "step": 1
+                }),
+                "endpoints": ("STRING", {
+                    "default": "",  # 端点池：每行 "api_key, api_url, model"，空字段沿用本节点的配置
+                    "multiline": True
+                }),
+            }
+        }
+    
+    RETURN_TYPES = ("STRING", "STRING", "IMAGE")
+    RETURN_NAMES = ("classifications", "captions", "image")
+    FUNCTION = "classify_and_caption"
+    CATEGORY = "SmartCaption"
+    
+    def classify_and_caption(
+        self,
+        image,
+        classification_pe,
+        api_key,
+        api_url,
+        model,
+        text_requirement="",
+        groups="",
+        max_workers=5,
+        upload_long_edge=0,
+        upload_quality=95,
+        request_mode="per_image",
+        caption_mode="per_image",
+        images_per_request=8,
+        image_sizes="",
+        early_vote=False,
+        vote_sample=0,
+        dedup=False,
+        dedup_distance=image_similarity.DEFAULT_DUPLICATE_DISTANCE,
+        cascade_model="",
+        cascade_confidence=0.0,
+        endpoints="",
+        **pe_inputs
+    ):
+        """
+        流水线分类配文主函数
+        
+        Returns:
+            (classifications_json, captions_json, image)
+            去重时两者都附带 duplicate_of（每张图片所属簇的代表图下标）
+        """
+        try:
+            batch_size = image.shape[0]
+            cache_before = response_cache.stats_snapshot()
+            retry_before = retry.stats_snapshot()
+            vote_before = classifier.vote_stats_snapshot()
+            cascade_before = model_cascade.stats_snapshot()
+            endpoint_before = endpoint_pool.stats_snapshot()
+            start_time = time.perf_counter()
+            
+            print(f"\n{'='*60}")
+            print(f"🔀 PipelineClassifyCaption - 流水线分类配文")
+            print(f"   图片数: {batch_size}")
+            pool = endpoint_pool.configure(api_key, api_url, endpoints)
+            if pool is not None:
+                print(f"   ⚖️ 端点池: {pool.describe()}")
+            print(f"{'='*60}")
+            
+            pe_configs = {key: pe_inputs.get(f"{key}_pe", "") for key in CAPTION_PE_KEYS}
+            
+            upload_policy = image_payload.UploadPolicy(upload_long_edge, upload_quality)
+            encoded_images = encode_image_batch(image, upload_policy, image_sizes=image_sizes)
+            
+            group_ranges = parse_group_ranges(groups, batch_size)
+            print(f"   分组数: {len(group_ranges)}")
+            classify_model = model
+            if cascade_model.strip():
+                # 模型级联只用于分类，配文仍使用 model
+                classify_model = model_cascade.ModelCascade(cascade_model.strip(), model, cascade_confidence)
+                print(f"   🪜 模型级联: {classify_model.fast_model} → {classify_model.strong_model}")
+            duplicate_of = find_duplicates(image, image_sizes, dedup_distance) if dedup and batch_size > 1 else None
+            
+            tags = ['ERROR'] * batch_size
+            captions = [None] * batch_size
+            caption_futures = []
+            first_caption_at = []
+            
+            doubao_client.get_http_client(pool_size=max_workers * 2)
+            with ThreadPoolExecutor(max_workers=max_workers) as caption_executor:
+                
+                def _start_captions(group_idx, group_result, _):
+                    # 分类调度线程中回调：只做规划和提交，不阻塞后续分组的分类
+                    name, start, end = group_ranges[group_idx]
+                    tags[start:end] = classifier.expand_tags(group_result, end - start)
+                    print(f"   📁 分组 {name} 分类完成: {group_result.get('style_tag') or group_result.get('style_tags')} -> 开始配文")
+                    if not first_caption_at:
+                        first_caption_at.append(time.perf_counter() - start_time)
+                    for job in build_caption_jobs(
+                        encoded_images, tags, pe_configs, caption_mode, [(name, start, end)], images_per_request,
+                        duplicate_of
+                    ):
+                        future = caption_executor.submit(
+                            CAPTION_FUNCTIONS[job["kind"]],
+                            **caption_job_kwargs(job, text_requirement, api_key, api_url, model)
+                        )
+                        caption_futures.append((job, future))
+                
+                group_results = classifier.classify_groups(
+                    images=encoded_images,
+                    group_ranges=[(start, end) for _, start, end in group_ranges],
+                    classification_pe=classification_pe,
+                    text_requirement=text_requirement,
+                    api_key=api_key,
+                    api_url=api_url,
+                    model=classify_model,
+                    max_workers=max_workers,
+                    request_mode=request_mode,
+                    images_per_request=images_per_request,
+                    on_group_done=_start_captions,
+                    early_vote=early_vote,
+                    vote_sample=vote_sample,
+                    duplicate_of=duplicate_of
+                )
+                classify_done_at = time.perf_counter() - start_time
+                
+                # 结果映射回每张图片
+                for job, future in caption_futures:
+                    try:
+                        caption = future.result()
+                        print(f"   ✅ {job['label']}: {caption}")
+                    except Exception as e:
+                        caption = f"生成失败: {str(e)}"
+                        print(f"   ❌ {job['label']}: 生成失败 - {str(e)}")
+                    for idx in job["indices"]:
+                        captions[idx] = caption
+            
+            # 分类结果与 ImageClassifier 输出格式一致
+            if len(group_ranges) == 1:
+                classification = group_results[0]
+            else:
+                classification = {"style_tags": tags}
+            caption_result = {"captions": captions}
+            if duplicate_of is not None:
+                classification = dict(classification, duplicate_of=duplicate_of)
+                caption_result["duplicate_of"] = duplicate_of
+            
+            print(f"{'='*60}")
+            print(
+                f"✅ 流水线完成: 首个分组 {first_caption_at[0] if first_caption_at else 0:.2f}s 开始配文，"
+                f"分类 {classify_done_at:.2f}s 完成，全部 {time.perf_counter() - start_time:.2f}s 完成"
+                f"（配文请求 {len(caption_futures)} 次）"
+            )
+            cache_summary = response_cache.format_stats_delta(cache_before)
+            if cache_summary:
+                print(f"   {cache_summary}")
+            retry_summary = retry.format_stats_delta(retry_before)
+            if retry_summary:
+                print(f"   {retry_summary}")
+            vote_summary = classifier.format_vote_stats_delta(vote_before)
+            if vote_summary:
+                print(f"   {vote_summary}")
+            cascade_summary = model_cascade.format_stats_delta(cascade_before)
+            if cascade_summary:
+                print(f"   {cascade_summary}")
+            endpoint_summary = endpoint_pool.format_stats_delta(endpoint_before)
+            if endpoint_summary:
+                print(f"   {endpoint_summary}")
+            print(f"{'='*60}\n")
+            
+            return (
+                json.dumps(classification, ensure_ascii=False),
+                json.dumps(caption_result, ensure_ascii=False),
+                image
+            )
+        
+        except Exception as e:
+            error_msg = f"流水线分类配文失败: {str(e)}"
+            print(f"❌ {error_msg}")
+            
+            return (
+                json.dumps({"style_tag": "ERROR", "error": error_msg}, ensure_ascii=False),
+                json.dumps({"captions": [error_msg], "error": error_msg}, ensure_ascii=False),
+                image
+            )
+
+
+# 节点类映射
+NODE_CLASS_MAPPINGS = {
+    "PipelineClassifyCaption": PipelineClassifyCaption
+}
+
+NODE_DISPLAY_NAME_MAPPINGS = {
+    "PipelineClassifyCaption": "流水线分类配文 🔀"
+}